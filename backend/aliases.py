@@ -0,0 +1,348 @@
+"""Player-name aliases for the assistant's question rewriting.
+
+Every player's known_as, full_name and unique_name (lower-cased, 4+ chars)
+maps to their unique_name, so "Rohit Sharma strike rate" reaches the model
+as "RG Sharma strike rate". AliasMatcher compiles the map into one
+Aho-Corasick automaton and finds every alias in a question in a single pass,
+instead of a str.find per alias.
+
+build_db.py writes the compiled automaton to aliases.idx next to the
+database, stamped with the dataset generation. The assistant maps that file
+read-only on its first question (get_matcher), so workers neither scan the
+players table at import nor hold a private copy of the automaton; a missing
+or stale index falls back to compiling from the players table.
+"""
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from database import DB_PATH
+
+MIN_ALIAS_LENGTH = 4
+
+ALIAS_INDEX = os.environ.get("ALIAS_INDEX", os.path.join(os.path.dirname(DB_PATH), "aliases.idx"))
+FORMAT      = 1
+MAGIC       = b"ALIASIDX"
+
+# int32 tables of a compiled matcher, in file order. Transitions are stored
+# per state as a run of (char, next state) sorted by char:
+# edge_char[edge_start[s]:edge_start[s + 1]].
+TABLES = [
+    "edge_start", "edge_char", "edge_next",   # goto
+    "fail", "output", "terminal",             # failure links, next match, alias id or -1
+    "alias_len", "alias_target",              # per alias
+    "name_start",                             # unique_name i is names[name_start[i]:name_start[i + 1]]
+]
+
+
+def build_alias_map(rows):
+    """{lower-case alias: unique_name} from (unique_name, full_name, known_as) rows.
+
+    The first player to claim an alias keeps it.
+    """
+    alias_map = {}
+    for unique_name, full_name, known_as in rows:
+        for alias in [known_as, full_name, unique_name]:
+            if alias and len(alias.strip()) >= MIN_ALIAS_LENGTH:
+                key = alias.strip().lower()
+                if key not in alias_map:
+                    alias_map[key] = unique_name
+    return alias_map
+
+
+def load_alias_map(db_path=DB_PATH):
+    """The alias map from the players table, or {} when the database can't be read."""
+    try:
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT unique_name, full_name, known_as FROM players").fetchall()
+        conn.close()
+    except Exception as e:
+        print(f"⚠️  Could not build player alias map: {e}")
+        return {}
+    return build_alias_map(rows)
+
+
+# ── Matcher ──────────────────────────────────────────────────────────────────
+
+class AliasMatcher:
+    """Aho-Corasick automaton over the aliases of an alias map.
+
+    Replacements follow the original resolver exactly: longer aliases win
+    (ties go to the alias that entered the map first), a match must sit on
+    word boundaries, and it may not overlap a replacement already taken.
+    An alias already spelled as its unique_name is left alone and does not
+    block shorter aliases inside it.
+
+    Build one with compile() or load() a saved index; both hold the same
+    flat tables (arrays, or memoryviews over the mapped file).
+    """
+
+    def __init__(self, tables, names, generation=None):
+        self.generation = generation
+        for name in TABLES:
+            setattr(self, f"_{name}", tables[name])
+        self._names = names
+        # The root is left on almost every character: keep its edges in a dict
+        lo, hi = self._edge_start[0], self._edge_start[1]
+        self._root = dict(zip(self._edge_char[lo:hi], self._edge_next[lo:hi]))
+
+    @classmethod
+    def compile(cls, alias_map, generation=None):
+        aliases = list(alias_map)
+
+        # Trie on a flat dict: goto[state << 21 | ord(char)] is the next state
+        goto, terminal, children = {}, [-1], [[]]
+        for alias_id, alias in enumerate(aliases):
+            state = 0
+            for ch in alias:
+                key = state << 21 | ord(ch)
+                nxt = goto.get(key)
+                if nxt is None:
+                    nxt = goto[key] = len(terminal)
+                    children[state].append((ord(ch), nxt))
+                    children.append([])
+                    terminal.append(-1)
+                state = nxt
+            terminal[state] = alias_id
+
+        # Failure links breadth-first; output[state] is the next terminal
+        # state on the failure chain, so matches ending here are a short walk
+        fail = array("i", bytes(4 * len(terminal)))
+        output = array("i", bytes(4 * len(terminal)))
+        queue = deque(nxt for _, nxt in children[0])
+        while queue:
+            state = queue.popleft()
+            for c, nxt in children[state]:
+                f = fail[state]
+                while f and (f << 21 | c) not in goto:
+                    f = fail[f]
+                fail[nxt] = goto.get(f << 21 | c, 0)
+                output[nxt] = fail[nxt] if terminal[fail[nxt]] >= 0 else output[fail[nxt]]
+                queue.append(nxt)
+
+        edge_start, edge_char, edge_next = array("i", [0]), array("i"), array("i")
+        for edges in children:
+            edges.sort()
+            edge_char.extend(c for c, _ in edges)
+            edge_next.extend(nxt for _, nxt in edges)
+            edge_start.append(len(edge_char))
+
+        # unique_names, each stored once
+        targets = {}
+        alias_target = array("i", (targets.setdefault(alias_map[a], len(targets)) for a in aliases))
+        names, name_start = bytearray(), array("i", [0])
+        for unique_name in targets:
+            names += unique_name.encode("utf-8")
+            name_start.append(len(names))
+
+        tables = {
+            "edge_start": edge_start, "edge_char": edge_char, "edge_next": edge_next,
+            "fail": fail, "output": output, "terminal": array("i", terminal),
+            "alias_len": array("i", (len(a) for a in aliases)),
+            "alias_target": alias_target, "name_start": name_start,
+        }
+        return cls(tables, bytes(names), generation)
+
+    # ── Index file ───────────────────────────────────────────────────────────
+    # MAGIC, uint32 header length, JSON header, then each int32 table and the
+    # names blob at the 8-byte aligned offsets the header lists.
+
+    def save(self, path):
+        """Write the index atomically, so processes mapping the old file keep it."""
+        blobs = [(name, memoryview(getattr(self, f"_{name}")).cast("B")) for name in TABLES]
+        blobs.append(("names", memoryview(self._names).cast("B")))
+        header = {"format": FORMAT, "generation": self.generation,
+                  "byteorder": sys.byteorder, "sections": {}}
+        # Offsets depend on the header's own length: leave room for them first
+        for name, blob in blobs:
+            header["sections"][name] = [0, len(blob)]
+        offset = _align(len(MAGIC) + 4 + len(json.dumps(header)) + 16 * len(blobs))
+        for name, blob in blobs:
+            header["sections"][name] = [offset, len(blob)]
+            offset = _align(offset + len(blob))
+        encoded = json.dumps(header).encode()
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+            for name, blob in blobs:
+                f.write(bytes(header["sections"][name][0] - f.tell()))
+                f.write(blob)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Map a saved index read-only; pages are shared by every process that maps it."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError("not an alias index")
+        (length,) = struct.unpack_from("<I", mapped, len(MAGIC))
+        header = json.loads(mapped[len(MAGIC) + 4:len(MAGIC) + 4 + length])
+        if header.get("format") != FORMAT:
+            raise ValueError(f"alias index format {header.get('format')} != {FORMAT}")
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"alias index is {header['byteorder']}-endian")
+
+        view = memoryview(mapped)
+        sections = {
+            name: view[offset:offset + size] for name, (offset, size) in header["sections"].items()
+        }
+        tables = {name: sections[name].cast("i") for name in TABLES}
+        return cls(tables, sections["names"], header["generation"])
+
+    # ── Matching ─────────────────────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self._alias_len)
+
+    def _step(self, state, c):
+        # goto(state, c), or -1
+        lo, hi = self._edge_start[state], self._edge_start[state + 1]
+        i = bisect_left(self._edge_char, c, lo, hi)
+        return self._edge_next[i] if i < hi and self._edge_char[i] == c else -1
+
+    def _target(self, alias_id):
+        t = self._alias_target[alias_id]
+        return bytes(self._names[self._name_start[t]:self._name_start[t + 1]]).decode("utf-8")
+
+    def _matches(self, text):
+        # Every (start, end, alias_id) occurrence that sits on word boundaries
+        step, fail, terminal, output = self._step, self._fail, self._terminal, self._output
+        root, alias_len = self._root, self._alias_len
+        found = []
+        state = 0
+        for i, ch in enumerate(text):
+            c = ord(ch)
+            nxt = -1
+            while state:
+                nxt = step(state, c)
+                if nxt >= 0:
+                    break
+                state = fail[state]
+            state = nxt if nxt >= 0 else root.get(c, 0)
+            end = i + 1
+            if end < len(text) and text[end].isalnum():
+                continue
+            s = state if terminal[state] >= 0 else output[state]
+            while s:
+                alias_id = terminal[s]
+                start = end - alias_len[alias_id]
+                if start == 0 or not text[start - 1].isalnum():
+                    found.append((start, end, alias_id))
+                s = output[s]
+        return found
+
+    def replacements(self, question):
+        """[(start, end, unique_name, original)] for the aliases in question."""
+        lower_q = question.lower()
+        used = [False] * len(question)
+        chosen = []
+        candidates = self._matches(lower_q)
+        candidates.sort(key=lambda m: (m[0] - m[1], m[2], m[0]))
+        for start, end, alias_id in candidates:
+            if any(used[start:end]):
+                continue
+            unique_name = self._target(alias_id)
+            original = question[start:end]
+            if original != unique_name:
+                chosen.append((start, end, unique_name, original))
+                for i in range(start, end):
+                    used[i] = True
+        return chosen
+
+    def mentions(self, question):
+        """[(start, end, unique_name)] for every player named in question, in order.
+
+        Same longest-first, non-overlapping choice as replacements(), but
+        names already spelled as their unique_name count too, so this reads
+        the players back out of a resolved question.
+        """
+        used = [False] * len(question)
+        found = []
+        candidates = self._matches(question.lower())
+        candidates.sort(key=lambda m: (m[0] - m[1], m[2], m[0]))
+        for start, end, alias_id in candidates:
+            if any(used[start:end]):
+                continue
+            found.append((start, end, self._target(alias_id)))
+            for i in range(start, end):
+                used[i] = True
+        return sorted(found)
+
+    def resolve(self, question, verbose=True):
+        """question with every alias replaced by its unique_name."""
+        replacements = self.replacements(question)
+        if not replacements:
+            return question
+
+        # Apply right-to-left so earlier indices stay valid
+        replacements.sort(key=lambda x: x[0], reverse=True)
+        result = question
+        for start, end, unique_name, original in replacements:
+            if verbose:
+                print(f"🔁 Resolved: '{original}' → '{unique_name}'")
+            result = result[:start] + unique_name + result[end:]
+        return result
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+# ── Build / load ─────────────────────────────────────────────────────────────
+
+def index_path_for(conn):
+    """aliases.idx next to the database file conn has open."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return os.path.join(os.path.dirname(path), "aliases.idx")
+
+
+def _read_generation(db_path):
+    try:
+        conn = sqlite3.connect(db_path)
+        row = conn.execute("SELECT generation FROM dataset_info").fetchone()
+        conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def open_matcher(db_path=DB_PATH, index_path=ALIAS_INDEX):
+    """The saved index if it matches the database's generation, else one compiled now."""
+    generation = _read_generation(db_path)
+    try:
+        matcher = AliasMatcher.load(index_path)
+        if matcher.generation != generation:
+            raise ValueError(
+                f"built for generation {matcher.generation}, database is at {generation}"
+                " (run build_db.py)"
+            )
+        print(f"✅ Player alias index loaded: {len(matcher)} aliases for name resolution.")
+        return matcher
+    except Exception as e:
+        print(f"⚠️  Could not load alias index {index_path}: {e} — building from players.")
+    matcher = AliasMatcher.compile(load_alias_map(db_path), generation)
+    print(f"✅ Player alias map built: {len(matcher)} aliases for name resolution.")
+    return matcher
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher():
+    """The process-wide matcher, opened on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = open_matcher()
+    return _matcher
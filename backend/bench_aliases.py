@@ -0,0 +1,163 @@
+"""Micro-benchmark: AliasMatcher vs the per-alias str.find resolver it replaced.
+
+    python bench_aliases.py                  # aliases from ./cricket_assistant.db
+    python bench_aliases.py --synthetic 40000
+
+Both resolvers, and the matcher read back from a saved aliases.idx, must
+produce the same rewrite for every question; the script exits non-zero if
+they don't.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+from aliases import AliasMatcher, build_alias_map, load_alias_map
+
+QUESTIONS = [
+    "Rohit Sharma strike rate in IPL 2023",
+    "How many runs has Virat Kohli scored against left-arm spin in the death overs?",
+    "Compare Jasprit Bumrah and Rashid Khan economy in T20I",
+    "best bowling figures at Wankhede Stadium",
+    "What is AB de Villiers' average when chasing?",
+    "top 10 run scorers in SA20",
+    "MS Dhoni sixes per season",
+    "Which batter has the highest strike rate against Sunil Narine (min 30 balls)?",
+]
+
+
+def resolve_by_find(alias_map, question):
+    """The original resolver: one str.find sweep per alias, longest first."""
+    sorted_aliases = sorted(alias_map.keys(), key=len, reverse=True)
+    lower_q = question.lower()
+    used = [False] * len(question)
+    replacements = []
+
+    for alias in sorted_aliases:
+        alen = len(alias)
+        idx = 0
+        while idx <= len(lower_q) - alen:
+            pos = lower_q.find(alias, idx)
+            if pos == -1:
+                break
+            end = pos + alen
+
+            before_ok = pos == 0 or not lower_q[pos - 1].isalnum()
+            after_ok  = end >= len(lower_q) or not lower_q[end].isalnum()
+            no_overlap = not any(used[pos:end])
+
+            if before_ok and after_ok and no_overlap:
+                unique_name = alias_map[alias]
+                original    = question[pos:end]
+                if original != unique_name:
+                    replacements.append((pos, end, unique_name, original))
+                    for i in range(pos, end):
+                        used[i] = True
+            idx = pos + 1
+
+    replacements.sort(key=lambda x: x[0], reverse=True)
+    result = question
+    for start, end, unique_name, original in replacements:
+        result = result[:start] + unique_name + result[end:]
+    return result
+
+
+def synthetic_rows(n, seed=0):
+    # Name-shaped (unique_name, full_name, known_as) rows, ~3 aliases each
+    rng = random.Random(seed)
+    word = lambda: rng.choice(string.ascii_uppercase) + "".join(
+        rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))
+    )
+    rows = []
+    while len(rows) * 2.5 < n:
+        first, middle, last = word(), word(), word()
+        initials = first[0] + (middle[0] if rng.random() < 0.5 else "")
+        rows.append((
+            f"{initials} {last}",
+            f"{first} {middle} {last}",
+            f"{first} {last}" if rng.random() < 0.6 else None,
+        ))
+    return rows
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def check_mapped(path, alias_map, matcher, questions, repeat):
+    """(load seconds, mismatches, best resolve time) for the index saved at path."""
+    t = time.perf_counter()
+    mapped = AliasMatcher.load(path)
+    load = time.perf_counter() - t
+
+    mismatches = 0
+    for q in questions:
+        expected = resolve_by_find(alias_map, q)
+        for label, m in (("compiled", matcher), ("mapped", mapped)):
+            got = m.resolve(q, verbose=False)
+            if got != expected:
+                mismatches += 1
+                print(f"⚠️  {q!r}: find={expected!r} {label}={got!r}")
+
+    new = best_of(lambda: [mapped.resolve(q, verbose=False) for q in questions], repeat)
+    return load, mismatches, new
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="./cricket_assistant.db")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="benchmark ~N generated aliases instead of the database")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rows = synthetic_rows(args.synthetic)
+        alias_map = build_alias_map(rows)
+        # Make the sample questions mention some of them
+        picks = random.Random(1).sample(rows, min(len(rows), 16))
+        questions = QUESTIONS + [
+            f"{a[2] or a[1]} vs {b[1]} head to head" for a, b in zip(picks[::2], picks[1::2])
+        ]
+    else:
+        alias_map = load_alias_map(args.db)
+        questions = QUESTIONS
+    if not alias_map:
+        sys.exit("no aliases to benchmark")
+
+    t = time.perf_counter()
+    matcher = AliasMatcher.compile(alias_map)
+    build = time.perf_counter() - t
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "aliases.idx")
+        matcher.save(path)
+        size = os.path.getsize(path)
+        # The mapped index lives only inside check_mapped, so the file is no
+        # longer mapped when the directory is removed
+        load, mismatches, new = check_mapped(path, alias_map, matcher, questions, args.repeat)
+    old = best_of(lambda: [resolve_by_find(alias_map, q) for q in questions], args.repeat)
+    per_q = 1e6 / len(questions)
+
+    print(f"aliases:           {len(alias_map)}")
+    print(f"automaton states:  {len(matcher._terminal)}")
+    print(f"compile:           {build * 1000:10.1f} ms")
+    print(f"load aliases.idx:  {load * 1000:10.1f} ms ({size / 1e6:.1f} MB mapped)")
+    print(f"str.find resolver: {old * per_q:10.1f} µs/question")
+    print(f"AliasMatcher:      {new * per_q:10.1f} µs/question")
+    print(f"speedup:           {old / new:10.1f}x")
+    if mismatches:
+        sys.exit(f"{mismatches} resolutions differ from the str.find resolver")
+    print(f"✅ {len(questions)} questions resolved identically")
+
+
+if __name__ == "__main__":
+    main()
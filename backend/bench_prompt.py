@@ -0,0 +1,65 @@
+"""Offline check of prompt retrieval: prompt size and rule coverage.
+
+    python bench_prompt.py
+    python bench_prompt.py --top-exemplars 4 --top-sections 2
+
+Every library exemplar is held out in turn and its question is run through
+a selector built from the other exemplars. The selection must carry every
+LOGIC_BLOCK section the held-out SQL relies on (sections_for_sql), which is
+the part of the full prompt the model could not do without. The script
+reports the prompt size against the full prompt and exits non-zero on a
+missing section.
+"""
+import argparse
+import sys
+
+from gemini_model import EXEMPLARS, FEW_SHOT_HISTORY, LOGIC_BLOCK, SYSTEM_INSTRUCTIONS, SYSTEM_PROMPT
+from prompt_retrieval import ALWAYS, TOP_EXEMPLARS, TOP_SECTIONS, PromptSelector, sections_for_sql
+
+
+def prompt_chars(system_instruction, turns):
+    return len(system_instruction) + sum(len(part) for turn in turns for part in turn["parts"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-exemplars", type=int, default=TOP_EXEMPLARS)
+    parser.add_argument("--top-sections", type=int, default=TOP_SECTIONS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every selection")
+    args = parser.parse_args()
+
+    full, selected, misses = 0, 0, 0
+    for i, (question, sql) in enumerate(EXEMPLARS):
+        library = EXEMPLARS[:i] + EXEMPLARS[i + 1:]
+        selector = PromptSelector(LOGIC_BLOCK, library, args.top_exemplars, args.top_sections)
+        sections, exemplars = selector.select(question)
+        headings = {h for h, text in selector.sections if text in sections} | set(ALWAYS)
+
+        missing = [h for h in sections_for_sql(sql) if h not in headings]
+        if missing:
+            misses += 1
+            print(f"⚠️  {question!r} is missing: {', '.join(missing)}")
+        if args.verbose:
+            print(f"{question!r}\n    exemplars: {[q for q, _ in exemplars]}\n    sections:  {sorted(headings)}")
+
+        message = {"role": "user", "parts": [f"Question: {question}"]}
+        full += prompt_chars(SYSTEM_PROMPT, [*FEW_SHOT_HISTORY, message])
+        rules = "\n\n".join(sections)
+        selected += prompt_chars(
+            f"{SYSTEM_INSTRUCTIONS}\n\n{selector.always()}",
+            [{"role": "user", "parts": [q, s]} for q, s in exemplars]
+            + [{"role": "user", "parts": [f"{rules}\n\nQuestion: {question}"]}],
+        )
+
+    n = len(EXEMPLARS)
+    print(f"exemplars:          {n}")
+    print(f"full prompt:        {full / n:10.0f} chars/question")
+    print(f"retrieved prompt:   {selected / n:10.0f} chars/question")
+    print(f"reduction:          {1 - selected / full:10.1%}")
+    if misses:
+        sys.exit(f"{misses} of {n} held-out questions lack a section their SQL needs")
+    print(f"✅ {n} held-out questions got every section their SQL needs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+"""Materialize the derived tables the stats routes read from.
+
+The raw ``deliveries`` / ``matches`` / ``players`` tables are loaded first;
+run this afterwards (from backend/) every time new matches are added:
+
+    python build_db.py [path/to/cricket_assistant.db]
+
+Every table built here is dropped and recreated, so the script is safe to
+re-run against the same file. Schema migrations (indexes, ANALYZE, version
+stamp) run last, see migrations.py.
+"""
+import sqlite3
+import sys
+import time
+
+import aliases
+import columnar
+import dimensions
+from database import DB_PATH
+from migrations import REGULAR_INNINGS, migrate
+
+# Competition of a match as its dimensions.COMPETITION_CODES code, the one
+# encoding every derived table, the column files and the routes use.
+COMPETITION_CASE = f"""CASE
+        WHEN m.event_name = 'Indian Premier League' THEN {dimensions.COMPETITION_CODES["IPL"]}
+        WHEN m.event_name = 'SA20'                  THEN {dimensions.COMPETITION_CODES["SA20"]}
+        WHEN m.event_name IS NOT NULL               THEN {dimensions.COMPETITION_CODES["T20I"]}
+    END"""
+
+
+# ── Surrogate keys ───────────────────────────────────────────────────────────
+# Integer ids for every string the routes filter or group on. Dimension tables
+# map names to ids, and id columns are added to the raw tables next to the
+# names (which assistant-generated SQL still reads). player_ids is separate
+# from players because players is neither unique nor complete.
+
+DIMENSIONS = {
+    "player_ids": ("player_id", "unique_name", """
+        SELECT unique_name AS name FROM players
+        UNION SELECT batter FROM deliveries
+        UNION SELECT bowler FROM deliveries
+        UNION SELECT non_striker FROM deliveries
+        UNION SELECT player_out FROM deliveries"""),
+    "teams": ("team_id", "team", """
+        SELECT batting_team AS name FROM deliveries
+        UNION SELECT team1 FROM matches
+        UNION SELECT team2 FROM matches"""),
+}
+
+# Dimension table → (id column, name column) the id columns are looked up by.
+# Venue names resolve through their aliases, see _build_venues.
+KEY_LOOKUPS = {
+    **{table: (id_col, name_col) for table, (id_col, name_col, _) in DIMENSIONS.items()},
+    "venue_aliases": ("venue_id", "alias"),
+}
+
+# (table, id column, dimension, name column)
+ID_COLUMNS = [
+    ("deliveries", "batter_id",       "player_ids",    "batter"),
+    ("deliveries", "bowler_id",       "player_ids",    "bowler"),
+    ("deliveries", "non_striker_id",  "player_ids",    "non_striker"),
+    ("deliveries", "player_out_id",   "player_ids",    "player_out"),
+    ("deliveries", "batting_team_id", "teams",         "batting_team"),
+    ("deliveries", "venue_id",        "venue_aliases", "venue"),
+    ("matches",    "team1_id",        "teams",         "team1"),
+    ("matches",    "team2_id",        "teams",         "team2"),
+    ("matches",    "venue_id",        "venue_aliases", "venue"),
+]
+
+
+# Player classes from the free-text styles in players, one predicate per key
+# of dimensions.BOWLER_TYPES / BATTER_HANDS
+BOWLER_TYPE_STYLES = {
+    "right-pace":     "bp.bowling_style LIKE '%Right-arm pace%'",
+    "left-pace":      "bp.bowling_style LIKE '%Left-arm pace%'",
+    "off-spin":       "(bp.bowling_style LIKE '%off-spin%' OR bp.bowling_style LIKE '%off-break%')",
+    "leg-spin":       "(bp.bowling_style LIKE '%wrist-spin%')",
+    "right-orthodox": "bp.bowling_style LIKE '%Right-arm off-spin%'",
+    "left-orthodox":  "bp.bowling_style LIKE '%Left-arm off-spin%'",
+    "right-wrist":    "bp.bowling_style LIKE '%Right-arm wrist-spin%'",
+    "left-wrist":     "bp.bowling_style LIKE '%Left-arm wrist-spin%'",
+    "pace":           "(bp.bowling_style LIKE '%pace%')",
+    "spin":           "(bp.bowling_style LIKE '%spin%')",
+}
+
+BATTER_HAND_STYLES = {
+    "left":  "bp.batting_style = 'Left-hand bat'",
+    "right": "bp.batting_style = 'Right-hand bat'",
+}
+
+
+# Match attributes copied onto every delivery so per-delivery filters need no
+# matches join: (column, expression over the deliveries row). Dates are
+# stored as day ordinals (Python's date.toordinal()). The expressions read
+# matches' names, not the ids being filled in the same UPDATE.
+MATCH_ATTRIBUTES = [
+    ("year",            "CAST(SUBSTR(deliveries.date, 1, 4) AS INTEGER)"),
+    ("date_ordinal",    "CAST(julianday(deliveries.date) - 1721424.5 AS INTEGER)"),
+    ("competition",     """(SELECT e.competition FROM matches m
+                            JOIN events e ON e.event_id = m.event_id
+                            WHERE m.match_id = deliveries.match_id)"""),
+    ("bowling_team_id", """(SELECT CASE deliveries.batting_team
+                                WHEN m.team1 THEN m.team2_id WHEN m.team2 THEN m.team1_id END
+                            FROM matches m WHERE m.match_id = deliveries.match_id)"""),
+]
+
+
+def _add_column(conn, table, column):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+
+
+def build_keys(conn):
+    for table, (id_col, name_col, source) in DIMENSIONS.items():
+        conn.executescript(f"""
+            DROP TABLE IF EXISTS {table};
+            CREATE TABLE {table} (
+                {id_col}    INTEGER PRIMARY KEY,
+                {name_col}  TEXT NOT NULL UNIQUE
+            );
+            INSERT INTO {table} ({name_col})
+            SELECT name FROM ({source}
+            ) WHERE name IS NOT NULL ORDER BY name;
+        """)
+
+    conn.executescript(f"""
+        DROP TABLE IF EXISTS events;
+        CREATE TABLE events (
+            event_id        INTEGER PRIMARY KEY,
+            event_name      TEXT NOT NULL UNIQUE,
+            competition     INTEGER NOT NULL
+        );
+        INSERT INTO events (event_name, competition)
+        SELECT DISTINCT m.event_name, {COMPETITION_CASE}
+        FROM matches m
+        WHERE m.event_name IS NOT NULL
+        ORDER BY m.event_name;
+
+        DROP TABLE IF EXISTS innings;
+        CREATE TABLE innings (
+            innings_id      INTEGER PRIMARY KEY,
+            match_id        TEXT    NOT NULL,
+            inning          INTEGER NOT NULL,
+            UNIQUE (match_id, inning)
+        );
+        INSERT INTO innings (match_id, inning)
+        SELECT DISTINCT match_id, inning FROM deliveries
+        WHERE match_id IS NOT NULL AND inning IS NOT NULL
+        ORDER BY match_id, inning;
+    """)
+
+    _build_venues(conn)
+    _classify_players(conn)
+
+    for table, id_col, dimension, name_col in ID_COLUMNS:
+        _add_column(conn, table, id_col)
+    for table in ("matches", "deliveries"):
+        columns = [c for c in ID_COLUMNS if c[0] == table]
+        sets = [
+            f"{id_col} = (SELECT {KEY_LOOKUPS[dim][0]} FROM {dim} "
+            f"WHERE {KEY_LOOKUPS[dim][1]} = {table}.{name_col})"
+            for _, id_col, dim, name_col in columns
+        ]
+        if table == "matches":
+            _add_column(conn, "matches", "event_id")
+            sets.append("event_id = (SELECT event_id FROM events e "
+                        "WHERE e.event_name = matches.event_name)")
+        else:
+            _add_column(conn, "deliveries", "innings_id")
+            sets.append("innings_id = (SELECT innings_id FROM innings i "
+                        "WHERE i.match_id = deliveries.match_id AND i.inning = deliveries.inning)")
+            _add_column(conn, "deliveries", "bowler_type_mask")
+            sets.append("bowler_type_mask = (SELECT bowler_type_mask FROM player_ids p "
+                        "WHERE p.unique_name = deliveries.bowler)")
+            _add_column(conn, "deliveries", "batter_hand")
+            sets.append("batter_hand = (SELECT batter_hand FROM player_ids p "
+                        "WHERE p.unique_name = deliveries.batter)")
+            for column, expr in MATCH_ATTRIBUTES:
+                _add_column(conn, "deliveries", column)
+                sets.append(f"{column} = {expr}")
+        conn.execute(f"UPDATE {table} SET {', '.join(sets)}")
+
+    # Per-player access paths on the integer keys, covering what the batting,
+    # bowling and comparison runners read (innings 1 and 2 only, see
+    # migrations.REGULAR_INNINGS), led by the date so date ranges seek.
+    # Recreated so a rebuild picks up new columns.
+    conn.executescript(f"""
+        DROP INDEX IF EXISTS idx_deliveries_batter_id;
+        CREATE INDEX idx_deliveries_batter_id
+            ON deliveries (batter_id, date_ordinal, match_id, inning, innings_id, over, ball,
+                           extras_type, runs_batter, is_wicket, player_out_id, wicket_kind,
+                           bowler_type_mask, competition, year, bowling_team_id, venue_id)
+            {REGULAR_INNINGS};
+        DROP INDEX IF EXISTS idx_deliveries_bowler_id;
+        CREATE INDEX idx_deliveries_bowler_id
+            ON deliveries (bowler_id, date_ordinal, match_id, inning, innings_id, over,
+                           extras_type, runs_batter, runs_total, is_wicket, wicket_kind,
+                           batter_hand, competition, year, batting_team_id, venue_id)
+            {REGULAR_INNINGS};
+        DROP INDEX IF EXISTS idx_deliveries_non_striker_id;
+        CREATE INDEX idx_deliveries_non_striker_id
+            ON deliveries (non_striker_id, competition, match_id, inning, innings_id, over,
+                           player_out_id, wicket_kind, batter_id)
+            {REGULAR_INNINGS};
+        CREATE INDEX IF NOT EXISTS idx_matches_event_id ON matches (event_id, match_id);
+    """)
+
+
+# Other spellings of a city across seasons of scorecards
+CITY_ALIASES = {
+    "Bangalore": "Bengaluru",
+    "Bombay":    "Mumbai",
+    "Calcutta":  "Kolkata",
+    "Madras":    "Chennai",
+}
+
+
+def _usual_city(counts):
+    # Most matches wins; ties go to the alphabetically first city
+    return min(counts, key=lambda city: (-counts[city], city)) if counts else None
+
+
+def _canonical_venues(aliases, cities):
+    """{spelling: canonical venue name}.
+
+    "X, Suffix" and "X" are the same ground only when they were played in the
+    same city (the spelling's usual city from matches, else the suffix):
+    "Wankhede Stadium, Mumbai" folds into "Wankhede Stadium", but "County
+    Ground, Bristol" and "County Ground, Taunton" stay two grounds, named
+    with their city. A spelling with no city joins its ground when that
+    name has only one.
+    """
+    grounds = {}   # name before the comma -> {city or None: [spellings]}
+    for alias in aliases:
+        base, _, suffix = alias.partition(",")
+        base = base.strip() or alias
+        city = _usual_city(cities.get(alias)) or suffix.strip() or None
+        city = CITY_ALIASES.get(city, city)
+        grounds.setdefault(base, {}).setdefault(city, []).append(alias)
+
+    canonical = {}
+    for base, by_city in grounds.items():
+        known = [city for city in by_city if city is not None]
+        if len(known) == 1 and None in by_city:
+            by_city[known[0]] += by_city.pop(None)
+        for city, spellings in by_city.items():
+            name = base if len(by_city) == 1 or city is None else f"{base}, {city}"
+            canonical.update((alias, name) for alias in spellings)
+    return canonical
+
+
+def _build_venues(conn):
+    """venues (one row per ground, with its usual city) and venue_aliases (every spelling)."""
+    aliases = [row[0] for row in conn.execute("""
+        SELECT venue FROM deliveries WHERE venue IS NOT NULL
+        UNION SELECT venue FROM matches WHERE venue IS NOT NULL
+    """)]
+    cities = {}   # spelling -> {city: matches}
+    for venue, city, n in conn.execute("""
+        SELECT venue, city, COUNT(*) FROM matches
+        WHERE venue IS NOT NULL AND city IS NOT NULL
+        GROUP BY venue, city
+    """):
+        cities.setdefault(venue, {})[city] = n
+
+    venue_of = _canonical_venues(aliases, cities)
+    venue_cities = {}
+    for alias, name in venue_of.items():
+        counts = venue_cities.setdefault(name, {})
+        for city, n in cities.get(alias, {}).items():
+            counts[city] = counts.get(city, 0) + n
+
+    canonical = sorted(set(venue_of.values()))
+    ids = {name: i + 1 for i, name in enumerate(canonical)}
+    conn.executescript("""
+        DROP TABLE IF EXISTS venue_aliases;
+        DROP TABLE IF EXISTS venues;
+        CREATE TABLE venues (
+            venue_id    INTEGER PRIMARY KEY,
+            venue       TEXT NOT NULL UNIQUE,
+            city        TEXT
+        );
+        CREATE TABLE venue_aliases (
+            alias       TEXT PRIMARY KEY,
+            venue_id    INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    conn.executemany("INSERT INTO venues VALUES (?, ?, ?)", [
+        (ids[name], name, _usual_city(venue_cities.get(name))) for name in canonical
+    ])
+    conn.executemany("INSERT INTO venue_aliases VALUES (?, ?)", [
+        (alias, ids[name]) for alias, name in venue_of.items()
+    ])
+
+
+def _classify_players(conn):
+    """Fill player_ids.bowler_type_mask / batter_hand from the players styles."""
+    mask = " + ".join(
+        f"(CASE WHEN {BOWLER_TYPE_STYLES[key]} THEN {bit} ELSE 0 END)"
+        for key, bit in dimensions.BOWLER_TYPE_BITS.items()
+    )
+    hand = " ".join(
+        f"WHEN {BATTER_HAND_STYLES[key]} THEN {code}"
+        for key, code in dimensions.BATTER_HAND_CODES.items()
+    )
+    _add_column(conn, "player_ids", "bowler_type_mask")
+    _add_column(conn, "player_ids", "batter_hand")
+    conn.execute(f"""
+        UPDATE player_ids SET
+            bowler_type_mask = COALESCE((SELECT {mask} FROM players bp
+                WHERE bp.unique_name = player_ids.unique_name LIMIT 1), 0),
+            batter_hand = COALESCE((SELECT CASE {hand} ELSE 0 END FROM players bp
+                WHERE bp.unique_name = player_ids.unique_name LIMIT 1), 0)
+    """)
+
+
+# ── Batting innings ──────────────────────────────────────────────────────────
+# One row per (match, inning, batter), aggregated over the balls the batter
+# faced (wides excluded) in innings 1 and 2. These are exactly the rows the
+# per-delivery batting query in routes/stats.py aggregates, so summing them
+# reproduces its numbers.
+
+def build_batting_innings(conn):
+    conn.executescript("""
+        DROP TABLE IF EXISTS batting_innings;
+        CREATE TABLE batting_innings (
+            innings_id      INTEGER NOT NULL,
+            batter_id       INTEGER NOT NULL,
+            match_id        TEXT    NOT NULL,
+            batting_team_id INTEGER,
+            bowling_team_id INTEGER,
+            competition     INTEGER,
+            year            INTEGER,
+            date_ordinal    INTEGER,
+            venue_id        INTEGER,
+            runs            INTEGER,
+            balls           INTEGER NOT NULL,
+            fours           INTEGER NOT NULL,
+            sixes           INTEGER NOT NULL,
+            dots            INTEGER NOT NULL,
+            dismissals      INTEGER NOT NULL,
+            dismissal_kind  TEXT,
+            PRIMARY KEY (innings_id, batter_id)
+        ) WITHOUT ROWID;
+
+        INSERT INTO batting_innings
+        SELECT
+            d.innings_id,
+            d.batter_id,
+            d.match_id,
+            d.batting_team_id,
+            d.bowling_team_id,
+            d.competition,
+            d.year,
+            d.date_ordinal,
+            d.venue_id,
+            SUM(d.runs_batter),
+            COUNT(*),
+            COUNT(CASE WHEN d.runs_batter = 4 THEN 1 END),
+            COUNT(CASE WHEN d.runs_batter = 6 THEN 1 END),
+            COUNT(CASE WHEN d.runs_batter = 0 THEN 1 END),
+            COUNT(CASE WHEN d.is_wicket = 1
+                AND d.player_out_id = d.batter_id
+                AND d.wicket_kind NOT IN ('retired hurt', 'retired not out') THEN 1 END),
+            MAX(CASE WHEN d.is_wicket = 1 AND d.player_out_id = d.batter_id THEN d.wicket_kind END)
+        FROM deliveries d
+        JOIN matches m ON d.match_id = m.match_id
+        WHERE d.inning IN (1, 2)
+          AND (d.extras_type IS NULL OR d.extras_type != 'wides')
+          AND d.batter_id IS NOT NULL
+        GROUP BY d.innings_id, d.batter_id;
+
+        CREATE INDEX idx_batting_innings_batter
+            ON batting_innings (batter_id, competition, year);
+    """)
+
+
+# ── Bowling innings ──────────────────────────────────────────────────────────
+# One row per (match, inning, bowler, phase) over every delivery bowled in
+# innings 1 and 2, with the bowler-side definitions used by routes/stats.py:
+# legal balls exclude wides and no-balls, runs conceded exclude byes and
+# leg-byes, wickets exclude run outs, retirements and obstruction.
+
+PHASE_CASE = """CASE
+        WHEN d.over >= 0 AND d.over < 6  THEN 'pp'
+        WHEN d.over >= 6 AND d.over < 16 THEN 'middle'
+        WHEN d.over >= 16                THEN 'death'
+    END"""
+
+
+def build_bowling_innings(conn):
+    conn.executescript(f"""
+        DROP TABLE IF EXISTS bowling_innings;
+        CREATE TABLE bowling_innings (
+            innings_id      INTEGER NOT NULL,
+            bowler_id       INTEGER NOT NULL,
+            phase           TEXT,
+            match_id        TEXT    NOT NULL,
+            batting_team_id INTEGER,
+            competition     INTEGER,
+            year            INTEGER,
+            date_ordinal    INTEGER,
+            venue_id        INTEGER,
+            legal_balls     INTEGER NOT NULL,
+            runs_conceded   INTEGER,
+            wickets         INTEGER NOT NULL,
+            dots            INTEGER NOT NULL,
+            boundaries      INTEGER NOT NULL,
+            PRIMARY KEY (innings_id, bowler_id, phase)
+        );
+
+        INSERT INTO bowling_innings
+        SELECT
+            d.innings_id,
+            d.bowler_id,
+            {PHASE_CASE},
+            d.match_id,
+            d.batting_team_id,
+            d.competition,
+            d.year,
+            d.date_ordinal,
+            d.venue_id,
+            COUNT(CASE WHEN d.extras_type IS NULL
+                OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END),
+            SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL
+                THEN d.runs_total ELSE 0 END),
+            SUM(CASE WHEN d.is_wicket = 1
+                AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
+                THEN 1 ELSE 0 END),
+            COUNT(CASE WHEN d.runs_total = 0
+                AND (d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs')) THEN 1 END),
+            COUNT(CASE WHEN d.runs_batter IN (4, 6) THEN 1 END)
+        FROM deliveries d
+        JOIN matches m ON d.match_id = m.match_id
+        WHERE d.inning IN (1, 2)
+          AND d.bowler_id IS NOT NULL
+        GROUP BY d.innings_id, d.bowler_id, 3;
+
+        CREATE INDEX idx_bowling_innings_bowler
+            ON bowling_innings (bowler_id, competition, year, phase);
+    """)
+
+
+# ── Matchup pairs ────────────────────────────────────────────────────────────
+# Batter-vs-bowler totals per competition. A batter is "involved" in every
+# delivery where they are on strike or at the non-striker's end, which is the
+# row set /api/matchup aggregates (non-striker rows only feed innings and
+# dismissals, e.g. run outs).
+
+def build_matchup_pairs(conn):
+    conn.executescript("""
+        DROP TABLE IF EXISTS matchup_pairs;
+        CREATE TABLE matchup_pairs (
+            batter_id       INTEGER NOT NULL,
+            bowler_id       INTEGER NOT NULL,
+            competition     INTEGER NOT NULL,
+            innings         INTEGER NOT NULL,
+            runs            INTEGER,
+            balls_faced     INTEGER NOT NULL,
+            dot_balls       INTEGER NOT NULL,
+            ones            INTEGER NOT NULL,
+            twos            INTEGER NOT NULL,
+            threes          INTEGER NOT NULL,
+            fours           INTEGER NOT NULL,
+            fives           INTEGER NOT NULL,
+            sixes           INTEGER NOT NULL,
+            dismissals      INTEGER NOT NULL,
+            PRIMARY KEY (batter_id, bowler_id, competition)
+        ) WITHOUT ROWID;
+
+        INSERT INTO matchup_pairs
+        WITH involved AS (
+            SELECT d.batter_id AS player_id, d.innings_id, d.batter_id, d.bowler_id,
+                d.extras_type, d.runs_batter, d.player_out_id, d.wicket_kind,
+                d.competition
+            FROM deliveries d
+            JOIN matches m ON d.match_id = m.match_id
+            WHERE d.inning IN (1, 2)
+            UNION ALL
+            SELECT d.non_striker_id AS player_id, d.innings_id, d.batter_id, d.bowler_id,
+                d.extras_type, d.runs_batter, d.player_out_id, d.wicket_kind,
+                d.competition
+            FROM deliveries d
+            JOIN matches m ON d.match_id = m.match_id
+            WHERE d.inning IN (1, 2)
+              AND d.non_striker_id IS NOT d.batter_id
+        )
+        SELECT
+            player_id,
+            bowler_id,
+            competition,
+            COUNT(DISTINCT innings_id),
+            SUM(CASE WHEN batter_id = player_id THEN runs_batter ELSE 0 END),
+            COUNT(CASE WHEN batter_id = player_id
+                AND (extras_type IS NULL OR extras_type != 'wides') THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 0
+                AND (extras_type IS NULL OR extras_type != 'wides') THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 1 THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 2 THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 3 THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 4 THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 5 THEN 1 END),
+            COUNT(CASE WHEN batter_id = player_id AND runs_batter = 6 THEN 1 END),
+            COUNT(CASE WHEN player_out_id = player_id
+                AND wicket_kind NOT IN ('retired hurt', 'retired not out', 'retired out') THEN 1 END)
+        FROM involved
+        WHERE player_id IS NOT NULL
+          AND bowler_id IS NOT NULL
+          AND competition IS NOT NULL
+        GROUP BY player_id, bowler_id, competition;
+    """)
+
+
+# ── Columnar export ──────────────────────────────────────────────────────────
+# Column files for the optional NumPy engine (STATS_ENGINE=numpy), written to
+# columns/ next to the database and stamped with the generation just set, so
+# a running server maps them once they are complete. See columnar.py.
+
+def build_columns(conn):
+    if not columnar.NUMPY_AVAILABLE:
+        print("⚠️  numpy not installed, skipping columnar export")
+        return
+    columnar.export(conn, columnar.columns_dir_for(conn))
+
+
+# ── Dataset generation ───────────────────────────────────────────────────────
+# Bumped on every build. The API's response cache is dropped when it moves,
+# see cache.py.
+
+def stamp_generation(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS dataset_info (
+            id          INTEGER PRIMARY KEY CHECK (id = 1),
+            generation  INTEGER NOT NULL,
+            built_at    TEXT    NOT NULL
+        );
+        INSERT INTO dataset_info (id, generation, built_at)
+        VALUES (1, 1, datetime('now'))
+        ON CONFLICT (id) DO UPDATE
+            SET generation = generation + 1, built_at = excluded.built_at;
+    """)
+
+
+# ── Alias index ──────────────────────────────────────────────────────────────
+# The assistant's player-name matcher, compiled once here and written to
+# aliases.idx next to the database, stamped with the generation just set.
+# See aliases.py.
+
+def build_alias_index(conn):
+    rows = conn.execute("SELECT unique_name, full_name, known_as FROM players").fetchall()
+    generation = conn.execute("SELECT generation FROM dataset_info").fetchone()[0]
+    matcher = aliases.AliasMatcher.compile(aliases.build_alias_map(rows), generation)
+    matcher.save(aliases.index_path_for(conn))
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+BUILD_STEPS = [
+    build_keys,
+    build_batting_innings,
+    build_bowling_innings,
+    build_matchup_pairs,
+    stamp_generation,
+    build_columns,
+    build_alias_index,
+]
+
+
+def build(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    try:
+        for step in BUILD_STEPS:
+            start = time.perf_counter()
+            step(conn)
+            conn.commit()
+            print(f"✅ {step.__name__} ({time.perf_counter() - start:.1f}s)")
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
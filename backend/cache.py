@@ -0,0 +1,208 @@
+"""In-memory response cache for the read-only stats endpoints.
+
+The data only changes when build_db.py runs, and every build bumps the
+generation number in dataset_info. Entries are keyed on the endpoint plus its
+canonicalized parameters and dropped wholesale when the generation moves, so
+a cached response is never older than the data it was computed from. Within
+a generation entries also expire after their endpoint's TTL, and the least
+recently used ones are evicted once the cache holds more than
+RESPONSE_CACHE_MB of (JSON-encoded) responses.
+
+    @router.get("/profile")
+    @cached("profile")
+    def get_profile(...): ...
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import params as fastapi_params
+
+from database import get_db
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+MAX_BYTES        = int(float(os.environ.get("RESPONSE_CACHE_MB", "64")) * 1024 * 1024)
+GENERATION_CHECK = float(os.environ.get("GENERATION_CHECK_SECONDS", "5"))
+HTTP_MAX_AGE     = int(os.environ.get("HTTP_CACHE_MAX_AGE", "60"))
+
+# Seconds an entry stays fresh within one data generation
+ENDPOINT_TTLS = {
+    "profile":      3600,
+    "comparison":   3600,
+    "matchup":      3600,
+    "stats_player": 900,
+}
+
+_MISS = object()
+
+
+def read_generation(conn):
+    """The data generation stamped by the last build_db.py run (0 if never)."""
+    row = conn.execute("SELECT generation FROM dataset_info").fetchone()
+    return row[0] if row else 0
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+class ResponseCache:
+    """Byte-bounded LRU of responses, invalidated when the data generation changes."""
+
+    def __init__(self, max_bytes=MAX_BYTES, generation_check=GENERATION_CHECK):
+        self.max_bytes        = max_bytes
+        self.generation_check = generation_check
+        self._entries    = OrderedDict()   # key -> (value, size, expires_at)
+        self._bytes      = 0
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock       = threading.Lock()
+        self._stats      = {
+            "hits":          0,
+            "misses":        0,
+            "evictions":     0,   # dropped to stay under max_bytes
+            "expirations":   0,   # dropped because their TTL ran out
+            "invalidations": 0,   # cache cleared for a new data generation
+            "uncacheable":   0,   # single responses larger than max_bytes
+        }
+
+    def generation(self):
+        """Current data generation, re-read from the database at most every few seconds."""
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < self.generation_check:
+            return self._generation
+        with get_db() as conn:
+            generation = read_generation(conn)
+        with self._lock:
+            if generation != self._generation:
+                if self._generation is not None:
+                    self._stats["invalidations"] += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._generation = generation
+            self._checked_at = now
+        return generation
+
+    def get(self, key):
+        self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return _MISS
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, ttl):
+        size = len(json.dumps(value, default=str))
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            entries, size = len(self._entries), self._bytes
+        lookups = s["hits"] + s["misses"]
+        return {
+            "generation": self._generation,
+            "entries":    entries,
+            "bytes":      size,
+            "max_bytes":  self.max_bytes,
+            "hit_ratio":  round(s["hits"] / lookups, 4) if lookups else None,
+            **s,
+        }
+
+
+response_cache = ResponseCache()
+
+
+# ── Keys ─────────────────────────────────────────────────────────────────────
+
+def _canonical(value):
+    if isinstance(value, fastapi_params.Param):
+        value = value.default       # called directly, not through FastAPI
+    if isinstance(value, (list, tuple, set)):
+        return sorted(set(value), key=str)
+    return value
+
+
+def cache_key(endpoint, arguments, normalize=None):
+    """Stable key for an endpoint call: sorted, de-duplicated lists, defaults filled in."""
+    arguments = {name: _canonical(value) for name, value in arguments.items()}
+    if normalize is not None:
+        arguments = normalize(arguments)
+    return json.dumps([endpoint, arguments], sort_keys=True, default=str)
+
+
+def all_events_if_empty(arguments):
+    """Endpoints that read an empty events list as every competition."""
+    return {**arguments, "events": arguments["events"] or ["IPL", "SA20", "T20I"]}
+
+
+def request_etag(generation, path, query_items):
+    """Strong ETag for a GET: the data generation plus the canonical request.
+
+    Repeated parameters (events) are order-insensitive, like the cache keys.
+    """
+    params = {}
+    for name, value in query_items:
+        params.setdefault(name, set()).add(value)
+    canonical = json.dumps([path, {k: sorted(v) for k, v in params.items()}], sort_keys=True)
+    digest = hashlib.sha1(canonical.encode()).hexdigest()[:20]
+    return f'"g{generation}-{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cached(endpoint, normalize=None):
+    """Serve a route from response_cache; the wrapped signature is kept for FastAPI."""
+    ttl = ENDPOINT_TTLS[endpoint]
+
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = cache_key(endpoint, bound.arguments, normalize)
+            value = response_cache.get(key)
+            if value is _MISS:
+                value = func(*args, **kwargs)
+                response_cache.put(key, value, ttl)
+            return value
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,621 @@
+"""Columnar, memory-mapped copy of deliveries for vectorized stat queries.
+
+build_db.py exports every delivery of innings 1 and 2 (joined to its match)
+as one ``.npy`` file per column, strings replaced by integer codes, plus a
+manifest.json holding the code dictionaries. At startup the API maps those
+files read-only and, when ``STATS_ENGINE=numpy``, answers the per-player
+runners (_run_batting, _run_bowling, comparison batting, matchup) with masked
+NumPy reductions instead of SQL CASE aggregates. The SQLite engine stays the
+default and the fallback whenever numpy or the files are missing, or the
+files are from another data generation than the database.
+
+    STATS_ENGINE=numpy uvicorn main:app
+"""
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import dimensions
+from database import DB_PATH, get_db
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+STATS_ENGINE     = os.environ.get("STATS_ENGINE", "sqlite")
+COLUMNS_DIR      = os.environ.get("COLUMNS_DIR", os.path.join(os.path.dirname(DB_PATH), "columns"))
+GENERATION_CHECK = float(os.environ.get("GENERATION_CHECK_SECONDS", "5"))
+FORMAT           = 5
+
+# Mirrors PHASE_FILTERS in routes/stats.py: [first over, last over + 1)
+PHASE_OVERS = {
+    "pp":     (0, 6),
+    "middle": (6, 16),
+    "death":  (16, None),
+}
+
+# Same exclusions as the SQL aggregates
+BATTING_NOT_OUT  = ("retired hurt", "retired not out")
+BOWLING_NOT_OUT  = ("run out", "retired hurt", "retired out", "obstructing the field")
+MATCHUP_NOT_OUT  = ("retired hurt", "retired not out", "retired out")
+
+# Strings become codes into the manifest dictionaries; NULL is -1. Lookup
+# arrays indexed by a code carry one extra trailing entry so -1 lands on a
+# "no match" sentinel instead of wrapping to a real value.
+NULL = -1
+
+DELIVERY_COLUMNS = {
+    "match":        "int32",
+    "inning":       "int8",
+    "over":         "int16",
+    "batter":       "int32",
+    "bowler":       "int32",
+    "non_striker":  "int32",
+    "player_out":   "int32",
+    "batting_team": "int32",
+    "runs_batter":  "int16",
+    "runs_total":   "int16",
+    "extras":       "int8",
+    "is_wicket":    "int8",
+    "wicket_kind":  "int8",
+    "venue":        "int32",
+    "year":         "int16",
+    "date":         "int32",
+    "competition":  "int8",
+}
+# Per-player row lists (stable, so each player's rows stay in ball order)
+INDEXED_COLUMNS = ["batter", "bowler", "non_striker"]
+
+
+def sql_round(value, digits=2):
+    """ROUND() as SQLite does it: half away from zero on the shortest repr."""
+    if value is None:
+        return None
+    q = Decimal(1).scaleb(-digits)
+    return float(Decimal(repr(value)).quantize(q, rounding=ROUND_HALF_UP))
+
+
+def _ratio(num, den, scale=1.0):
+    # ROUND(num * scale / NULLIF(den, 0), 2)
+    if num is None or not den:
+        return None
+    return sql_round(num * scale / den)
+
+
+# ── Export ───────────────────────────────────────────────────────────────────
+
+def columns_dir_for(conn):
+    """The columns/ directory next to the database file conn has open."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return os.path.join(os.path.dirname(path), "columns")
+
+
+def _read_generation(conn):
+    row = conn.execute("SELECT generation FROM dataset_info").fetchone()
+    return row[0] if row else 0
+
+
+def export(conn, out_dir):
+    """Write the column files and manifest for the database conn has open.
+
+    out_dir is a symlink to a directory per build. The files are written to a
+    new one and the link swapped over in a single rename, so a server that has
+    the old files mapped keeps reading them intact (rewriting a mapped .npy in
+    place truncates it under the reader, which dies with SIGBUS).
+    """
+    generation = _read_generation(conn)
+    codes = {name: {} for name in ("players", "teams", "extras", "wicket_kinds")}
+
+    def code(kind, value):
+        if value is None:
+            return NULL
+        table = codes[kind]
+        return table.setdefault(value, len(table))
+
+    for (name,) in conn.execute("SELECT unique_name FROM players ORDER BY unique_name"):
+        code("players", name)
+
+    matches, team1, team2 = {}, [], []
+    cols = {name: [] for name in DELIVERY_COLUMNS}
+    rows = conn.execute("""
+        SELECT d.match_id, d.inning, d.over, d.batter, d.bowler, d.non_striker,
+               d.player_out, d.batting_team, d.runs_batter, d.runs_total,
+               d.extras_type, d.is_wicket, d.wicket_kind, d.venue_id,
+               d.year, d.date_ordinal, d.competition, m.team1, m.team2
+        FROM deliveries d
+        JOIN matches m ON d.match_id = m.match_id
+        WHERE d.inning IN (1, 2)
+        ORDER BY d.match_id, d.inning, d.over, d.ball, d.rowid
+    """)
+    for (match_id, inning, over, batter, bowler, non_striker, player_out, batting_team,
+         runs_batter, runs_total, extras, is_wicket, wicket_kind, venue, year,
+         date_ordinal, competition, t1, t2) in rows:
+        if match_id not in matches:
+            matches[match_id] = len(matches)
+            team1.append(code("teams", t1))
+            team2.append(code("teams", t2))
+        cols["match"].append(matches[match_id])
+        cols["inning"].append(inning)
+        cols["over"].append(NULL if over is None else over)
+        cols["batter"].append(code("players", batter))
+        cols["bowler"].append(code("players", bowler))
+        cols["non_striker"].append(code("players", non_striker))
+        cols["player_out"].append(code("players", player_out))
+        cols["batting_team"].append(code("teams", batting_team))
+        cols["runs_batter"].append(runs_batter or 0)
+        cols["runs_total"].append(runs_total or 0)
+        cols["extras"].append(code("extras", extras))
+        cols["is_wicket"].append(is_wicket or 0)
+        cols["wicket_kind"].append(code("wicket_kinds", wicket_kind))
+        cols["venue"].append(NULL if venue is None else venue)
+        cols["year"].append(NULL if year is None else year)
+        cols["date"].append(NULL if date_ordinal is None else date_ordinal)
+        cols["competition"].append(NULL if competition is None else competition)
+
+    build_dir = f"{out_dir}.g{generation}-{os.getpid()}"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    def save(name, values, dtype):
+        np.save(os.path.join(build_dir, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+    for name, dtype in DELIVERY_COLUMNS.items():
+        save(name, cols[name], dtype)
+    save("match_team1", team1, "int32")
+    save("match_team2", team2, "int32")
+
+    n_players = len(codes["players"])
+    for name in INDEXED_COLUMNS:
+        values = np.asarray(cols[name], dtype="int32")
+        order = np.argsort(values, kind="stable").astype("int32")
+        start = np.searchsorted(values[order], np.arange(n_players + 1))
+        save(f"{name}_order", order, "int32")
+        save(f"{name}_start", start, "int64")
+
+    # Player classes as classified by build_db (dimensions.BOWLER_TYPE_BITS /
+    # BATTER_HAND_CODES, both one bit per key)
+    bowler_type = np.zeros(n_players + 1, dtype="uint16")
+    batter_hand = np.zeros(n_players + 1, dtype="uint16")
+    for name, mask, hand in conn.execute(
+        "SELECT unique_name, bowler_type_mask, batter_hand FROM player_ids"
+    ):
+        if name in codes["players"]:
+            bowler_type[codes["players"][name]] = mask
+            batter_hand[codes["players"][name]] = hand
+    save("player_bowler_type", bowler_type, "uint16")
+    save("player_batter_hand", batter_hand, "uint16")
+
+    manifest = {
+        "format":        FORMAT,
+        "generation":    generation,
+        "rows":          len(cols["match"]),
+        "source_rows":   conn.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0],
+        "bowler_types":  dimensions.BOWLER_TYPES,
+        "batter_hands":  dimensions.BATTER_HANDS,
+        **{kind: list(table) for kind, table in codes.items()},
+    }
+    with open(os.path.join(build_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    _swap_in(build_dir, out_dir)
+
+
+def _swap_in(build_dir, out_dir):
+    # Point out_dir at build_dir, then remove the builds it pointed at before.
+    # Unlinking a mapped file leaves the mapping valid until it is closed.
+    if os.path.isdir(out_dir) and not os.path.islink(out_dir):
+        # A plain directory from before the columns were versioned
+        os.rename(out_dir, f"{out_dir}.old-{os.getpid()}")
+    link = f"{out_dir}.link-{os.getpid()}"
+    os.symlink(os.path.basename(build_dir), link)
+    os.replace(link, out_dir)
+    for old in glob.glob(f"{glob.escape(out_dir)}.*"):
+        if old != build_dir and os.path.isdir(old) and not os.path.islink(old):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+# ── Engine ───────────────────────────────────────────────────────────────────
+
+class ColumnStore:
+    """Read-only, memory-mapped columns plus the runners that aggregate them."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = manifest = json.load(f)
+        if manifest.get("format") != FORMAT:
+            raise ValueError(f"column format {manifest.get('format')} != {FORMAT}")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.col = {name: load(name) for name in DELIVERY_COLUMNS}
+        self.match_team1 = load("match_team1")
+        self.match_team2 = load("match_team2")
+        self.order = {name: load(f"{name}_order") for name in INDEXED_COLUMNS}
+        self.start = {name: load(f"{name}_start") for name in INDEXED_COLUMNS}
+        self.player_bowler_type = load("player_bowler_type")
+        self.player_batter_hand = load("player_batter_hand")
+
+        self.players = {name: i for i, name in enumerate(manifest["players"])}
+        self.teams   = {name: i for i, name in enumerate(manifest["teams"])}
+        self.bowler_types = manifest["bowler_types"]
+        self.batter_hands = manifest["batter_hands"]
+        extras = {name: i for i, name in enumerate(manifest["extras"])}
+        kinds  = {name: i for i, name in enumerate(manifest["wicket_kinds"])}
+        self.wides       = self._codes(extras, ["wides"])
+        self.not_legal   = self._codes(extras, ["wides", "noballs"])
+        self.not_charged = self._codes(extras, ["byes", "legbyes"])
+        self.batting_not_out = self._codes(kinds, BATTING_NOT_OUT)
+        self.bowling_not_out = self._codes(kinds, BOWLING_NOT_OUT)
+        self.matchup_not_out = self._codes(kinds, MATCHUP_NOT_OUT)
+
+    @staticmethod
+    def _codes(table, names):
+        return np.array([table[n] for n in names if n in table], dtype="int32")
+
+    def rows_of(self, column, player):
+        """Row ids where `column` (batter / bowler / non_striker) is `player`."""
+        p = self.players.get(player)
+        if p is None:
+            return np.empty(0, dtype="int32")
+        start = self.start[column]
+        return self.order[column][start[p]:start[p + 1]]
+
+    # ── Row filters ──────────────────────────────────────────────────────────
+
+    def _take(self, rows, *names):
+        return [self.col[name][rows] for name in names]
+
+    def _phase_mask(self, rows, phase):
+        lo, hi = PHASE_OVERS[phase]
+        over = self.col["over"][rows]
+        mask = over >= lo
+        if hi is not None:
+            mask &= over < hi
+        return mask
+
+    def _filter(self, rows, phase=None, events=None, opposition=None,
+                venue=None, year_from=None, date_from=None, date_to=None, batting_side=True):
+        """Apply the filters shared by every runner; returns the surviving rows."""
+        mask = np.ones(len(rows), dtype=bool)
+        if phase and phase != "all" and phase in PHASE_OVERS:
+            mask &= self._phase_mask(rows, phase)
+        codes = dimensions.competition_codes(events)
+        if codes:
+            mask &= np.isin(self.col["competition"][rows], codes)
+        if opposition:
+            o = self.teams.get(opposition, -2)
+            team = self.col["batting_team"][rows]
+            if batting_side:
+                # opposition fielded: in the match, and not the batting side
+                match = self.col["match"][rows]
+                mask &= (self.match_team1[match] == o) | (self.match_team2[match] == o)
+                mask &= (team != o) & (team != NULL)
+            else:
+                mask &= team == o
+        if venue:
+            with get_db() as conn:
+                venue_ids = dimensions.venue_ids(conn.cursor(), venue)
+            mask &= np.isin(self.col["venue"][rows], venue_ids)
+        if year_from:
+            year = self.col["year"][rows]
+            mask &= (year >= int(year_from)) & (year != NULL)
+        if date_from or date_to:
+            day = self.col["date"][rows]
+            mask &= day != NULL
+            if date_from:
+                mask &= day >= date_from.toordinal()
+            if date_to:
+                mask &= day <= date_to.toordinal()
+        return rows[mask]
+
+    def _bit_mask(self, rows, column, masks, keys, key):
+        bit = np.uint16(1 << keys.index(key))
+        return (masks[self.col[column][rows]] & bit) != 0
+
+    # ── Aggregates ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _innings_keys(match, inning):
+        return match.astype("int64") * 2 + (inning - 1)
+
+    def _batting_stats(self, rows, player_code, milestone_runs):
+        match, inning, runs, is_wicket, out, kind = self._take(
+            rows, "match", "inning", "runs_batter", "is_wicket", "player_out", "wicket_kind"
+        )
+        innings = self._innings_keys(match, inning)
+        balls = len(rows)
+        total = int(runs.sum())
+        boundaries = int(np.isin(runs, (4, 6)).sum())
+        dismissals = int((
+            (is_wicket == 1) & (out == player_code) & (kind != NULL)
+            & ~np.isin(kind, self.batting_not_out)
+        ).sum())
+        stats = {
+            "matches":       int(len(np.unique(match))),
+            "innings":       int(len(np.unique(innings))),
+            "runs":          total,
+            "balls_faced":   balls,
+            "avg":           _ratio(total, dismissals),
+            "sr":            _ratio(total, balls, 100.0),
+            "boundary_pct":  _ratio(boundaries, balls, 100.0),
+            "dot_ball_pct":  _ratio(int((runs == 0).sum()), balls, 100.0),
+            "balls_per_bdy": _ratio(balls, boundaries),
+            "dismissals":    dismissals,
+        }
+        if milestone_runs is None:
+            stats["fifties"] = stats["hundreds"] = None
+        else:
+            keys, totals = milestone_runs
+            scores = totals[np.searchsorted(keys, np.unique(innings))]
+            stats["fifties"]  = int(((scores >= 50) & (scores < 100)).sum())
+            stats["hundreds"] = int((scores >= 100).sum())
+        return stats
+
+    def _bowling_stats(self, rows):
+        match, inning, extras, runs_total, runs_batter, is_wicket, kind = self._take(
+            rows, "match", "inning", "extras", "runs_total", "runs_batter", "is_wicket", "wicket_kind"
+        )
+        innings = int(len(np.unique(self._innings_keys(match, inning))))
+        legal = ~np.isin(extras, self.not_legal)
+        legal_balls = int(legal.sum())
+        conceded = int(runs_total[~np.isin(extras, self.not_charged)].sum())
+        wickets = int((
+            (is_wicket == 1) & (kind != NULL) & ~np.isin(kind, self.bowling_not_out)
+        ).sum())
+        return {
+            "matches":            int(len(np.unique(match))),
+            "innings":            innings,
+            "wickets":            wickets,
+            "legal_balls":        legal_balls,
+            "economy":            _ratio(conceded, legal_balls, 6.0),
+            "avg":                _ratio(conceded, wickets),
+            "bowling_sr":         _ratio(legal_balls, wickets),
+            "dot_ball_pct":       _ratio(int(((runs_total == 0) & legal).sum()), legal_balls, 100.0),
+            "boundary_given_pct": _ratio(int(np.isin(runs_batter, (4, 6)).sum()), legal_balls, 100.0),
+            "wkts_per_innings":   _ratio(wickets, innings),
+        }
+
+    # ── Runners (same contracts as routes/stats.py) ─────────────────────────
+
+    def batting_groups(self, player, group_by, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls):
+        """Columnar _run_batting_groups: {group_key: stats} for groups with balls faced."""
+        p = self.players.get(player, -2)
+        faced = self.rows_of("batter", player)
+        faced = faced[~np.isin(self.col["extras"][faced], self.wides)]
+        rows = self._filter(faced, phase, events, opposition, venue, year_from, date_from, date_to)
+        if bowler_type in self.bowler_types:
+            rows = rows[self._bit_mask(rows, "bowler", self.player_bowler_type, self.bowler_types, bowler_type)]
+
+        if group_by == "phase":
+            groups = {ph: self._phase_mask(rows, ph) for ph in PHASE_OVERS}
+        elif group_by == "bowler_type":
+            groups = {
+                bt: self._bit_mask(rows, "bowler", self.player_bowler_type, self.bowler_types, bt)
+                for bt in self.bowler_types
+            }
+        else:
+            groups = {"all": slice(None)}
+
+        milestone_runs = None
+        if not (balls and balls > 0):
+            # Full-innings scores (every ball faced, unfiltered) for fifties / hundreds
+            match, inning, runs = self._take(faced, "match", "inning", "runs_batter")
+            keys, inverse = np.unique(self._innings_keys(match, inning), return_inverse=True)
+            milestone_runs = keys, np.bincount(inverse, weights=runs, minlength=len(keys))
+
+        result = {}
+        for key, selector in groups.items():
+            group = rows[selector]
+            if balls and balls > 0:
+                # Rows are in ball order, so a ball's number within its innings
+                # is its offset from the innings' first row
+                match, inning = self._take(group, "match", "inning")
+                innings = self._innings_keys(match, inning)
+                first = np.searchsorted(innings, innings)
+                group = group[np.arange(len(group)) - first < balls]
+            if len(group):
+                result[key] = self._batting_stats(group, p, milestone_runs)
+        return result
+
+    def bowling_groups(self, player, group_by, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to):
+        """Columnar _run_bowling_groups: {group_key: stats} for groups with deliveries."""
+        rows = self._filter(
+            self.rows_of("bowler", player), phase, events, opposition, venue, year_from, date_from, date_to,
+            batting_side=False,
+        )
+        if batter_hand in self.batter_hands:
+            rows = rows[self._bit_mask(rows, "batter", self.player_batter_hand, self.batter_hands, batter_hand)]
+
+        if group_by == "phase":
+            groups = {ph: self._phase_mask(rows, ph) for ph in PHASE_OVERS}
+        elif group_by == "batter_hand":
+            groups = {
+                bh: self._bit_mask(rows, "batter", self.player_batter_hand, self.batter_hands, bh)
+                for bh in self.batter_hands
+            }
+        else:
+            groups = {"all": slice(None)}
+
+        result = {}
+        for key, selector in groups.items():
+            group = rows[selector]
+            if len(group):
+                result[key] = self._bowling_stats(group)
+        return result
+
+    def comparison_batting(self, players, events):
+        """Columnar compare.get_batting_stats: {player: {bucket: stats}}."""
+        result = {}
+        for player in players:
+            p = self.players.get(player, -2)
+            rows = np.union1d(self.rows_of("batter", player), self.rows_of("non_striker", player))
+            rows = self._filter(rows, events=events)
+            buckets = {"overall": slice(None)}
+            buckets.update({ph: self._phase_mask(rows, ph) for ph in PHASE_OVERS})
+            for key, selector in buckets.items():
+                group = rows[selector]
+                if not len(group):
+                    continue
+                match, inning, batter, non_striker, extras, runs, out, kind = self._take(
+                    group, "match", "inning", "batter", "non_striker", "extras",
+                    "runs_batter", "player_out", "wicket_kind",
+                )
+                on_strike = batter == p
+                faced = on_strike & ~np.isin(extras, self.wides)
+                total = int(runs[on_strike].sum())
+                balls = int(faced.sum())
+                bdy = on_strike & np.isin(runs, (4, 6))
+                is_out = (out == p) & (kind != NULL) & ~np.isin(kind, self.batting_not_out)
+                # Non-striker dismissals have always counted twice
+                dismissals = int(is_out.sum() + (is_out & (non_striker == p)).sum())
+                result.setdefault(player, {})[key] = {
+                    "matches":       int(len(np.unique(match))),
+                    "innings":       int(len(np.unique(self._innings_keys(match, inning)))),
+                    "runs":          total,
+                    "balls_faced":   balls,
+                    "dismissals":    dismissals,
+                    "avg":           _ratio(total, dismissals),
+                    "sr":            _ratio(total, balls, 100.0),
+                    "boundary_pct":  _ratio(int(runs[bdy].sum()), total, 100.0),
+                    "dot_ball_pct":  _ratio(int((faced & (runs == 0)).sum()), balls, 100.0),
+                    "balls_per_bdy": _ratio(balls, int(bdy.sum())),
+                }
+        return result
+
+    def comparison_bowling(self, players, events):
+        """Columnar compare.get_bowling_stats: {player: {bucket: stats}}."""
+        result = {}
+        for player in players:
+            rows = self._filter(self.rows_of("bowler", player), events=events, batting_side=False)
+            buckets = {"overall": slice(None)}
+            buckets.update({ph: self._phase_mask(rows, ph) for ph in PHASE_OVERS})
+            for key, selector in buckets.items():
+                group = rows[selector]
+                if len(group):
+                    result.setdefault(player, {})[key] = self._bowling_stats(group)
+        return result
+
+    def matchup(self, batter, bowler, events):
+        """Columnar get_matchup over the batter's deliveries from one bowler."""
+        p = self.players.get(batter, -2)
+        b = self.players.get(bowler, -2)
+        rows = np.union1d(self.rows_of("batter", batter), self.rows_of("non_striker", batter))
+        codes = dimensions.competition_codes(events) or []
+        rows = rows[self.col["bowler"][rows] == b]
+        rows = rows[np.isin(self.col["competition"][rows], codes)]
+
+        match, inning, on_strike, extras, runs, out, kind = self._take(
+            rows, "match", "inning", "batter", "extras", "runs_batter", "player_out", "wicket_kind"
+        )
+        on_strike = on_strike == p
+        faced = on_strike & ~np.isin(extras, self.wides)
+        counts = {n: int((on_strike & (runs == n)).sum()) for n in range(1, 7)}
+        total = int(runs[on_strike].sum()) if len(rows) else None
+        balls = int(faced.sum())
+        dots = int((faced & (runs == 0)).sum())
+        dismissals = int(((out == p) & (kind != NULL) & ~np.isin(kind, self.matchup_not_out)).sum())
+        return {
+            "innings":      int(len(np.unique(self._innings_keys(match, inning)))),
+            "runs":         total,
+            "balls_faced":  balls,
+            "dot_balls":    dots,
+            "ones":         counts[1],
+            "twos":         counts[2],
+            "threes":       counts[3],
+            "fours":        counts[4],
+            "fives":        counts[5],
+            "sixes":        counts[6],
+            "dismissals":   dismissals,
+            "batter_sr":    _ratio(total, balls, 100.0),
+            "batting_avg":  _ratio(total, dismissals),
+            "dot_ball_pct": _ratio(dots, balls, 100.0),
+            "boundary_pct": _ratio(
+                counts[4] * 4 + counts[6] * 6 if len(rows) else None, total, 100.0
+            ),
+        }
+
+
+# The store routes aggregate with, or None for SQLite. Set by load_engine()
+# at startup and swapped by engine() when the data generation moves; routes
+# call ``columnar.engine()`` once per request and use what it returns.
+ENGINE = None
+
+_engine_lock = threading.Lock()
+_generation  = None   # data generation ENGINE was last loaded (or tried) for
+_checked_at  = 0.0
+
+
+def _open_store(generation):
+    # One build throughout, even if the link is swapped while loading
+    store = ColumnStore(os.path.realpath(COLUMNS_DIR))
+    if store.manifest["generation"] != generation:
+        raise ValueError(
+            f"columns are for generation {store.manifest['generation']}, "
+            f"database is at {generation} (run build_db.py)"
+        )
+    return store
+
+
+def load_engine():
+    global ENGINE, _generation, _checked_at
+    ENGINE = None
+    if STATS_ENGINE != "numpy":
+        return None
+    if not NUMPY_AVAILABLE:
+        print("⚠️  STATS_ENGINE=numpy but numpy is not installed — using SQLite.")
+        return None
+    try:
+        with get_db() as conn:
+            _generation = _read_generation(conn)
+        _checked_at = time.monotonic()
+        store = _open_store(_generation)
+    except Exception as err:
+        print(f"⚠️  Could not load columnar engine from {COLUMNS_DIR}: {err} — using SQLite.")
+        return None
+    print(f"✅ Columnar stats engine ready ({store.manifest['rows']:,} deliveries).")
+    ENGINE = store
+    return store
+
+
+def engine():
+    """The store for the database's current data generation, or None for SQLite.
+
+    The generation is re-read at most every GENERATION_CHECK seconds. When a
+    build has moved it the new columns are mapped; until build_db.py has
+    written them, queries go to SQLite.
+    """
+    global ENGINE, _generation, _checked_at
+    if STATS_ENGINE != "numpy" or not NUMPY_AVAILABLE:
+        return None
+    if time.monotonic() - _checked_at < GENERATION_CHECK:
+        return ENGINE
+    with _engine_lock:
+        now = time.monotonic()
+        if now - _checked_at < GENERATION_CHECK:
+            return ENGINE
+        _checked_at = now
+        with get_db() as conn:
+            generation = _read_generation(conn)
+        if ENGINE is not None and generation == _generation:
+            return ENGINE
+        try:
+            store = _open_store(generation)
+        except Exception as err:
+            if generation != _generation:
+                print(f"⚠️  Columnar engine off for generation {generation}: {err} — using SQLite.")
+            store = None
+        else:
+            print(f"✅ Columnar stats engine reloaded for generation {generation}.")
+        ENGINE, _generation = store, generation
+    return ENGINE
+
+
+def engine_name():
+    return "numpy" if ENGINE is not None else "sqlite"
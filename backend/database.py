@@ -1,8 +1,170 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+from urllib.parse import quote
 
 DB_PATH = "./cricket_assistant.db"
 
+# ── Pool configuration ───────────────────────────────────────────────────────
+# FastAPI runs sync endpoints on a threadpool (40 workers by default), so the
+# pool is sized to keep one warm connection per busy worker without letting a
+# burst open an unbounded number of file handles.
+POOL_SIZE        = int(os.environ.get("DB_POOL_SIZE", "16"))
+POOL_TIMEOUT     = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+STATEMENT_CACHE  = 256                  # compiled statements kept per connection
+MMAP_SIZE        = 256 * 1024 * 1024    # bytes of the db file mapped into memory
+CACHE_SIZE_KIB   = 64 * 1024            # page cache per connection (negative pragma = KiB)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool.
+
+    Routes keep the familiar ``conn = get_db() ... conn.close()`` shape, or use
+    ``with get_db() as conn:`` to release even when the handler raises.
+    """
+
+    _pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Bounded pool of read-only, pre-tuned SQLite connections.
+
+    Connections are opened lazily up to ``size``; after that callers wait up to
+    ``timeout`` seconds for one to be released. Idle connections are reused
+    LIFO so the most recently used page cache stays hot.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path    = path
+        self.size    = size
+        self.timeout = timeout
+        self._idle   = queue.LifoQueue()
+        self._lock   = threading.Lock()
+        self._opened = 0
+        self._stats  = {
+            "acquired":    0,
+            "hits":        0,   # served by an already-open connection
+            "misses":      0,   # had to open a new connection
+            "waits":       0,   # had to block because the pool was exhausted
+            "timeouts":    0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max":   0.0,
+        }
+
+    def _connect(self):
+        uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
+        )
+        conn.row_factory = sqlite3.Row  # returns dict-like rows
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn._pool = self
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            self._record(hit=True, waited_ms=None)
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+            self._record(hit=False, waited_ms=None)
+            return conn
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(
+                f"No database connection available after {self.timeout}s "
+                f"(pool size {self.size})"
+            )
+        self._record(hit=True, waited_ms=(time.perf_counter() - start) * 1000)
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def _record(self, hit, waited_ms):
+        with self._lock:
+            s = self._stats
+            s["acquired"] += 1
+            s["hits" if hit else "misses"] += 1
+            if waited_ms is not None:
+                s["waits"] += 1
+                s["wait_ms_total"] += waited_ms
+                s["wait_ms_max"] = max(s["wait_ms_max"], waited_ms)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            opened = self._opened
+        idle = self._idle.qsize()
+        s["wait_ms_total"] = round(s["wait_ms_total"], 3)
+        s["wait_ms_max"]   = round(s["wait_ms_max"], 3)
+        return {
+            "size":      self.size,
+            "open":      opened,
+            "idle":      idle,
+            "in_use":    opened - idle,
+            "hit_ratio": round(s["hits"] / s["acquired"], 4) if s["acquired"] else None,
+            "wait_ms_avg": round(s["wait_ms_total"] / s["waits"], 3) if s["waits"] else 0.0,
+            **s,
+        }
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            sqlite3.Connection.close(conn)
+            with self._lock:
+                self._opened -= 1
+
+
+_pool = ConnectionPool(DB_PATH)
+
+
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # returns dict-like rows
-    return conn
\ No newline at end of file
+    """Check out a pooled read-only connection; ``close()`` returns it."""
+    return _pool.acquire()
+
+
+def pool_stats():
+    return _pool.stats()
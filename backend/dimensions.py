@@ -0,0 +1,109 @@
+"""Public string parameters -> the integer keys built by build_db.build_keys.
+
+Routes resolve each name once per request and filter on the id columns, so
+comparisons and indexes work on small integers. A name that is not in the
+dimension resolves to MISSING, which matches no row, exactly like comparing
+the unknown string did.
+"""
+
+MISSING = -1
+
+COMPETITIONS = ("IPL", "SA20", "T20I")
+# Small-int competition code, stored in events, deliveries, the per-innings and
+# matchup tables and the column files (NULL when the match has no event)
+COMPETITION_CODES = {comp: i + 1 for i, comp in enumerate(COMPETITIONS)}
+
+
+# Player classes, precomputed by build_db.build_keys. deliveries.bowler_type_mask
+# has bit i set when the bowler is of the i-th type (types overlap: a right-arm
+# off-spinner is "right-orthodox", "off-spin" and "spin"); deliveries.batter_hand
+# holds one code. 0 means unclassified.
+BOWLER_TYPES = [
+    "right-pace", "left-pace", "off-spin", "leg-spin", "right-orthodox",
+    "left-orthodox", "right-wrist", "left-wrist", "pace", "spin",
+]
+BOWLER_TYPE_BITS = {key: 1 << i for i, key in enumerate(BOWLER_TYPES)}
+
+BATTER_HANDS = ["left", "right"]
+BATTER_HAND_CODES = {key: 1 << i for i, key in enumerate(BATTER_HANDS)}
+
+
+def _lookup(cursor, sql, value):
+    if value is None:
+        return MISSING
+    row = cursor.execute(sql, (value,)).fetchone()
+    return row[0] if row else MISSING
+
+
+def player_id(cursor, unique_name):
+    return _lookup(cursor, "SELECT player_id FROM player_ids WHERE unique_name = ?", unique_name)
+
+
+def team_id(cursor, team):
+    return _lookup(cursor, "SELECT team_id FROM teams WHERE team = ?", team)
+
+
+def venue_ids(cursor, text):
+    """Canonical venue_ids whose name or any alias contains text (case-insensitive)."""
+    global _venue_index
+    generation = _lookup(cursor, "SELECT generation FROM dataset_info WHERE id = ?", 1)
+    if _venue_index is None or _venue_index[0] != generation:
+        cursor.execute(
+            "SELECT venue, venue_id FROM venues UNION SELECT alias, venue_id FROM venue_aliases"
+        )
+        _venue_index = (generation, TrigramIndex(cursor.fetchall()))
+    return sorted(_venue_index[1].search(text))
+
+
+def player_ids(cursor, names):
+    """{unique_name: player_id} for the names that exist."""
+    names = list(names)
+    cursor.execute(
+        f"SELECT unique_name, player_id FROM player_ids "
+        f"WHERE unique_name IN ({', '.join('?' * len(names))})",
+        names,
+    )
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def competition_codes(events):
+    """Competition codes of the selected competitions, or None when nothing filters."""
+    codes = [COMPETITION_CODES[e] for e in events or [] if e in COMPETITION_CODES]
+    return codes or None
+
+
+# ── Substring search ─────────────────────────────────────────────────────────
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """In-memory substring search over a fixed list of (name, key) pairs.
+
+    Candidates are the names holding every trigram of the query, confirmed
+    with a plain substring test; queries under three characters check every
+    name.
+    """
+
+    def __init__(self, entries):
+        self.names = [(name.lower(), key) for name, key in entries]
+        self.postings = {}
+        for i, (name, _) in enumerate(self.names):
+            for gram in _trigrams(name):
+                self.postings.setdefault(gram, set()).add(i)
+
+    def search(self, text):
+        """Keys of every name containing text."""
+        text = text.lower()
+        grams = _trigrams(text)
+        if grams:
+            candidates = set.intersection(*(self.postings.get(g, set()) for g in grams))
+        else:
+            candidates = range(len(self.names))
+        return {self.names[i][1] for i in candidates if text in self.names[i][0]}
+
+
+# (data generation, index) built from venues / venue_aliases on first use and
+# rebuilt when build_db.py moves the generation
+_venue_index = None
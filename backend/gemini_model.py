@@ -1,9 +1,31 @@
+import asyncio
 import os
-import sqlite3
 import re
+import threading
+import time
+from aliases import get_matcher
+import intent
+from prompt_retrieval import PromptSelector
+import sql_sandbox
+from question_cache import question_cache
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+try:
+    from google.generativeai import caching
+    CONTEXT_CACHE_AVAILABLE = True
+except ImportError:
+    caching = None
+    CONTEXT_CACHE_AVAILABLE = False
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    # The cached prompt itself is gone (expired, evicted) or not ours: the
+    # errors a retry without it can fix. Anything else is raised as usual.
+    CACHE_GONE_ERRORS = (google_exceptions.NotFound, google_exceptions.PermissionDenied)
+except ImportError:
+    CACHE_GONE_ERRORS = ()
+
 load_dotenv()  # loads backend/.env when running from backend/
 
 # ============================================================
@@ -16,35 +38,16 @@ if _API_KEY:
 else:
     print("⚠️  GEMINI_API_KEY not set — set it in your .env or environment.")
 
+MODEL_NAME       = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+PROMPT_CACHE_TTL = int(os.environ.get("GEMINI_PROMPT_CACHE_TTL", "3600"))   # seconds
+# Send each question only the rules and examples it needs (prompt_retrieval.py)
+PROMPT_RETRIEVAL = os.environ.get("PROMPT_RETRIEVAL", "1") != "0"
+
 # ============================================================
 # PLAYER NAME RESOLVER
-# Build a lookup of {lowercase alias -> unique_name} at startup
-# so user-typed names ("Virat Kohli") map to DB keys ("V Kohli")
+# User-typed names ("Virat Kohli") map to DB keys ("V Kohli") through
+# the alias index build_db.py writes; it is opened on the first question
 # ============================================================
-def _build_alias_map():
-    try:
-        conn = sqlite3.connect("./cricket_assistant.db")
-        cur = conn.cursor()
-        cur.execute("SELECT unique_name, full_name, known_as FROM players")
-        rows = cur.fetchall()
-        conn.close()
-    except Exception as e:
-        print(f"⚠️  Could not build player alias map: {e}")
-        return {}, []
-
-    alias_map = {}
-    for unique_name, full_name, known_as in rows:
-        for alias in [known_as, full_name, unique_name]:
-            if alias and len(alias.strip()) >= 4:
-                key = alias.strip().lower()
-                if key not in alias_map:
-                    alias_map[key] = unique_name
-
-    sorted_aliases = sorted(alias_map.keys(), key=len, reverse=True)
-    return alias_map, sorted_aliases
-
-_ALIAS_MAP, _SORTED_ALIASES = _build_alias_map()
-print(f"✅ Player alias map built: {len(_ALIAS_MAP)} aliases for name resolution.")
 
 
 def resolve_player_names(question):
@@ -53,42 +56,7 @@ def resolve_player_names(question):
     E.g. "Rohit Sharma strike rate" → "RG Sharma strike rate"
     Uses longest-match-first to avoid partial overlaps.
     """
-    lower_q = question.lower()
-    used = [False] * len(question)
-    replacements = []
-
-    for alias in _SORTED_ALIASES:
-        alen = len(alias)
-        idx = 0
-        while idx <= len(lower_q) - alen:
-            pos = lower_q.find(alias, idx)
-            if pos == -1:
-                break
-            end = pos + alen
-
-            before_ok = pos == 0 or not lower_q[pos - 1].isalnum()
-            after_ok  = end >= len(lower_q) or not lower_q[end].isalnum()
-            no_overlap = not any(used[pos:end])
-
-            if before_ok and after_ok and no_overlap:
-                unique_name = _ALIAS_MAP[alias]
-                original    = question[pos:end]
-                if original != unique_name:
-                    replacements.append((pos, end, unique_name, original))
-                    for i in range(pos, end):
-                        used[i] = True
-            idx = pos + 1
-
-    if not replacements:
-        return question
-
-    replacements.sort(key=lambda x: x[0], reverse=True)
-    result = question
-    for start, end, unique_name, original in replacements:
-        print(f"🔁 Resolved: '{original}' → '{unique_name}'")
-        result = result[:start] + unique_name + result[end:]
-
-    return result
+    return get_matcher().resolve(question)
 
 
 # ============================================================
@@ -281,7 +249,7 @@ FROM (
 # ============================================================
 # SYSTEM PROMPT
 # ============================================================
-SYSTEM_PROMPT = f"""You are an expert Cricket SQL Query Generator for a SQLite database.
+SYSTEM_INSTRUCTIONS = """You are an expert Cricket SQL Query Generator for a SQLite database.
 
 CRITICAL INSTRUCTIONS:
 1. Use EXACT column and table names from the schema
@@ -296,7 +264,9 @@ CRITICAL INSTRUCTIONS:
 9. Boundary %: runs from boundaries / total runs scored (not count/balls)
 10. Venue: use m.venue LIKE '%X%', not m.city
 11. Return ONLY the SQL query, no explanation, no markdown fences
-12. Any filter using m.event_name, m.venue, m.season, m.date REQUIRES: JOIN matches m ON d.match_id = m.match_id
+12. Any filter using m.event_name, m.venue, m.season, m.date REQUIRES: JOIN matches m ON d.match_id = m.match_id"""
+
+SYSTEM_PROMPT = f"""{SYSTEM_INSTRUCTIONS}
 
 {LOGIC_BLOCK}"""
 
@@ -543,6 +513,385 @@ ORDER BY m.season DESC;"""],
 ]
 
 
+# ============================================================
+# EXEMPLAR LIBRARY
+# Every few-shot example above plus the shapes below. With prompt
+# retrieval on, each question gets the few that resemble it most
+# (see prompt_retrieval.py) instead of all of FEW_SHOT_HISTORY.
+# ============================================================
+MORE_EXEMPLARS = [
+    ("Most runs in IPL 2024?", """SELECT
+    d.batter,
+    SUM(d.runs_batter) AS runs,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END) AS balls,
+    (SUM(d.runs_batter) * 100.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END), 0)) AS strike_rate
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE m.event_name = 'Indian Premier League'
+AND CAST(SUBSTR(m.date, 1, 4) AS INTEGER) = 2024
+AND d.inning IN (1, 2)
+GROUP BY d.batter
+ORDER BY runs DESC
+LIMIT 10;"""),
+    ("Most wickets in SA20?", """SELECT
+    d.bowler,
+    SUM(CASE WHEN d.is_wicket = 1 AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field') THEN 1 ELSE 0 END) AS wickets,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) AS balls,
+    (SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)) AS economy
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE m.event_name = 'SA20'
+AND d.inning IN (1, 2)
+GROUP BY d.bowler
+ORDER BY wickets DESC
+LIMIT 10;"""),
+    ("Best economy in the death overs in IPL (min 120 balls)?", """SELECT
+    d.bowler,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) AS balls,
+    SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) AS runs,
+    (SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)) AS economy
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2)
+AND d.over >= 16
+GROUP BY d.bowler
+HAVING balls >= 120
+ORDER BY economy ASC
+LIMIT 10;"""),
+    ("Highest strike rate against leg spin in T20Is (min 100 balls)?", """SELECT
+    d.batter,
+    SUM(d.runs_batter) AS runs,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END) AS balls,
+    (SUM(d.runs_batter) * 100.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END), 0)) AS strike_rate
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+JOIN players p_bowler ON d.bowler = p_bowler.unique_name
+WHERE m.event_name NOT IN ('Indian Premier League', 'SA20')
+AND d.inning IN (1, 2)
+AND p_bowler.bowling_style LIKE '%wrist-spin%'
+GROUP BY d.batter
+HAVING balls >= 100
+ORDER BY strike_rate DESC
+LIMIT 10;"""),
+    ("Suryakumar Yadav fifties and hundreds in T20Is?", """SELECT
+    COUNT(CASE WHEN runs >= 50 AND runs < 100 THEN 1 END) AS fifties,
+    COUNT(CASE WHEN runs >= 100 THEN 1 END) AS hundreds,
+    MAX(runs) AS highest
+FROM (
+    SELECT d.match_id, d.inning, SUM(d.runs_batter) AS runs
+    FROM deliveries d
+    JOIN matches m ON d.match_id = m.match_id
+    WHERE d.batter = 'SA Yadav'
+    AND m.event_name NOT IN ('Indian Premier League', 'SA20')
+    AND d.inning IN (1, 2)
+    GROUP BY d.match_id, d.inning
+);"""),
+    ("Chennai Super Kings win percentage when chasing in IPL?", """SELECT
+    COUNT(*) AS matches_chasing,
+    COUNT(CASE WHEN m.winner = 'Chennai Super Kings' THEN 1 END) AS wins,
+    (COUNT(CASE WHEN m.winner = 'Chennai Super Kings' THEN 1 END) * 100.0 /
+        NULLIF(COUNT(CASE WHEN m.winner IS NOT NULL THEN 1 END), 0)) AS win_pct
+FROM matches m
+WHERE m.event_name = 'Indian Premier League'
+AND m.match_id IN (
+    SELECT DISTINCT d.match_id
+    FROM deliveries d
+    WHERE d.inning = 2
+    AND d.batting_team = 'Chennai Super Kings'
+);"""),
+    ("Average first innings score at Eden Gardens in IPL?", """SELECT
+    COUNT(*) AS innings,
+    ROUND(AVG(total), 1) AS avg_first_innings_score,
+    MAX(total) AS highest
+FROM (
+    SELECT d.match_id, SUM(d.runs_total) AS total
+    FROM deliveries d
+    JOIN matches m ON d.match_id = m.match_id
+    WHERE m.venue LIKE '%Eden Gardens%'
+    AND m.event_name = 'Indian Premier League'
+    AND d.inning = 1
+    GROUP BY d.match_id
+);"""),
+    ("Highest team totals in SA20?", """SELECT
+    d.match_id,
+    d.batting_team,
+    m.date,
+    SUM(d.runs_total) AS total
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE m.event_name = 'SA20'
+AND d.inning IN (1, 2)
+GROUP BY d.match_id, d.inning, d.batting_team
+ORDER BY total DESC
+LIMIT 10;"""),
+    ("How many sixes has Andre Russell hit in IPL?", """SELECT
+    COUNT(CASE WHEN d.runs_batter = 6 THEN 1 END) AS sixes,
+    COUNT(CASE WHEN d.runs_batter = 4 THEN 1 END) AS fours,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END) AS balls_faced
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.batter = 'AD Russell'
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2);"""),
+    ("How does Jos Buttler get out in T20Is?", """SELECT
+    d.wicket_kind,
+    COUNT(*) AS dismissals
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.player_out = 'JC Buttler'
+AND d.wicket_kind NOT IN ('retired hurt', 'retired not out')
+AND m.event_name NOT IN ('Indian Premier League', 'SA20')
+AND d.inning IN (1, 2)
+GROUP BY d.wicket_kind
+ORDER BY dismissals DESC;"""),
+    ("Which bowler has dismissed Virat Kohli the most in IPL?", """SELECT
+    d.bowler,
+    COUNT(*) AS dismissals
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.player_out = 'V Kohli'
+AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2)
+GROUP BY d.bowler
+ORDER BY dismissals DESC
+LIMIT 5;"""),
+    ("Heinrich Klaasen strike rate against Mumbai Indians in IPL?", """SELECT
+    SUM(d.runs_batter) AS runs,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END) AS balls,
+    (SUM(d.runs_batter) * 100.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END), 0)) AS strike_rate
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.batter = 'H Klaasen'
+AND (m.team1 = 'Mumbai Indians' OR m.team2 = 'Mumbai Indians')
+AND d.batting_team != 'Mumbai Indians'
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2);"""),
+    ("Jasprit Bumrah wickets and economy season by season in IPL?", """SELECT
+    m.season,
+    SUM(CASE WHEN d.is_wicket = 1 AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field') THEN 1 ELSE 0 END) AS wickets,
+    (SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)) AS economy
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.bowler = 'JJ Bumrah'
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2)
+GROUP BY m.season
+ORDER BY m.season DESC;"""),
+    ("Sunil Narine economy in each phase in IPL?", """SELECT
+    CASE WHEN d.is_powerplay = 1 THEN 'Powerplay'
+         WHEN d.over >= 16 THEN 'Death'
+         ELSE 'Middle' END AS phase,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) AS balls,
+    (SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)) AS economy
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.bowler = 'SP Narine'
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2)
+GROUP BY phase
+ORDER BY MIN(d.over);"""),
+    ("Rashid Khan bowling average vs right handers in IPL since 2023?", """SELECT
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) AS balls,
+    SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) AS runs,
+    SUM(CASE WHEN d.is_wicket = 1 AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field') THEN 1 END) AS wickets,
+    SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes') OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 1.0 /
+        NULLIF(SUM(CASE WHEN d.is_wicket = 1 AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field') THEN 1 END), 0) AS bowling_average
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+JOIN players p_batter ON d.batter = p_batter.unique_name
+WHERE d.bowler = 'Rashid Khan'
+AND m.event_name = 'Indian Premier League'
+AND d.inning IN (1, 2)
+AND p_batter.batting_style = 'Right-hand bat'
+AND CAST(SUBSTR(m.date, 1, 4) AS INTEGER) >= 2023;"""),
+    ("Glenn Maxwell runs and strike rate vs pace in the death overs in T20Is?", """SELECT
+    SUM(d.runs_batter) AS runs,
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END) AS balls,
+    (SUM(d.runs_batter) * 100.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type != 'wides' THEN 1 END), 0)) AS strike_rate
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+JOIN players p_bowler ON d.bowler = p_bowler.unique_name
+WHERE d.batter = 'GJ Maxwell'
+AND m.event_name NOT IN ('Indian Premier League', 'SA20')
+AND d.inning IN (1, 2)
+AND d.over >= 16
+AND p_bowler.bowling_style LIKE '%pace%';"""),
+    ("Faf du Plessis batting average at the Wanderers in SA20?", """SELECT
+    COUNT(DISTINCT CASE WHEN d.inning IN (1, 2) THEN d.match_id || '-' || d.inning END) AS innings,
+    SUM(CASE WHEN d.batter = 'F du Plessis' THEN d.runs_batter ELSE 0 END) AS runs,
+    COUNT(CASE WHEN d.player_out = 'F du Plessis' AND d.wicket_kind NOT IN ('retired hurt', 'retired not out') THEN 1 END) AS dismissals,
+    SUM(CASE WHEN d.batter = 'F du Plessis' THEN d.runs_batter ELSE 0 END) * 1.0 /
+        NULLIF(COUNT(CASE WHEN d.player_out = 'F du Plessis' AND d.wicket_kind NOT IN ('retired hurt', 'retired not out') THEN 1 END), 0) AS average
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE (d.batter = 'F du Plessis' OR d.non_striker = 'F du Plessis')
+AND m.event_name = 'SA20'
+AND m.venue LIKE '%Wanderers%'
+AND d.inning IN (1, 2);"""),
+    ("Kagiso Rabada dot ball percentage in the death overs in T20Is?", """SELECT
+    COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) AS balls,
+    COUNT(CASE WHEN d.runs_total = 0 AND (d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs')) THEN 1 END) AS dot_balls,
+    (COUNT(CASE WHEN d.runs_total = 0 AND (d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs')) THEN 1 END) * 100.0 /
+        NULLIF(COUNT(CASE WHEN d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)) AS dot_ball_pct
+FROM deliveries d
+JOIN matches m ON d.match_id = m.match_id
+WHERE d.bowler = 'K Rabada'
+AND m.event_name NOT IN ('Indian Premier League', 'SA20')
+AND d.inning IN (1, 2)
+AND d.over >= 16;"""),
+]
+
+# (question, sql) pairs: the few-shot history first, then the rest
+EXEMPLARS = [
+    (user["parts"][0].removeprefix("Question: "), model["parts"][0])
+    for user, model in zip(FEW_SHOT_HISTORY[::2], FEW_SHOT_HISTORY[1::2])
+] + MORE_EXEMPLARS
+
+
+# ============================================================
+# GEMINI CLIENT
+# The static part of the prompt (system instruction and, without
+# retrieval, the few-shot history) is uploaded once as cached
+# content and every question is sent against that handle. Where
+# context caching isn't available (older SDK, model or prompt
+# below the caching minimum) one model object carrying the system
+# instruction is reused and the history rides along with each
+# question. With PROMPT_RETRIEVAL on, the system instruction keeps
+# only the always-needed rules; the rule sections and exemplars a
+# question needs are picked per question and sent with it.
+# ============================================================
+class PromptModel:
+    def __init__(self, system_instruction, history, selector=None):
+        self.system_instruction = system_instruction
+        self.history = history
+        self.selector = selector
+        self._lock = threading.Lock()
+        # Built up front (no network call) so no path needs the lock for it
+        self._plain = genai.GenerativeModel(
+            model_name=MODEL_NAME,
+            system_instruction=system_instruction,
+        )
+        self._cached = None
+        self._cache = None
+        self._cache_expires = 0.0
+        self._cache_retry_at = 0.0
+
+    def _cached_model(self):
+        # Model bound to a live prompt cache, or None. Refreshed a minute
+        # before the TTL runs out; failures back off for one TTL.
+        now = time.monotonic()
+        if self._cached is not None and now < self._cache_expires:
+            return self._cached
+        if not CONTEXT_CACHE_AVAILABLE or now < self._cache_retry_at:
+            return None
+        try:
+            self._cache = caching.CachedContent.create(
+                model=f"models/{MODEL_NAME}",
+                display_name="cricket-sql-prompt",
+                system_instruction=self.system_instruction,
+                contents=self.history,
+                ttl=f"{PROMPT_CACHE_TTL}s",
+            )
+            self._cached = genai.GenerativeModel.from_cached_content(cached_content=self._cache)
+            self._cache_expires = now + max(PROMPT_CACHE_TTL - 60, 0)
+            print(f"✅ Gemini prompt cached: {self._cache.name}")
+        except Exception as e:
+            print(f"⚠️  Gemini context caching unavailable ({e}) — sending the prompt with each question.")
+            self._cached, self._cache = None, None
+            self._cache_retry_at = now + PROMPT_CACHE_TTL
+        return self._cached
+
+    def _drop_cache(self, model):
+        # Forget the cache behind model (unless a newer one replaced it),
+        # back off for one TTL and delete it server-side, best effort
+        with self._lock:
+            if self._cached is not model:
+                return
+            cache = self._cache
+            self._cached, self._cache = None, None
+            self._cache_expires = 0.0
+            self._cache_retry_at = time.monotonic() + PROMPT_CACHE_TTL
+        try:
+            cache.delete()
+        except Exception as e:
+            print(f"⚠️  Could not delete cached prompt {cache.name} ({e}).")
+
+    def _current(self):
+        # The cached-prompt model, else None; may create the cache (a network
+        # call, made holding the lock), so async callers run it in a thread
+        with self._lock:
+            return self._cached_model()
+
+    def _cache_failed(self, model, err):
+        # Cache evicted, expired or inaccessible server-side: fall back once
+        print(f"⚠️  Cached prompt failed ({err}) — retrying with the full prompt.")
+        self._drop_cache(model)
+
+    def _turns(self, question):
+        # What follows the static prefix: retrieved exemplars, then the
+        # question with the rule sections it needs
+        if self.selector is None:
+            return [{"role": "user", "parts": [f"Question: {question}"]}]
+        sections, exemplars = self.selector.select(question)
+        turns = []
+        for q, sql in exemplars:
+            turns.append({"role": "user", "parts": [f"Question: {q}"]})
+            turns.append({"role": "model", "parts": [sql]})
+        rules = "\n\n".join(sections)
+        message = f"{rules}\n\nQuestion: {question}" if rules else f"Question: {question}"
+        turns.append({"role": "user", "parts": [message]})
+        return turns
+
+    def generate(self, question):
+        """SQL text for one question; thread-safe, no chat state is kept."""
+        turns = self._turns(question)
+        model = self._current()
+        if model is not None:
+            try:
+                response = model.generate_content(turns)
+            except CACHE_GONE_ERRORS as e:
+                self._cache_failed(model, e)
+            else:
+                return response.text
+        return self._plain.generate_content([*self.history, *turns]).text
+
+    async def generate_async(self, question):
+        """generate() on the SDK's async transport, so a cancelled request cancels the call.
+
+        Whatever takes the lock runs in a worker thread: the lock can be held
+        for a whole CachedContent call and must not stall the event loop.
+        """
+        turns = self._turns(question)
+        model = await asyncio.to_thread(self._current)
+        if model is not None:
+            try:
+                response = await model.generate_content_async(turns)
+            except CACHE_GONE_ERRORS as e:
+                await asyncio.to_thread(self._cache_failed, model, e)
+            else:
+                return response.text
+        response = await self._plain.generate_content_async([*self.history, *turns])
+        return response.text
+
+
+if PROMPT_RETRIEVAL:
+    _selector = PromptSelector(LOGIC_BLOCK, EXEMPLARS)
+    _prompt_model = PromptModel(f"{SYSTEM_INSTRUCTIONS}\n\n{_selector.always()}", [], _selector)
+    print(f"✅ Prompt retrieval on: {len(EXEMPLARS)} exemplars, {len(_selector.sections)} rule sections.")
+else:
+    _prompt_model = PromptModel(SYSTEM_PROMPT, FEW_SHOT_HISTORY)
+
+
 # ============================================================
 # FIX JOINS
 # ============================================================
@@ -576,34 +925,66 @@ def fix_joins(sql):
 # ============================================================
 # QUERY RUNNER
 # ============================================================
-def run_query(question):
-    """Generate SQL from a natural-language question using Gemini and execute it.
+def prepare_question(question):
+    """Resolve player names and look for an answer that needs no LLM call.
 
-    Returns:
-        (sql, columns, rows, error)
+    Returns (resolved question, answer or None); the answer is a run_query
+    tuple from the question cache or the stats fast path (intent.py), or
+    the error for a missing API key.
     """
-    if not _API_KEY:
-        return None, [], [], "GEMINI_API_KEY is not set. Add it to your environment or .env file."
-
     # Resolve player names BEFORE building the prompt
     question = resolve_player_names(question)
     print(f"📝 Question (resolved): {question}")
 
-    try:
-        gemini = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            system_instruction=SYSTEM_PROMPT,
-        )
-        chat = gemini.start_chat(history=FEW_SHOT_HISTORY)
+    cached = question_cache.get(question)
+    if cached is not None:
+        print("⚡ Answered from the question cache.")
+        return question, cached
+
+    fast = intent.answer(question)
+    if fast is not None:
+        print("⚡ Answered from the stats endpoints.")
+        return question, fast
+
+    if not _API_KEY:
+        return question, (None, [], [], "GEMINI_API_KEY is not set. Add it to your environment or .env file.", False)
+    return question, None
 
+
+async def generate_sql_async(question):
+    """The model's raw answer to a resolved question."""
+    print("🤔 Generating SQL...")
+    return await _prompt_model.generate_async(question)
+
+
+def run_query(question):
+    """Generate SQL from a natural-language question using Gemini and execute it.
+
+    Returns:
+        (sql, columns, rows, error, truncated)
+        - truncated: rows stopped at sql_sandbox.MAX_ROWS
+    """
+    question, answer = prepare_question(question)
+    if answer is not None:
+        return answer
+
+    try:
         print("🤔 Generating SQL...")
-        response = chat.send_message(f"Question: {question}")
-        output = response.text.strip()
+        output = _prompt_model.generate(question)
     except Exception as e:
-        return None, [], [], f"Gemini API error: {e}"
+        return None, [], [], f"Gemini API error: {e}", False
 
+    return execute_output(question, output)
+
+
+def execute_output(question, output, cancel=None):
+    """Clean the model's output into one statement, run it and cache the answer.
+
+    cancel is an optional threading.Event that stops the query when set.
+    Returns the run_query tuple.
+    """
     # Clean output
-    sql = output
+    sql = output.strip()
     if "SELECT" in sql:
         sql = sql[sql.index("SELECT"):]
     sql = sql.split("```")[0].strip()
@@ -614,15 +995,9 @@ def run_query(question):
 
     print(f"\n🖥️  Generated SQL:\n{sql}\n")
 
-    # Execute against SQLite
+    # Execute in the sandbox: read-only, time- and row-bounded
     try:
-        conn = sqlite3.connect("./cricket_assistant.db")
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        raw_rows = cursor.fetchall()
-        col_names = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = [dict(zip(col_names, row)) for row in raw_rows]
-        conn.close()
+        col_names, rows, truncated = sql_sandbox.run(sql, cancel=cancel)
 
         if rows:
             print("📊 Results:")
@@ -630,13 +1005,16 @@ def run_query(question):
             print("   " + "-" * (21 * len(col_names)))
             for row in rows:
                 print("   " + " | ".join(f"{str(row[c]):<18}" for c in col_names))
+            if truncated:
+                print(f"   … truncated at {len(rows)} rows")
         else:
             print("📊 No data found.")
 
-        return sql, col_names, rows, None
+        question_cache.put(question, sql, col_names, rows, truncated)
+        return sql, col_names, rows, None, truncated
     except Exception as e:
         print(f"⚠️  SQL Error: {e}")
-        return sql, [], [], str(e)
+        return sql, [], [], str(e), False
 
 
 # ============================================================
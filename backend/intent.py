@@ -0,0 +1,401 @@
+"""Rule-based fast path for the assistant.
+
+Most questions are one of a few shapes: a player, a metric, and filters the
+stats endpoints already take (competition, phase, bowler type or batter
+hand, season), or a batter against a bowler. parse() recognizes those
+shapes in a name-resolved question and answer() serves them from
+routes/stats.get_player_stats and routes/matchup.get_matchup, so they cost a
+local query instead of a Gemini round trip:
+
+    "V Kohli sr vs leg spin in the death overs in IPL"
+        → /api/stats/player?player=V+Kohli&mode=batting&phase=death
+                           &events=IPL&bowler_type=leg-spin
+
+A question is only answered here when every word of it is understood and the
+metric means the same thing on the stats pages as in the model's prompt;
+anything else (venues, teams, rankings, season-by-season, "left arm spin",
+powerplay, batting average, batting boundary %) returns None and goes to
+the model.
+"""
+import re
+import threading
+from datetime import date
+from urllib.parse import urlencode
+
+from aliases import get_matcher
+from question_cache import normalize
+from routes.matchup import get_matchup
+from routes.stats import get_player_stats
+
+ALL_EVENTS = ["IPL", "SA20", "T20I"]
+
+# ── Vocabulary ───────────────────────────────────────────────────────────────
+# Phrases as they read after question_cache.normalize(): lower case, no
+# punctuation, "strike rate" → "sr", "average" → "avg", "against" → "vs" …
+
+COMPETITION_TERMS = {
+    "ipl":  "IPL",
+    "sa20": "SA20",
+    "t20i": "T20I",
+}
+
+PHASE_TERMS = {
+    "powerplay":   "pp",
+    "power play":  "pp",
+    "pp":          "pp",
+    "middle overs": "middle",
+    "middle":      "middle",
+    "death overs": "death",
+    "death":       "death",
+}
+
+# Keys of routes/stats.BOWLER_TYPE_FILTERS. "Left/right arm spin" has no
+# single bowler type and is left to the model.
+BOWLER_TYPE_TERMS = {
+    "pace":                 "pace",
+    "pacers":               "pace",
+    "pacer":                "pace",
+    "pace bowling":         "pace",
+    "seam":                 "pace",
+    "seamers":              "pace",
+    "seamer":               "pace",
+    "fast bowlers":         "pace",
+    "fast bowling":         "pace",
+    "spin":                 "spin",
+    "spinners":             "spin",
+    "spinner":              "spin",
+    "spin bowling":         "spin",
+    "left arm pace":        "left-pace",
+    "left arm pacers":      "left-pace",
+    "left arm seamers":     "left-pace",
+    "left arm seam":        "left-pace",
+    "left arm fast":        "left-pace",
+    "right arm pace":       "right-pace",
+    "right arm pacers":     "right-pace",
+    "right arm seamers":    "right-pace",
+    "right arm seam":       "right-pace",
+    "right arm fast":       "right-pace",
+    "off spin":             "off-spin",
+    "off break":            "off-spin",
+    "off breaks":           "off-spin",
+    "leg spin":             "leg-spin",
+    "wrist spin":           "leg-spin",
+    "wrist spinners":       "leg-spin",
+    "leg break":            "leg-spin",
+    "leg breaks":           "leg-spin",
+    "left arm orthodox":    "left-orthodox",
+    "left arm off spin":    "left-orthodox",
+    "slow left arm":        "left-orthodox",
+    "left arm wrist spin":  "left-wrist",
+    "left arm wrist spinners": "left-wrist",
+    "chinaman":             "left-wrist",
+    "right arm wrist spin": "right-wrist",
+    "right arm leg spin":   "right-wrist",
+}
+
+# Keys of routes/stats.BATTER_HAND_FILTERS
+BATTER_HAND_TERMS = {
+    f"{hand} {term}": hand
+    for hand in ("left", "right")
+    for term in ("handers", "hander", "handed batters", "handed batsmen", "hand batters",
+                 "hand batsmen", "handed", "hand bat", "hand bats")
+}
+BATTER_HAND_TERMS.update({"lefties": "left", "lhb": "left", "rhb": "right"})
+
+MODE_TERMS = {
+    "batting":      "batting",
+    "as a batter":  "batting",
+    "as batter":    "batting",
+    "batter":       "batting",
+    "as a batsman": "batting",
+    "batsman":      "batting",
+    "bowling":      "bowling",
+    "as a bowler":  "bowling",
+    "as bowler":    "bowling",
+    "bowler":       "bowling",
+}
+
+METRIC_TERMS = {
+    "sr":                 "sr",
+    "avg":                "avg",
+    "economy":            "economy",
+    "runs":               "runs",
+    "wickets":            "wickets",
+    "wkts":               "wickets",
+    "dot ball percentage": "dots",
+    "dot ball pct":       "dots",
+    "dot percentage":     "dots",
+    "dot ball":           "dots",
+    "dot balls":          "dots",
+    "dots":               "dots",
+    "boundary percentage": "boundary",
+    "boundary pct":       "boundary",
+    "boundary":           "boundary",
+    "innings":            "innings",
+    "matches":            "matches",
+    "balls faced":        "balls",
+    "balls bowled":       "balls",
+    "balls":              "balls",
+    "dismissals":         "dismissals",
+    "dismissed":          "dismissals",
+    "fifties":            "fifties",
+    "50s":                "fifties",
+    "hundreds":           "hundreds",
+    "centuries":          "hundreds",
+    "100s":               "hundreds",
+    "fours":              "fours",
+    "sixes":              "sixes",
+    "stats":              "all",
+    "statistics":         "all",
+    "record":             "all",
+    "numbers":            "all",
+    "head to head":       "all",
+    "h2h":                "all",
+}
+
+# Words that may be left over once everything above is taken out
+IGNORED = {
+    "vs", "in", "of", "for", "and", "a", "an", "how", "many", "much", "has", "have",
+    "had", "does", "did", "do", "his", "their", "overs", "scored", "taken", "faced",
+    "career", "overall", "total", "all", "t20", "t20s", "cricket",
+}
+
+SLOTS = {
+    "competition": COMPETITION_TERMS,
+    "phase":       PHASE_TERMS,
+    "bowler_type": BOWLER_TYPE_TERMS,
+    "batter_hand": BATTER_HAND_TERMS,
+    "mode":        MODE_TERMS,
+    "metric":      METRIC_TERMS,
+}
+
+_TERMS = {phrase: (slot, value) for slot, terms in SLOTS.items() for phrase, value in terms.items()}
+_TERM_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(t) for t in sorted(_TERMS, key=len, reverse=True)) + r")\b"
+)
+_YEAR_FROM_RE = re.compile(r"\b(?:since|from) ((?:19|20)\d\d)\b|\b((?:19|20)\d\d) onwards\b")
+_SEASON_RE    = re.compile(r"\b(?:19|20)\d\d\b")
+
+# ── Answers ──────────────────────────────────────────────────────────────────
+# Metric → stats columns, per kind of answer. A metric missing here either
+# doesn't exist for that kind or is defined differently on the stats pages
+# than in the model's prompt (batting boundary % counts balls, not runs).
+
+CONTEXT_COLUMNS = {
+    "batting": ["innings", "runs", "balls_faced"],
+    "bowling": ["innings", "legal_balls", "wickets"],
+    "matchup": ["innings", "runs", "balls_faced", "dismissals"],
+}
+
+METRIC_COLUMNS = {
+    "batting": {
+        "runs":       ["runs"],
+        "sr":         ["sr"],
+        "dots":       ["dot_ball_pct"],
+        "innings":    ["innings"],
+        "matches":    ["matches"],
+        "balls":      ["balls_faced"],
+        "fifties":    ["fifties"],
+        "hundreds":   ["hundreds"],
+    },
+    "bowling": {
+        "wickets":    ["wickets"],
+        "economy":    ["economy"],
+        "avg":        ["avg"],
+        "sr":         ["bowling_sr"],
+        "dots":       ["dot_ball_pct"],
+        "innings":    ["innings"],
+        "matches":    ["matches"],
+        "balls":      ["legal_balls"],
+    },
+    "matchup": {
+        "runs":       ["runs"],
+        "sr":         ["batter_sr"],
+        "avg":        ["batting_avg"],
+        "dots":       ["dot_ball_pct"],
+        "boundary":   ["boundary_pct"],
+        "innings":    ["innings"],
+        "balls":      ["balls_faced"],
+        "dismissals": ["dismissals"],
+        "fours":      ["fours"],
+        "sixes":      ["sixes"],
+    },
+}
+
+# Batting metrics left to the model: the prompt's batting average (and the
+# dismissals behind it) counts run outs at the non-striker's end, the per-ball
+# runners only dismissals on strike. They still mean a batting question.
+BATTING_MODEL_ONLY = {"avg", "dismissals"}
+
+# Phases left to the model: its powerplay is d.is_powerplay = 1, the stats
+# route's is overs 0-5, and the two differ on rain-shortened matches.
+PHASES_MODEL_ONLY = {"pp"}
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+
+def parse(question):
+    """The intent of a resolved question as a dict, or None when it fits no template."""
+    mentions = get_matcher().mentions(question)
+    players = [unique_name for _, _, unique_name in mentions]
+    rest, last = [], 0
+    for start, end, _ in mentions:
+        rest.append(question[last:start])
+        last = end
+    rest.append(question[last:])
+    text = normalize(" , ".join(rest))
+
+    found = {slot: set() for slot in SLOTS}
+    years_from = set()
+
+    def take_year_from(m):
+        years_from.add(int(m.group(1) or m.group(2)))
+        return " "
+
+    def take_term(m):
+        slot, value = _TERMS[m.group(0)]
+        found[slot].add(value)
+        return " "
+
+    text = _YEAR_FROM_RE.sub(take_year_from, text)
+    seasons = {int(y) for y in _SEASON_RE.findall(text)}
+    text = _SEASON_RE.sub(" ", text)
+    text = _TERM_RE.sub(take_term, text)
+    if any(word not in IGNORED for word in text.split()):
+        return None
+
+    single = {}
+    for slot in ("phase", "bowler_type", "batter_hand", "mode"):
+        if len(found[slot]) > 1:
+            return None
+        single[slot] = next(iter(found[slot]), None)
+    if len(years_from) + len(seasons) > 1 or single["phase"] in PHASES_MODEL_ONLY:
+        return None
+
+    intent = {
+        "players":     players,
+        "events":      [e for e in ALL_EVENTS if e in found["competition"]],
+        # "stats", "record" … ask for every column
+        "metrics":     set() if "all" in found["metric"] else found["metric"],
+        "year_from":   next(iter(years_from), None),
+        "season":      next(iter(seasons), None),
+        **single,
+    }
+
+    if len(players) == 2:
+        intent["kind"] = "matchup"
+        filtered = any(intent[k] for k in ("phase", "bowler_type", "batter_hand", "year_from", "season"))
+        if filtered or not intent["metrics"] <= set(METRIC_COLUMNS["matchup"]):
+            return None
+        return intent
+
+    if len(players) != 1:
+        return None
+    mode = intent["mode"]
+    if mode is None:
+        bowling_only = set(METRIC_COLUMNS["bowling"]) - set(METRIC_COLUMNS["batting"]) - BATTING_MODEL_ONLY
+        mode = "bowling" if intent["batter_hand"] or intent["metrics"] & bowling_only else "batting"
+    if not intent["metrics"] <= set(METRIC_COLUMNS[mode]):
+        return None
+    if (mode == "batting" and intent["batter_hand"]) or (mode == "bowling" and intent["bowler_type"]):
+        return None
+    intent["kind"] = mode
+    return intent
+
+
+# ── Answering ────────────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+_stats = {
+    "answered":  0,
+    "fallbacks": 0,   # questions handed to the model
+    "errors":    0,   # parsed, but the stats runner failed
+}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        s = dict(_stats)
+    asked = s["answered"] + s["fallbacks"]
+    return {"answered_ratio": round(s["answered"] / asked, 4) if asked else None, **s}
+
+
+def _columns(kind, metrics):
+    columns = list(CONTEXT_COLUMNS[kind])
+    for metric, metric_columns in METRIC_COLUMNS[kind].items():
+        if not metrics or metric in metrics:
+            columns += [c for c in metric_columns if c not in columns]
+    return columns
+
+
+def _matchup(intent):
+    # Either player may have batted to the other: one row per pairing with balls
+    events = intent["events"] or ALL_EVENTS
+    a, b = intent["players"]
+    rows = []
+    for batter, bowler in ((a, b), (b, a)):
+        row = get_matchup(batter, bowler, events)
+        if (row.get("balls_faced") or 0) > 0:
+            rows.append({"batter": batter, "bowler": bowler, **row})
+    params = {"batter": a, "bowler": b, "events": events}
+    return "/api/matchup", params, ["batter", "bowler"], rows
+
+
+def _player(intent):
+    params = {"player": intent["players"][0], "mode": intent["kind"]}
+    if intent["phase"]:
+        params["phase"] = intent["phase"]
+    if intent["events"]:
+        params["events"] = intent["events"]
+    for key in ("bowler_type", "batter_hand", "year_from"):
+        if intent[key]:
+            params[key] = intent[key]
+    if intent["season"]:
+        params["date_from"] = date(intent["season"], 1, 1)
+        params["date_to"] = date(intent["season"], 12, 31)
+
+    result = get_player_stats(
+        player=params["player"],
+        mode=params["mode"],
+        phase=params.get("phase", "all"),
+        events=params.get("events", []),
+        bowler_type=params.get("bowler_type"),
+        batter_hand=params.get("batter_hand"),
+        opposition=None,
+        venue=None,
+        year_from=params.get("year_from"),
+        date_from=params.get("date_from"),
+        date_to=params.get("date_to"),
+        balls=None,
+        group_by=None,
+    )
+    return "/api/stats/player", params, ["player"], [{"player": params["player"], **result["stats"]}]
+
+
+def answer(question):
+    """run_query tuple for a resolved question the stats endpoints can answer, else None.
+
+    The sql field names the endpoint call the answer came from.
+    """
+    intent = parse(question)
+    if intent is None:
+        _count("fallbacks")
+        return None
+    try:
+        served = _matchup(intent) if intent["kind"] == "matchup" else _player(intent)
+    except Exception as e:
+        print(f"⚠️  Fast path failed ({e}) — asking the model.")
+        _count("errors")
+        _count("fallbacks")
+        return None
+
+    path, params, lead, rows = served
+    columns = lead + _columns(intent["kind"], intent["metrics"])
+    sql = f"-- Answered without the model: GET {path}?{urlencode(params, doseq=True)}"
+    _count("answered")
+    return sql, columns, [{c: row.get(c) for c in columns} for row in rows], None, False
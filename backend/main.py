@@ -1,6 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routes import matchup, players, compare, stats, assistant, profile
+from migrations import require_schema
+from columnar import load_engine
+from cache import HTTP_MAX_AGE, etag_matches, request_etag, response_cache
+from routes import matchup, players, compare, stats, assistant, profile, metrics
+
+# Refuse to start on a database that hasn't been built / indexed
+require_schema()
+load_engine()
 
 app = FastAPI()
 
@@ -12,9 +19,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Conditional GET ──────────────────────────────────────────────────────────
+# Read-only endpoints answer with an ETag of the data generation and the
+# canonical query; a matching If-None-Match gets a 304 before any route runs.
+# An encoded response (/api/players) is a different representation and gets
+# the coding in its ETag ("g3-…-br"); those are matched once the route has
+# picked the encoding.
+CONDITIONAL_PATHS = {
+    "/api/profile", "/api/comparison", "/api/matchup", "/api/stats/player",
+    "/api/stats/team", "/api/players", "/api/players/search",
+    "/api/players/suggest", "/api/teams", "/api/venues",
+}
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    if request.method != "GET" or request.url.path not in CONDITIONAL_PATHS:
+        return await call_next(request)
+
+    etag = request_etag(
+        response_cache.generation(), request.url.path, request.query_params.multi_items()
+    )
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={HTTP_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    coding = response.headers.get("content-encoding")
+    if coding:
+        headers["ETag"] = f'{etag[:-1]}-{coding}"'
+        headers["Vary"] = response.headers.get("vary", "Accept-Encoding")
+        if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
 app.include_router(matchup.router, prefix="/api")
 app.include_router(players.router, prefix="/api")
 app.include_router(compare.router, prefix="/api")
 app.include_router(stats.router, prefix="/api")
 app.include_router(assistant.router, prefix="/api")
-app.include_router(profile.router, prefix="/api")
\ No newline at end of file
+app.include_router(profile.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""Versioned schema migrations for cricket_assistant.db.
+
+Each migration is applied once, in order, and the highest applied version is
+recorded in ``PRAGMA user_version``. build_db.py runs ``migrate()`` after
+rebuilding the derived tables; the API calls ``require_schema()`` at startup
+and refuses to serve from a database that is behind or missing indexes.
+
+    python migrations.py            # apply pending migrations + ANALYZE
+    python migrations.py --verify   # report problems, exit 1 if any
+"""
+import sqlite3
+import sys
+
+from database import DB_PATH, get_db
+
+# Almost every stats query restricts deliveries to innings 1 and 2 (super
+# overs excluded). Indexes carrying the same predicate skip super-over rows
+# entirely and are only considered by the planner when the query repeats it,
+# which is the rule the routes already follow.
+REGULAR_INNINGS = "WHERE inning IN (1, 2)"
+
+MIGRATIONS = [
+    (1, "deliveries / matches / players index pack", [
+        # Per-ball batting (_run_batting with phase / bowler type / balls) and
+        # the profile season query: every column they read, keyed by batter.
+        f"""CREATE INDEX IF NOT EXISTS idx_deliveries_batter
+            ON deliveries (batter, match_id, inning, over, ball, extras_type,
+                           runs_batter, is_wicket, player_out, wicket_kind, bowler)
+            {REGULAR_INNINGS}""",
+        # Per-ball bowling (_run_bowling with batter hand), profile season query.
+        f"""CREATE INDEX IF NOT EXISTS idx_deliveries_bowler
+            ON deliveries (bowler, match_id, inning, over, extras_type,
+                           runs_batter, runs_total, is_wicket, wicket_kind, batter)
+            {REGULAR_INNINGS}""",
+        # Non-striker side of (batter = ? OR non_striker = ?) in the comparison
+        # and head-to-head queries, including run-out dismissals.
+        f"""CREATE INDEX IF NOT EXISTS idx_deliveries_non_striker
+            ON deliveries (non_striker, match_id, inning, over, player_out, wicket_kind)
+            {REGULAR_INNINGS}""",
+        # Head-to-head lookups issued by assistant-generated SQL.
+        f"""CREATE INDEX IF NOT EXISTS idx_deliveries_bowler_batter
+            ON deliveries (bowler, batter)
+            {REGULAR_INNINGS}""",
+        # Chasing / defending join in /api/stats/team (inning = 2).
+        """CREATE INDEX IF NOT EXISTS idx_deliveries_match_inning
+            ON deliveries (match_id, inning, batting_team)""",
+        """CREATE INDEX IF NOT EXISTS idx_matches_match_id ON matches (match_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_matches_event ON matches (event_name, match_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_matches_team1 ON matches (team1, match_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_matches_team2 ON matches (team2, match_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_players_unique_name ON players (unique_name)""",
+    ]),
+    (2, "non-striker index covers batter", [
+        # /api/comparison reads the non-striker end separately and needs the
+        # striker to weight run outs; keeps that branch index-only.
+        "DROP INDEX IF EXISTS idx_deliveries_non_striker",
+        f"""CREATE INDEX IF NOT EXISTS idx_deliveries_non_striker
+            ON deliveries (non_striker, match_id, inning, over, player_out, wicket_kind, batter)
+            {REGULAR_INNINGS}""",
+    ]),
+    (3, "narrow text player indexes", [
+        # The routes read deliveries through the integer-keyed covering indexes
+        # build_db.py creates (idx_deliveries_*_id). The text-keyed ones only
+        # serve assistant-generated SQL, which may not restrict innings, so
+        # they become narrow and unconditional.
+        "DROP INDEX IF EXISTS idx_deliveries_batter",
+        "DROP INDEX IF EXISTS idx_deliveries_bowler",
+        "DROP INDEX IF EXISTS idx_deliveries_non_striker",
+        """CREATE INDEX IF NOT EXISTS idx_deliveries_batter ON deliveries (batter, inning)""",
+        """CREATE INDEX IF NOT EXISTS idx_deliveries_bowler ON deliveries (bowler, inning)""",
+        """CREATE INDEX IF NOT EXISTS idx_deliveries_non_striker ON deliveries (non_striker, inning)""",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Indexes created by build_db.py alongside the derived tables; checked here
+# so a database that was migrated but never built is rejected too.
+DERIVED_INDEXES = [
+    "idx_deliveries_batter_id",
+    "idx_deliveries_bowler_id",
+    "idx_deliveries_non_striker_id",
+    "idx_matches_event_id",
+    "idx_batting_innings_batter",
+    "idx_bowling_innings_bowler",
+]
+DERIVED_TABLES = [
+    "player_ids",
+    "teams",
+    "venues",
+    "venue_aliases",
+    "events",
+    "innings",
+    "batting_innings",
+    "bowling_innings",
+    "matchup_pairs",
+    "dataset_info",
+]
+
+
+def _index_names(statements):
+    names = []
+    for sql in statements:
+        words = sql.split()
+        if words[:2] == ["CREATE", "INDEX"]:
+            names.append(words[words.index("EXISTS") + 1])
+    return names
+
+
+def expected_indexes():
+    names = []
+    for _, _, statements in MIGRATIONS:
+        names += _index_names(statements)
+    return names + DERIVED_INDEXES
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending migrations, refresh planner statistics, stamp the version."""
+    version = current_version(conn)
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        with conn:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {number}")
+        print(f"✅ Migration {number}: {description}")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def verify(conn):
+    """Returns a list of human-readable problems (empty when the schema is current)."""
+    problems = []
+    version = current_version(conn)
+    if version < SCHEMA_VERSION:
+        problems.append(f"schema version {version} < required {SCHEMA_VERSION}")
+
+    rows = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'table')"
+    ).fetchall()
+    present = {(r[0], r[1]) for r in rows}
+    for name in DERIVED_TABLES:
+        if ("table", name) not in present:
+            problems.append(f"missing table {name} (run build_db.py)")
+    for name in expected_indexes():
+        if ("index", name) not in present:
+            problems.append(f"missing index {name}")
+    if ("table", "events") in present and conn.execute(
+        "SELECT 1 FROM events WHERE typeof(competition) != 'integer' LIMIT 1"
+    ).fetchone():
+        problems.append("competitions stored as names, not dimensions codes (run build_db.py)")
+    if ("table", "sqlite_stat1") not in present:
+        problems.append("no planner statistics (ANALYZE has not been run)")
+    return problems
+
+
+def require_schema():
+    """Raise at startup if the serving database is not fully migrated."""
+    with get_db() as conn:
+        problems = verify(conn)
+    if problems:
+        raise RuntimeError(
+            "cricket_assistant.db is not ready to serve — run `python build_db.py`:\n  - "
+            + "\n  - ".join(problems)
+        )
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if "--verify" in sys.argv:
+            problems = verify(conn)
+            for p in problems:
+                print(f"⚠️  {p}")
+            if not problems:
+                print(f"✅ Schema version {SCHEMA_VERSION}, all indexes present.")
+            sys.exit(1 if problems else 0)
+        migrate(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,187 @@
+"""Per-question prompt selection for the assistant.
+
+Sending the whole LOGIC_BLOCK and every few-shot example with each question
+costs ~20 KB of prompt, most of it about things the question never touches.
+PromptSelector keeps two BM25 indexes, one over a library of question/SQL
+exemplars and one over the ### sections of LOGIC_BLOCK, and picks for each
+question:
+
+  * the TOP_EXEMPLARS exemplars whose questions score highest;
+  * every section the chosen exemplars' SQL relies on (sections_for_sql);
+  * of the other sections, the TOP_SECTIONS the question scores highest
+    against, with the sections their own SQL relies on;
+  * the ALWAYS sections (schema, super overs, the rules summary), which
+    live in the static system prompt.
+
+    sections, exemplars = selector.select("RG Sharma sr vs leg spin in IPL")
+
+Questions are tokenized with question_cache.normalize, so "strike rate" and
+"SR", "against" and "vs" land on the same terms in questions and documents.
+bench_prompt.py checks the selection offline.
+"""
+import math
+import os
+import re
+from collections import Counter
+
+from question_cache import normalize
+
+TOP_EXEMPLARS = int(os.environ.get("PROMPT_TOP_EXEMPLARS", "3"))
+TOP_SECTIONS  = int(os.environ.get("PROMPT_TOP_SECTIONS", "3"))
+BM25_K1       = 1.2
+BM25_B        = 0.75
+
+# Sections every prompt carries
+ALWAYS = ["DATABASE SCHEMA", "SUPER OVER EXCLUSION", "CRITICAL RULES SUMMARY"]
+
+# SQL an exemplar contains → the sections that explain it. A pattern tuple
+# must match in full.
+SQL_SECTIONS = [
+    (("p_bowler",),                    ["BOWLING STYLES (EXACT VALUES - no abbreviations)",
+                                        "BOWLING TYPE PATTERNS", "JOIN PROTOCOLS"]),
+    (("p_batter",),                    ["BATTING STYLES (EXACT VALUES)", "JOIN PROTOCOLS"]),
+    ((r"m\.event_name",),              ["COMPETITIONS"]),
+    ((r"is_powerplay|d\.over\b",),     ["OVER PHASES"]),
+    ((r"m\.venue|m\.city",),           ["VENUE FILTERING"]),
+    ((r"SUBSTR\(m\.date",),            ["YEAR / DATE FILTERING"]),
+    ((r"!= 'wides'",),                 ["BATTING FORMULAS"]),
+    ((r"non_striker",),                ["NON-STRIKER RULE (CRITICAL)"]),
+    ((r"player_out",),                 ["DISMISSALS (CRITICAL)"]),
+    ((r"'noballs'",),                  ["BOWLING FORMULAS"]),
+    ((r"d\.batter\s*=\s*'", r"d\.bowler\s*=\s*'"), ["HEAD-TO-HEAD (batter vs bowler)"]),
+    ((r"m\.winner",),                  ["TEAM WIN PERCENTAGE"]),
+    ((r"runs\s*>=\s*50",),             ["MILESTONE COUNTS (fifties / hundreds)"]),
+]
+
+# Extra index terms per section: the words questions use for what it covers
+SECTION_KEYWORDS = {
+    "BOWLING STYLES (EXACT VALUES - no abbreviations)":
+        "spinner spin pace pacer seamer off spinner leg spinner wrist orthodox left arm right arm",
+    "BATTING STYLES (EXACT VALUES)":
+        "left handers right handers left handed right handed lefties batter hand",
+    "BOWLING TYPE PATTERNS": "vs spinners pacers seamers leg spin off spin left arm right arm",
+    "COMPETITIONS":          "ipl sa20 t20i t20 international indian premier league",
+    "OVER PHASES":           "powerplay middle overs death overs phase",
+    "VENUE FILTERING":       "at venue ground stadium city",
+    "YEAR / DATE FILTERING": "since year season 2020 2021 2022 2023 2024 2025",
+    "BATTING FORMULAS":      "runs scored batting stats sr avg dot ball percentage boundary balls faced batter",
+    "NON-STRIKER RULE (CRITICAL)": "batting avg runs",
+    "DISMISSALS (CRITICAL)": "dismissed dismissals out get out wicket",
+    "BOWLING FORMULAS":      "bowling economy wickets bowler bowling avg bowling sr dot ball conceded",
+    "HEAD-TO-HEAD (batter vs bowler)": "vs head to head against batter bowler",
+    "TEAM WIN PERCENTAGE":   "team win percentage wins won lost matches head to head record",
+    "MILESTONE COUNTS (fifties / hundreds)": "fifties hundreds centuries 50s 100s highest score milestones",
+}
+
+# Words that say nothing about which rules apply
+STOPWORDS = {
+    "a", "an", "and", "as", "be", "by", "for", "from", "how", "in", "it",
+    "many", "much", "of", "on", "or", "than", "that", "to", "use", "when", "with",
+}
+
+
+def tokens(text):
+    """BM25 terms of text: normalized words, plural s dropped."""
+    words = []
+    for word in normalize(text).split():
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def split_sections(logic_block):
+    """[(heading, text)] for each ### section of LOGIC_BLOCK, in order."""
+    parts = re.split(r"^### (.+)$", logic_block, flags=re.M)
+    return [(heading, f"### {heading}{body.rstrip()}") for heading, body in zip(parts[1::2], parts[2::2])]
+
+
+def sections_for_sql(sql):
+    """Headings of the sections an SQL query relies on."""
+    headings = []
+    for patterns, needed in SQL_SECTIONS:
+        if all(re.search(p, sql, re.IGNORECASE) for p in patterns):
+            headings += [h for h in needed if h not in headings]
+    return headings
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.k1, self.b = k1, b
+        self._docs = [Counter(tokens(d)) for d in documents]
+        self._lengths = [sum(d.values()) for d in self._docs]
+        self._avg_length = sum(self._lengths) / len(self._docs) if self._docs else 0
+        df = Counter(term for d in self._docs for term in d)
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - f + 0.5) / (f + 0.5)) for term, f in df.items()}
+
+    def scores(self, query):
+        terms = [t for t in set(tokens(query)) if t in self._idf]
+        result = []
+        for doc, length in zip(self._docs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+            result.append(sum(
+                self._idf[t] * doc[t] * (self.k1 + 1) / (doc[t] + norm) for t in terms if t in doc
+            ))
+        return result
+
+    def top(self, query, k):
+        """Indexes of the k best-scoring documents with a score above zero, best first."""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda s: (-s[1], s[0]))
+        return [i for i, score in ranked[:k] if score > 0]
+
+
+class PromptSelector:
+    """Picks the LOGIC_BLOCK sections and exemplars one question needs."""
+
+    def __init__(self, logic_block, exemplars, top_exemplars=TOP_EXEMPLARS, top_sections=TOP_SECTIONS):
+        self.sections = split_sections(logic_block)
+        self.exemplars = list(exemplars)           # [(question, sql)]
+        self.top_exemplars = top_exemplars
+        self.top_sections = top_sections
+        self._headings = [heading for heading, _ in self.sections]
+        self._section_index = BM25([
+            f"{text}\n{SECTION_KEYWORDS.get(heading, '')}" for heading, text in self.sections
+        ])
+        self._exemplar_index = BM25([question for question, _ in self.exemplars])
+        # A section's own SQL (the head-to-head template, say) needs the rules it uses
+        self._requires = {
+            heading: [] if heading in ALWAYS else sections_for_sql(text) for heading, text in self.sections
+        }
+
+    def always(self):
+        """Text of the sections every prompt carries, for the static system prompt."""
+        return "\n\n".join(text for heading, text in self.sections if heading in ALWAYS)
+
+    def select(self, question):
+        """(section texts, [(question, sql)]) for one question.
+
+        Sections come back in LOGIC_BLOCK order and leave out ALWAYS, which
+        the system prompt already has.
+        """
+        chosen = self._exemplar_index.top(question, self.top_exemplars)
+        if len(chosen) < self.top_exemplars:
+            # Nothing in the library resembles it: fill from the front
+            chosen += [i for i in range(len(self.exemplars)) if i not in chosen]
+            chosen = chosen[:self.top_exemplars]
+        exemplars = [self.exemplars[i] for i in chosen]
+
+        # The exemplars' rules first; the question's best-scoring sections
+        # among the rest after, with whatever their own SQL relies on
+        wanted = set(ALWAYS)
+        for _, sql in exemplars:
+            wanted.update(sections_for_sql(sql))
+        scores = self._section_index.scores(question)
+        ranked = sorted(
+            (i for i, heading in enumerate(self._headings) if heading not in wanted and scores[i] > 0),
+            key=lambda i: (-scores[i], i),
+        )
+        for i in ranked[:self.top_sections]:
+            wanted.add(self._headings[i])
+            wanted.update(self._requires[self._headings[i]])
+        sections = [text for heading, text in self.sections if heading in wanted and heading not in ALWAYS]
+        return sections, exemplars
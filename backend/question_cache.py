@@ -0,0 +1,225 @@
+"""Question → SQL cache for the assistant.
+
+The same handful of questions get asked over and over. Once a question has
+been answered, its generated SQL and result rows are kept in a small SQLite
+side database (assistant_cache.db next to the data) under a normalized form
+of the question, and asking it again skips Gemini entirely:
+
+    "What is Kohli's SR in T20Is?"  →  "kohli sr t20i"
+
+Keys are taken after resolve_player_names, so every spelling of a player
+already reads as their unique_name. Entries belong to the data generation
+they were computed from (see cache.py) and are dropped when build_db.py
+moves it.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from cache import response_cache
+from database import DB_PATH
+
+CACHE_PATH  = os.environ.get(
+    "ASSISTANT_CACHE_DB", os.path.join(os.path.dirname(DB_PATH), "assistant_cache.db")
+)
+MAX_ENTRIES = int(os.environ.get("ASSISTANT_CACHE_MAX_ENTRIES", "5000"))
+MAX_ROWS    = 5000      # larger results are recomputed rather than stored
+SCHEMA      = 3         # PRAGMA user_version; an older side table is rebuilt
+
+# ── Normalization ────────────────────────────────────────────────────────────
+
+# Phrases that mean the same thing, on lower-cased, punctuation-free text
+SYNONYMS = {
+    "t20is":                     "t20i",
+    "t20 internationals":        "t20i",
+    "t20 international":         "t20i",
+    "indian premier league":     "ipl",
+    "versus":                    "vs",
+    "against":                   "vs",
+    "strike rate":               "sr",
+    "strike rates":              "sr",
+    "strikerate":                "sr",
+    "economy rate":              "economy",
+    "econ":                      "economy",
+    "average":                   "avg",
+    "averages":                  "avg",
+    "legspin":                   "leg spin",
+    "leg spinners":              "leg spin",
+    "leg spinner":               "leg spin",
+    "offspin":                   "off spin",
+    "off spinners":              "off spin",
+    "off spinner":               "off spin",
+}
+# Words that never change what is being asked
+FILLER = {"what", "whats", "is", "are", "the", "please", "show", "me", "tell", "give"}
+
+# What a key is made of: words, decimals, and the symbols that change what is
+# asked ("SR > 150" is not "SR < 150", "50+ scores" is not "50 scores").
+# Other punctuation is dropped.
+_TOKEN_RE = re.compile(r"\d+\.\d+|[<>!]=|<>|[<>=]|(?<=\d)\+|[^\W_]+")
+
+_SYNONYM_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in sorted(SYNONYMS, key=len, reverse=True)) + r")\b"
+)
+
+
+def normalize(question):
+    """Cache key for a (name-resolved) question."""
+    text = question.lower()
+    text = re.sub(r"['’]s\b|['’]", "", text)            # Kohli's → kohli
+    text = " ".join(_TOKEN_RE.findall(text))
+    text = _SYNONYM_RE.sub(lambda m: SYNONYMS[m.group(0)], text)
+    return " ".join(w for w in text.split() if w not in FILLER)
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+class QuestionCache:
+    """Answered questions in a SQLite side table, scoped to one data generation."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._generation = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits":          0,
+            "misses":        0,
+            "stores":        0,
+            "evictions":     0,
+            "invalidations": 0,   # entries dropped for a new data generation
+            "uncacheable":   0,   # results too large or not JSON-serializable
+            "errors":        0,   # side table could not be read or written
+        }
+
+    def _db(self):
+        # Caller holds _lock. Entries from an older generation go as soon as
+        # a newer one is seen.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA:
+                self._conn.execute("DROP TABLE IF EXISTS question_cache")
+            self._conn.executescript(f"""
+                PRAGMA journal_mode = WAL;
+                PRAGMA user_version = {SCHEMA};
+                CREATE TABLE IF NOT EXISTS question_cache (
+                    key         TEXT    PRIMARY KEY,
+                    generation  INTEGER NOT NULL,
+                    question    TEXT    NOT NULL,
+                    sql         TEXT    NOT NULL,
+                    columns     TEXT    NOT NULL,
+                    rows        TEXT    NOT NULL,
+                    truncated   INTEGER NOT NULL,
+                    hits        INTEGER NOT NULL DEFAULT 0,
+                    created_at  REAL    NOT NULL,
+                    used_at     REAL    NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_question_cache_used_at
+                    ON question_cache (used_at);
+            """)
+        generation = response_cache.generation()
+        if generation != self._generation:
+            dropped = self._conn.execute(
+                "DELETE FROM question_cache WHERE generation != ?", (generation,)
+            ).rowcount
+            self._conn.commit()
+            self._stats["invalidations"] += dropped
+            self._generation = generation
+        return self._conn
+
+    def get(self, question):
+        """(sql, columns, rows, None, truncated) for a question answered before, else None."""
+        key = normalize(question)
+        with self._lock:
+            try:
+                conn = self._db()
+                row = conn.execute(
+                    "SELECT sql, columns, rows, truncated FROM question_cache WHERE key = ? AND generation = ?",
+                    (key, self._generation),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE question_cache SET hits = hits + 1, used_at = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                self._failed(e)
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+        sql, columns, rows = row[0], json.loads(row[1]), json.loads(row[2])
+        return sql, columns, [dict(zip(columns, r)) for r in rows], None, bool(row[3])
+
+    def put(self, question, sql, columns, rows, truncated=False):
+        """Remember a successful answer."""
+        try:
+            if len(rows) > MAX_ROWS:
+                raise ValueError("too many rows")
+            encoded = json.dumps([[r[c] for c in columns] for r in rows], allow_nan=False)
+        except (TypeError, ValueError):
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._db()
+                conn.execute("""
+                    INSERT OR REPLACE INTO question_cache
+                        (key, generation, question, sql, columns, rows, truncated,
+                         hits, created_at, used_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+                """, (normalize(question), self._generation, question, sql,
+                      json.dumps(columns), encoded, int(truncated), now, now))
+                evicted = conn.execute("""
+                    DELETE FROM question_cache WHERE key IN (
+                        SELECT key FROM question_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,)).rowcount
+                conn.commit()
+            except sqlite3.Error as e:
+                self._failed(e)
+                return
+            self._stats["stores"] += 1
+            self._stats["evictions"] += evicted
+
+    def _failed(self, err):
+        # An unwritable or locked side table only costs the cache, never the answer
+        if not self._stats["errors"]:
+            print(f"⚠️  Question cache unavailable ({self.path}): {err}")
+        self._stats["errors"] += 1
+        if self._conn is not None and self._conn.in_transaction:
+            self._conn.rollback()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM question_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            entries, stored_hits = 0, 0
+            if self._conn is not None:
+                entries, stored_hits = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM question_cache"
+                ).fetchone()
+        lookups = s["hits"] + s["misses"]
+        return {
+            "generation":  self._generation,
+            "entries":     entries,
+            "max_entries": self.max_entries,
+            "hit_ratio":   round(s["hits"] / lookups, 4) if lookups else None,
+            "stored_hits": stored_hits,   # across every process sharing the file
+            **s,
+        }
+
+
+question_cache = QuestionCache()
@@ -1,13 +1,18 @@
-from fastapi import APIRouter
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
 
 router = APIRouter()
 
 # ── Load model once at server startup ────────────────────────────────────────
-# mlx_lm only works on Apple Silicon. On other platforms the import will fail
-# and the endpoint returns a clear error rather than crashing the server.
+# gemini_model needs google-generativeai and its prompt setup. If the import
+# fails the endpoint returns a clear error rather than crashing the server.
 try:
-    from gemini_model import run_query as _run_query  # noqa: E402
+    from gemini_model import execute_output, generate_sql_async, prepare_question  # noqa: E402
     MODEL_AVAILABLE = True
     print("✅ Gemini Cricket-SQL assistant ready.")
 except Exception as _load_err:
@@ -15,24 +20,145 @@ except Exception as _load_err:
     _load_err_msg = str(_load_err)
     print(f"⚠️  Could not load gemini_model: {_load_err_msg}")
 
+# ── Concurrency ──────────────────────────────────────────────────────────────
+# The assistant never runs on FastAPI's threadpool, which the stats routes
+# need. Gemini calls are awaited on the event loop, at most LLM_CONCURRENCY
+# at a time; name resolution, the question cache and the generated SQL run
+# on a small executor of their own. A client that disconnects cancels its
+# Gemini call and interrupts its query.
+
+LLM_CONCURRENCY = int(os.environ.get("ASSISTANT_LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT     = float(os.environ.get("ASSISTANT_LLM_TIMEOUT", "60"))     # seconds per call
+SQL_WORKERS     = int(os.environ.get("ASSISTANT_SQL_WORKERS", "2"))
+
+_llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+_sql_executor = ThreadPoolExecutor(max_workers=SQL_WORKERS, thread_name_prefix="assistant-sql")
+
+_gauges_lock = threading.Lock()
+_gauges = {
+    "waiting_llm": 0,   # requests queued for a Gemini slot
+    "in_llm":      0,
+    "waiting_sql": 0,   # work queued for the SQL executor
+    "in_sql":      0,
+    "completed":   0,
+    "timeouts":    0,
+    "cancelled":   0,   # clients that went away mid-request
+}
+
+
+def _gauge(name, delta):
+    with _gauges_lock:
+        _gauges[name] += delta
+
+
+def queue_stats():
+    with _gauges_lock:
+        gauges = dict(_gauges)
+    return {"llm_concurrency": LLM_CONCURRENCY, "sql_workers": SQL_WORKERS, **gauges}
+
+
+class ClientGone(Exception):
+    pass
+
+
+async def _until_disconnected(request):
+    # The body is already read, so the next message is the disconnect.
+    # (Request.is_disconnected() polls with an instant timeout, which never
+    # sees it through the conditional-GET middleware.)
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _unless_disconnected(request, awaitable, cancel):
+    """await awaitable, or cancel it (and set cancel) if the client leaves first."""
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_until_disconnected(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if not task.done():
+        cancel.set()
+        task.cancel()
+        raise ClientGone()
+    return task.result()
+
+
+async def _on_sql_executor(fn, *args):
+    _gauge("waiting_sql", 1)
+
+    def job():
+        _gauge("waiting_sql", -1)
+        _gauge("in_sql", 1)
+        try:
+            return fn(*args)
+        finally:
+            _gauge("in_sql", -1)
+
+    future = asyncio.get_running_loop().run_in_executor(_sql_executor, job)
+    try:
+        return await future
+    except asyncio.CancelledError:
+        if future.cancel():     # never started: job() won't balance the gauge
+            _gauge("waiting_sql", -1)
+        raise
+
+
+async def _generate(question):
+    _gauge("waiting_llm", 1)
+    waiting = True
+    try:
+        async with _llm_slots:
+            _gauge("waiting_llm", -1)
+            waiting = False
+            _gauge("in_llm", 1)
+            try:
+                return await asyncio.wait_for(generate_sql_async(question), LLM_TIMEOUT)
+            finally:
+                _gauge("in_llm", -1)
+    finally:
+        if waiting:
+            _gauge("waiting_llm", -1)
+
 
 class AskRequest(BaseModel):
     question: str
 
 
+def _response(answer):
+    sql, columns, rows, error, truncated = answer
+    if error:
+        return {"error": error, "sql": sql, "columns": [], "rows": [], "truncated": False}
+    return {"sql": sql, "columns": columns, "rows": rows, "error": None, "truncated": truncated}
+
+
 @router.post("/assistant")
-def ask(req: AskRequest):
+async def ask(req: AskRequest, request: Request):
     if not MODEL_AVAILABLE:
-        return {
-            "error": "Model unavailable — mlx_lm could not be loaded on this machine.",
-            "sql": None,
-            "columns": [],
-            "rows": [],
-        }
-
-    sql, columns, rows, error = _run_query(req.question)
+        error = f"Model unavailable — gemini_model could not be loaded: {_load_err_msg}"
+        return _response((None, [], [], error, False))
 
-    if error:
-        return {"error": error, "sql": sql, "columns": [], "rows": []}
+    cancel = threading.Event()
+    try:
+        question, answer = await _unless_disconnected(
+            request, _on_sql_executor(prepare_question, req.question), cancel
+        )
+        if answer is None:
+            try:
+                output = await _unless_disconnected(request, _generate(question), cancel)
+            except asyncio.TimeoutError:
+                _gauge("timeouts", 1)
+                return _response((None, [], [], f"Gemini did not answer within {LLM_TIMEOUT:g}s.", False))
+            except ClientGone:
+                raise
+            except Exception as e:
+                return _response((None, [], [], f"Gemini API error: {e}", False))
+            answer = await _unless_disconnected(
+                request, _on_sql_executor(execute_output, question, output, cancel), cancel
+            )
+    except ClientGone:
+        _gauge("cancelled", 1)
+        return _response((None, [], [], "Request cancelled.", False))
 
-    return {"sql": sql, "columns": columns, "rows": rows, "error": None}
+    _gauge("completed", 1)
+    return _response(answer)
@@ -1,153 +1,139 @@
 from fastapi import APIRouter, Query
 from typing import List
 from database import get_db
+from cache import all_events_if_empty, cached
+import columnar
+import dimensions
+from routes.stats import BOWLING_INNINGS_AGGREGATES, _event_filter, _group_fan_out, _empty_bowling
 
 router = APIRouter()
 
-COMP_FILTERS = {
-    "IPL":  "m.event_name = 'Indian Premier League'",
-    "SA20": "m.event_name = 'SA20'",
-    "T20I": "m.event_name NOT IN ('Indian Premier League', 'SA20')",
-}
-
 PHASE_FILTERS = {
     "pp":     "d.over >= 0 AND d.over < 6",
     "middle": "d.over >= 6 AND d.over < 16",
     "death":  "d.over >= 16",
 }
 
-def build_event_clause(events):
-    if not events:
-        events = ["IPL", "SA20", "T20I"]
-    filters = [COMP_FILTERS[e] for e in events if e in COMP_FILTERS]
-    return f"AND ({' OR '.join(filters)})"
+# Every comparison bucket: the whole innings plus each phase
+BATTING_BUCKETS = {"overall": "1 = 1", **PHASE_FILTERS}
+BOWLING_BUCKETS = {
+    "overall": "1 = 1",
+    **{ph: f"bw.phase = '{ph}'" for ph in PHASE_FILTERS},
+}
 
-def get_batting_stats(cursor, player, event_clause, phase_filter="1=1"):
+# A player is involved in a delivery on strike or at the non-striker's end.
+# Each end is read through its own index; non-striker rows only carry what
+# matches / innings / dismissals need. Dismissals at the non-striker's end
+# (run outs) have always counted twice, hence out_weight.
+FACED = "d.batter_id = d.player_id AND (d.extras_type IS NULL OR d.extras_type != 'wides')"
+OUT = "d.player_out_id = d.player_id AND d.wicket_kind NOT IN ('retired hurt', 'retired not out')"
+RUNS = "SUM(CASE WHEN d.batter_id = d.player_id THEN d.runs_batter ELSE 0 END)"
+DISMISSALS = f"SUM(CASE WHEN {OUT} THEN d.out_weight ELSE 0 END)"
+
+def _empty_comparison_batting():
+    """What the comparison batting aggregates return over zero deliveries."""
+    return {
+        "matches": 0, "innings": 0, "runs": None, "balls_faced": 0,
+        "dismissals": 0, "avg": None, "sr": None, "boundary_pct": None,
+        "dot_ball_pct": None, "balls_per_bdy": None,
+    }
+
+def get_batting_stats(cursor, ids, events):
+    """Batting for every player and bucket from one pass over their deliveries.
+
+    ids is {player: player_id}.
+    Returns {player: {bucket: stats}} for buckets with at least one delivery.
+    """
+    event_clause, event_params = _event_filter("d.competition", events)
+    event_clause = f"AND {event_clause}" if event_clause else ""
+    fan_out, in_bucket = _group_fan_out(BATTING_BUCKETS)
+    in_players = f"IN ({', '.join('?' * len(ids))})"
     cursor.execute(f"""
+        WITH involved AS (
+            SELECT d.batter_id AS player_id, d.match_id, d.innings_id, d.over, d.batter_id,
+                d.extras_type, d.runs_batter, d.player_out_id, d.wicket_kind, 1 AS out_weight
+            FROM deliveries d
+            WHERE d.batter_id {in_players}
+            AND d.inning IN (1, 2)
+            {event_clause}
+            UNION ALL
+            SELECT d.non_striker_id, d.match_id, d.innings_id, d.over, NULL, NULL,
+                NULL, d.player_out_id, d.wicket_kind,
+                CASE WHEN d.batter_id IS d.non_striker_id THEN 1 ELSE 2 END
+            FROM deliveries d
+            WHERE d.non_striker_id {in_players}
+            AND d.inning IN (1, 2)
+            {event_clause}
+        )
         SELECT
+            d.player_id,
+            g.grp,
             COUNT(DISTINCT d.match_id) AS matches,
-            COUNT(DISTINCT CASE WHEN d.inning IN (1,2)
-                THEN d.match_id || '-' || d.inning END) AS innings,
-            SUM(CASE WHEN d.batter = ? THEN d.runs_batter ELSE 0 END) AS runs,
-            COUNT(CASE WHEN d.batter = ?
-                AND (d.extras_type IS NULL OR d.extras_type != 'wides')
-                THEN 1 END) AS balls_faced,
-            COUNT(CASE WHEN d.player_out = ?
-                AND d.wicket_kind NOT IN ('retired hurt', 'retired not out')
-                THEN 1 END) +
-            (SELECT COUNT(*) FROM deliveries d2
-                JOIN matches m2 ON d2.match_id = m2.match_id
-                WHERE d2.non_striker = ?
-                AND d2.player_out = ?
-                AND d2.wicket_kind NOT IN ('retired hurt', 'retired not out')
-                AND d2.inning IN (1, 2)
-                AND ({phase_filter.replace('d.', 'd2.')})
-                {event_clause.replace('m.', 'm2.')}
-            ) AS dismissals,
-            ROUND(SUM(CASE WHEN d.batter = ? THEN d.runs_batter ELSE 0 END) * 1.0 /
-                NULLIF(
-                    COUNT(CASE WHEN d.player_out = ?
-                        AND d.wicket_kind NOT IN ('retired hurt', 'retired not out')
-                        THEN 1 END) +
-                    (SELECT COUNT(*) FROM deliveries d2
-                        JOIN matches m2 ON d2.match_id = m2.match_id
-                        WHERE d2.non_striker = ?
-                        AND d2.player_out = ?
-                        AND d2.wicket_kind NOT IN ('retired hurt', 'retired not out')
-                        AND d2.inning IN (1, 2)
-                        AND ({phase_filter.replace('d.', 'd2.')})
-                        {event_clause.replace('m.', 'm2.')}
-                    )
-                , 0), 2) AS avg,
-            ROUND(SUM(CASE WHEN d.batter = ? THEN d.runs_batter ELSE 0 END) * 100.0 /
-                NULLIF(COUNT(CASE WHEN d.batter = ?
-                    AND (d.extras_type IS NULL OR d.extras_type != 'wides')
-                    THEN 1 END), 0), 2) AS sr,
-            ROUND(SUM(CASE WHEN d.batter = ? AND d.runs_batter IN (4,6)
+            COUNT(DISTINCT d.innings_id) AS innings,
+            {RUNS} AS runs,
+            COUNT(CASE WHEN {FACED} THEN 1 END) AS balls_faced,
+            {DISMISSALS} AS dismissals,
+            ROUND({RUNS} * 1.0 / NULLIF({DISMISSALS}, 0), 2) AS avg,
+            ROUND({RUNS} * 100.0 /
+                NULLIF(COUNT(CASE WHEN {FACED} THEN 1 END), 0), 2) AS sr,
+            ROUND(SUM(CASE WHEN d.batter_id = d.player_id AND d.runs_batter IN (4,6)
                     THEN d.runs_batter ELSE 0 END) * 100.0 /
-                NULLIF(SUM(CASE WHEN d.batter = ? THEN d.runs_batter ELSE 0 END), 0), 2) AS boundary_pct,
-            ROUND(COUNT(CASE WHEN d.batter = ? AND d.runs_batter = 0
-                    AND (d.extras_type IS NULL OR d.extras_type != 'wides')
-                    THEN 1 END) * 100.0 /
-                NULLIF(COUNT(CASE WHEN d.batter = ?
-                    AND (d.extras_type IS NULL OR d.extras_type != 'wides')
-                    THEN 1 END), 0), 2) AS dot_ball_pct,
-            ROUND(COUNT(CASE WHEN d.batter = ?
-                    AND (d.extras_type IS NULL OR d.extras_type != 'wides')
-                    THEN 1 END) * 1.0 /
-                NULLIF(COUNT(CASE WHEN d.batter = ?
+                NULLIF({RUNS}, 0), 2) AS boundary_pct,
+            ROUND(COUNT(CASE WHEN {FACED} AND d.runs_batter = 0 THEN 1 END) * 100.0 /
+                NULLIF(COUNT(CASE WHEN {FACED} THEN 1 END), 0), 2) AS dot_ball_pct,
+            ROUND(COUNT(CASE WHEN {FACED} THEN 1 END) * 1.0 /
+                NULLIF(COUNT(CASE WHEN d.batter_id = d.player_id
                     AND d.runs_batter IN (4,6) THEN 1 END), 0), 2) AS balls_per_bdy
-        FROM deliveries d
-        JOIN matches m ON d.match_id = m.match_id
-        WHERE (d.batter = ? OR d.non_striker = ?)
-        AND d.inning IN (1, 2)
-        AND ({phase_filter})
-        {event_clause}
-    """, (
-        player,          # runs
-        player,          # balls_faced
-        player,          # dismissals striker
-        player, player,  # dismissals non-striker subquery
-        player,          # avg numerator
-        player,          # avg denom striker
-        player, player,  # avg denom non-striker subquery
-        player, player,  # sr
-        player, player,  # boundary_pct
-        player, player,  # dot_ball_pct
-        player, player,  # balls_per_bdy
-        player, player,  # WHERE
-    ))
-    row = cursor.fetchone()
-    return dict(row) if row else {}
-
-def get_bowling_stats(cursor, player, event_clause, phase_filter="1=1"):
+        FROM involved d
+        {fan_out}
+        WHERE {in_bucket}
+        GROUP BY d.player_id, g.grp
+    """, (*ids.values(), *event_params, *ids.values(), *event_params))
+
+    return _by_player(cursor, ids)
+
+def get_bowling_stats(cursor, ids, events):
+    """Bowling for every player and bucket in one query over bowling_innings.
+
+    ids is {player: player_id}.
+    Returns {player: {bucket: stats}} for buckets with at least one delivery.
+    """
+    event_clause, event_params = _event_filter("bw.competition", events)
+    comp_clause = f"AND {event_clause}" if event_clause else ""
+    fan_out, in_bucket = _group_fan_out(BOWLING_BUCKETS)
     cursor.execute(f"""
         SELECT
-            COUNT(DISTINCT d.match_id) AS matches,
-            COUNT(DISTINCT d.match_id || '-' || d.inning) AS innings_bowled,
-            SUM(CASE WHEN d.is_wicket = 1
-                AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
-                THEN 1 ELSE 0 END) AS wickets,
-            COUNT(CASE WHEN d.extras_type IS NULL
-                OR d.extras_type NOT IN ('wides', 'noballs')
-                THEN 1 END) AS legal_balls,
-            ROUND(SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes')
-                    OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
-                NULLIF(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0), 2) AS economy,
-            ROUND(SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes')
-                    OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 1.0 /
-                NULLIF(SUM(CASE WHEN d.is_wicket = 1
-                    AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
-                    THEN 1 ELSE 0 END), 0), 2) AS avg,
-            ROUND(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END) * 1.0 /
-                NULLIF(SUM(CASE WHEN d.is_wicket = 1
-                    AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
-                    THEN 1 ELSE 0 END), 0), 2) AS bowling_sr,
-            ROUND(COUNT(CASE WHEN d.runs_total = 0
-                    AND (d.extras_type IS NULL OR d.extras_type NOT IN ('wides', 'noballs'))
-                    THEN 1 END) * 100.0 /
-                NULLIF(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0), 2) AS dot_ball_pct,
-            ROUND(COUNT(CASE WHEN d.runs_batter IN (4,6) THEN 1 END) * 100.0 /
-                NULLIF(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0), 2) AS boundary_given_pct,
-            ROUND(SUM(CASE WHEN d.is_wicket = 1
-                    AND d.wicket_kind NOT IN ('run out', 'retired hurt', 'retired out', 'obstructing the field')
-                    THEN 1 ELSE 0 END) * 1.0 /
-                NULLIF(COUNT(DISTINCT d.match_id || '-' || d.inning), 0), 2) AS wkts_per_innings
-        FROM deliveries d
-        JOIN matches m ON d.match_id = m.match_id
-        WHERE d.bowler = ?
-        AND d.inning IN (1, 2)
-        AND ({phase_filter})
-        {event_clause}
-    """, (player,))
-    row = cursor.fetchone()
-    return dict(row) if row else {}
+            bw.bowler_id AS player_id,
+            g.grp,{BOWLING_INNINGS_AGGREGATES}
+        FROM bowling_innings bw
+        {fan_out}
+        WHERE bw.bowler_id IN ({', '.join('?' * len(ids))})
+        {comp_clause}
+        AND {in_bucket}
+        GROUP BY 1, 2
+    """, (*ids.values(), *event_params))
+
+    stats = _by_player(cursor, ids)
+    return {
+        player: {key: _innings_bowled(s) for key, s in buckets.items()}
+        for player, buckets in stats.items()
+    }
+
+def _by_player(cursor, ids):
+    names = {player_id: player for player, player_id in ids.items()}
+    stats = {}
+    for row in cursor.fetchall():
+        stats.setdefault(names[row["player_id"]], {})[row["grp"]] = {
+            k: row[k] for k in row.keys() if k not in ("player_id", "grp")
+        }
+    return stats
+
+def _innings_bowled(stats):
+    # The comparison payload has always called this "innings_bowled"
+    return {("innings_bowled" if k == "innings" else k): v for k, v in stats.items()}
 
 @router.get("/comparison")
+@cached("comparison", normalize=all_events_if_empty)
 def get_comparison(
     player1: str,
     player2: str,
@@ -156,39 +142,43 @@ def get_comparison(
     if not events:
         events = ["IPL", "SA20", "T20I"]
 
-    event_clause = build_event_clause(events)
-    conn = get_db()
-    cursor = conn.cursor()
+    players = list(dict.fromkeys([player1, player2]))
+    store = columnar.engine()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        ids = dimensions.player_ids(cursor, players)
+        if not ids:
+            batting, bowling = {}, {}
+        elif store is not None:
+            batting = store.comparison_batting(players, events)
+            bowling = {
+                player: {key: _innings_bowled(stats) for key, stats in buckets.items()}
+                for player, buckets in store.comparison_bowling(players, events).items()
+            }
+        else:
+            batting = get_batting_stats(cursor, ids, events)
+            bowling = get_bowling_stats(cursor, ids, events)
 
     response = {}
-
     for label, player in [("player1", player1), ("player2", player2)]:
-        # Overall batting
-        batting_overall = get_batting_stats(cursor, player, event_clause)
-
-        # Phase batting
-        batting_phases = {}
-        for phase, phase_filter in PHASE_FILTERS.items():
-            batting_phases[phase] = get_batting_stats(cursor, player, event_clause, phase_filter)
+        bat = batting.get(player, {})
+        bowl = bowling.get(player, {})
 
-        # Overall bowling
-        bowling_overall = get_bowling_stats(cursor, player, event_clause)
+        def bat_bucket(key):
+            return bat.get(key) or _empty_comparison_batting()
 
-        # Phase bowling
-        bowling_phases = {}
-        for phase, phase_filter in PHASE_FILTERS.items():
-            bowling_phases[phase] = get_bowling_stats(cursor, player, event_clause, phase_filter)
+        def bowl_bucket(key):
+            return bowl.get(key) or _innings_bowled(_empty_bowling())
 
         response[label] = {
             "batting": {
-                "overall": batting_overall,
-                "phases":  batting_phases,
+                "overall": bat_bucket("overall"),
+                "phases":  {ph: bat_bucket(ph) for ph in PHASE_FILTERS},
             },
             "bowling": {
-                "overall": bowling_overall,
-                "phases":  bowling_phases,
+                "overall": bowl_bucket("overall"),
+                "phases":  {ph: bowl_bucket(ph) for ph in PHASE_FILTERS},
             }
         }
 
-    conn.close()
-    return response
\ No newline at end of file
+    return response
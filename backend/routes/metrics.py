@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from database import pool_stats
+import columnar
+import intent
+from cache import response_cache
+from question_cache import question_cache
+from routes.assistant import queue_stats
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics():
+    return {
+        "db_pool": pool_stats(),
+        "stats_engine": columnar.engine_name(),
+        "response_cache": response_cache.stats(),
+        "question_cache": question_cache.stats(),
+        "assistant": queue_stats(),
+        "assistant_fast_path": intent.stats(),
+    }
@@ -1,8 +1,29 @@
-from fastapi import APIRouter
+import bisect
+import gzip
+import heapq
+import json
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request, Response
+from cache import response_cache
 from database import get_db
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
 router = APIRouter()
 
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+SUGGEST_MEMO_CHARS = 2     # answers for prefixes this short are kept per roster
+
 def get_display_name(row) -> str:
     if row["known_as"] and row["known_as"].strip():
         return row["known_as"]
@@ -12,43 +33,229 @@ def get_display_name(row) -> str:
         return full
     return f"{parts[0]} {parts[-1]}"
 
-@router.get("/players")
-def get_players():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-    SELECT 
-        p.unique_name,
-        p.full_name,
-        p.known_as,
-        p.country
-    FROM players p
-    WHERE p.unique_name IN (
-        SELECT DISTINCT batter FROM deliveries
-        UNION
-        SELECT DISTINCT bowler FROM deliveries
-    )
-    AND p.full_name IS NOT NULL
-    AND p.full_name != ''
-    GROUP BY p.unique_name
-    ORDER BY COALESCE(p.known_as, p.full_name)
-    """)
-    
-    rows = cursor.fetchall()
-    conn.close()
+# ── Roster ───────────────────────────────────────────────────────────────────
+# Everyone who has batted or bowled, built once per data generation together
+# with the encoded /api/players payloads and the autocomplete prefix index.
+
+def _prefix_keys(name):
+    # The whole name and every word-start suffix: "virat kohli", "kohli"
+    words = name.lower().split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class Roster:
+    def __init__(self, generation, players):
+        self.generation = generation
+        self.players = players
+
+        # Prefix index: sorted (key, player) pairs searched with bisect.
+        # rank orders players by career deliveries, most first.
+        order = sorted(
+            range(len(players)),
+            key=lambda i: (-players[i]["deliveries"], players[i]["display_name"]),
+        )
+        self.rank = [0] * len(players)
+        for position, i in enumerate(order):
+            self.rank[i] = position
+        pairs = sorted({
+            (key, i)
+            for i, p in enumerate(players)
+            for name in (p["unique_name"], p["full_name"], p["known_as"], p["display_name"])
+            if name
+            for key in _prefix_keys(name)
+        })
+        self.prefix_keys = [key for key, _ in pairs]
+        self.prefix_players = [i for _, i in pairs]
+        self._suggest_memo = {}
+
+        # Same bytes JSONResponse would produce
+        payload = [
+            {k: p[k] for k in ("unique_name", "display_name", "country")} for p in players
+        ]
+        self.encoded = {
+            "identity": json.dumps(
+                payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8"),
+        }
+        self.encoded["gzip"] = gzip.compress(self.encoded["identity"], compresslevel=9)
+        if BROTLI_AVAILABLE:
+            self.encoded["br"] = brotli.compress(self.encoded["identity"])
+
+    def suggest(self, text, limit):
+        """Indexes of the `limit` most active players with a name (or name word) starting with text."""
+        text = " ".join(text.lower().split())
+        memo = len(text) <= SUGGEST_MEMO_CHARS
+        if memo and text in self._suggest_memo:
+            return self._suggest_memo[text][:limit]
+        lo = bisect.bisect_left(self.prefix_keys, text)
+        hi = bisect.bisect_left(self.prefix_keys, text + "\U0010ffff", lo)
+        found = set(self.prefix_players[lo:hi])
+        top = heapq.nsmallest(SUGGEST_MAX_LIMIT if memo else limit, found, key=self.rank.__getitem__)
+        if memo:
+            self._suggest_memo[text] = top
+        return top[:limit]
+
+
+def _load_roster(generation):
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        SELECT
+            p.unique_name,
+            p.full_name,
+            p.known_as,
+            p.country,
+            p.playing_role
+        FROM players p
+        WHERE p.unique_name IN (
+            SELECT DISTINCT batter FROM deliveries
+            UNION
+            SELECT DISTINCT bowler FROM deliveries
+        )
+        AND p.full_name IS NOT NULL
+        AND p.full_name != ''
+        GROUP BY p.unique_name
+        ORDER BY COALESCE(p.known_as, p.full_name)
+        """)
+        rows = cursor.fetchall()
+
+        # Seasons and deliveries (faced or bowled) per player
+        cursor.execute("""
+        SELECT pi.unique_name, MIN(c.year) AS first_year, MAX(c.year) AS last_year,
+               SUM(c.deliveries) AS deliveries
+        FROM (
+            SELECT batter_id AS player_id, year, COUNT(*) AS deliveries
+            FROM deliveries GROUP BY 1, 2
+            UNION ALL
+            SELECT bowler_id, year, COUNT(*) FROM deliveries GROUP BY 1, 2
+        ) c
+        JOIN player_ids pi ON pi.player_id = c.player_id
+        GROUP BY c.player_id
+        """)
+        career = {row["unique_name"]: row for row in cursor.fetchall()}
 
     seen = set()
-    result = []
+    players = []
     for row in rows:
         display = get_display_name(row)
         if display.lower() in seen:
             display = f"{display} ({row['country']})"
         seen.add(display.lower())
-        result.append({
-            "unique_name": row["unique_name"],
+        c = career.get(row["unique_name"])
+        players.append({
+            "unique_name":  row["unique_name"],
             "display_name": display,
-            "country": row["country"]
+            "country":      row["country"],
+            "full_name":    row["full_name"],
+            "known_as":     row["known_as"],
+            "role":         row["playing_role"],
+            "first_year":   c["first_year"] if c else None,
+            "last_year":    c["last_year"] if c else None,
+            "deliveries":   c["deliveries"] if c else 0,
         })
-    
-    return result
\ No newline at end of file
+    return Roster(generation, players)
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster():
+    """The Roster for the current data generation, rebuilt when it changes."""
+    global _roster
+    generation = response_cache.generation()
+    roster = _roster
+    if roster is None or roster.generation != generation:
+        with _roster_lock:
+            if _roster is None or _roster.generation != generation:
+                _roster = _load_roster(generation)
+            roster = _roster
+    return roster
+
+
+def _accepted_encodings(header):
+    # Content codings the client takes, ignoring preferences beyond q=0
+    accepted = set()
+    for part in (header or "").replace(" ", "").lower().split(","):
+        coding, _, q = part.partition(";q=")
+        try:
+            weight = float(q) if q else 1.0
+        except ValueError:
+            weight = 1.0
+        if coding and weight > 0:
+            accepted.add(coding)
+    return accepted
+
+
+@router.get("/players")
+def get_players(request: Request = None):
+    roster = get_roster()
+    accepted = _accepted_encodings(request.headers.get("accept-encoding") if request else None)
+    encoding = next((e for e in ("br", "gzip") if e in accepted and e in roster.encoded), "identity")
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(roster.encoded[encoding], media_type="application/json", headers=headers)
+
+
+@router.get("/players/suggest")
+def suggest_players(
+    q: str,
+    limit: int = Query(default=SUGGEST_LIMIT, ge=1, le=SUGGEST_MAX_LIMIT),
+):
+    """Autocomplete: players whose unique, full, known or display name (or a
+    word of it) starts with q, most career deliveries first."""
+    roster = get_roster()
+    return [
+        {k: roster.players[i][k] for k in ("unique_name", "display_name", "country")}
+        for i in roster.suggest(q, limit)
+    ]
+
+
+@router.get("/players/search")
+def search_players(
+    q: Optional[str] = None,
+    country: Optional[str] = None,
+    role: Optional[str] = None,
+    active_from: Optional[int] = None,
+    active_to: Optional[int] = None,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+):
+    """One page of the roster, filtered.
+
+    q matches a substring of the display, known or full name; country matches
+    exactly and role as a substring (both case-insensitive); active_from /
+    active_to keep players whose first-to-last season span overlaps them.
+    """
+    needle = q.lower() if q else None
+    country = country.lower() if country else None
+    role = role.lower() if role else None
+
+    def keep(p):
+        if needle and not any(
+            needle in (p[k] or "").lower() for k in ("display_name", "known_as", "full_name")
+        ):
+            return False
+        if country and (p["country"] or "").lower() != country:
+            return False
+        if role and role not in (p["role"] or "").lower():
+            return False
+        if active_from and (p["last_year"] is None or p["last_year"] < active_from):
+            return False
+        if active_to and (p["first_year"] is None or p["first_year"] > active_to):
+            return False
+        return True
+
+    matches = [p for p in get_roster().players if keep(p)]
+    start = (page - 1) * page_size
+    return {
+        "total":     len(matches),
+        "page":      page,
+        "page_size": page_size,
+        "players":   [
+            {k: p[k] for k in ("unique_name", "display_name", "country", "role", "first_year", "last_year")}
+            for p in matches[start:start + page_size]
+        ],
+    }
@@ -1,11 +1,36 @@
 from fastapi import APIRouter, Query
 from typing import List
 from database import get_db
-from routes.stats import _run_batting, _run_bowling, PHASE_FILTERS, COMP_FILTERS
+from cache import cached
+import dimensions
+from routes.stats import (
+    BATTING_AGGREGATES, BOWLING_AGGREGATES, BOWLER_TYPE_FILTERS, BATTER_HAND_FILTERS,
+    PHASE_FILTERS, _event_filter, _group_fan_out, _empty_batting, _empty_bowling,
+)
 
 router = APIRouter()
 
-BOWLING_NOT_COUNTED = "('run out', 'retired hurt', 'retired out', 'obstructing the field')"
+NOT_WIDE = "(d.extras_type IS NULL OR d.extras_type != 'wides')"
+
+# Every profile bucket is a predicate over one of the player's deliveries.
+# "season" is further split by year. Batting buckets other than season
+# count balls faced only, so they carry the no-wides condition themselves
+# (the season table has always counted a stumping off a wide).
+BATTING_BUCKETS = {
+    "overall": NOT_WIDE,
+    **{ph: f"{NOT_WIDE} AND {cond}" for ph, cond in PHASE_FILTERS.items()},
+    "vs_pace": f"{NOT_WIDE} AND {BOWLER_TYPE_FILTERS['pace']}",
+    "vs_spin": f"{NOT_WIDE} AND {BOWLER_TYPE_FILTERS['spin']}",
+    "season":  "1 = 1",
+}
+
+BOWLING_BUCKETS = {
+    "overall":  "1 = 1",
+    **PHASE_FILTERS,
+    "vs_left":  BATTER_HAND_FILTERS["left"],
+    "vs_right": BATTER_HAND_FILTERS["right"],
+    "season":   "1 = 1",
+}
 
 
 def _display_name(row) -> str:
@@ -20,144 +45,177 @@ def _display_name(row) -> str:
 
 
 def _build_event_where(events):
-    if not events:
-        return ""
-    parts = [COMP_FILTERS[e] for e in events if e in COMP_FILTERS]
-    if not parts:
-        return ""
-    return f"AND ({' OR '.join(parts)})"
+    """Returns (clause: str, params: list)"""
+    clause, params = _event_filter("d.competition", events)
+    return (f"AND {clause}" if clause else ""), params
 
 
-def _batting_by_season(cursor, player, events):
-    ew = _build_event_where(events)
+def _season_order(rows):
+    # Same order as ORDER BY year (NULL first)
+    return sorted(rows, key=lambda r: (r["year"] is not None, r["year"] or ""))
+
+
+def _batting_profile(cursor, player_id, events):
+    """All batting buckets of the profile from one pass over the player's deliveries.
+
+    Returns ({bucket: stats}, [season rows]).
+    """
+    ew, ew_params = _build_event_where(events)
+    fan_out, in_bucket = _group_fan_out(BATTING_BUCKETS)
     cursor.execute(f"""
+        WITH base AS (
+            SELECT g.grp,
+                CASE WHEN g.grp = 'season' THEN CAST(d.year AS TEXT) END AS year,
+                d.match_id, d.innings_id, d.batter_id, d.extras_type,
+                d.runs_batter, d.is_wicket, d.player_out_id, d.wicket_kind
+            FROM deliveries d
+            {fan_out}
+            WHERE d.batter_id = ?
+            AND d.inning IN (1, 2)
+            {ew}
+            AND {in_bucket}
+        ),
+        milestones AS (
+            SELECT q.grp,
+                COUNT(CASE WHEN bi.runs >= 50 AND bi.runs < 100 THEN 1 END) AS fifties,
+                COUNT(CASE WHEN bi.runs >= 100 THEN 1 END)                  AS hundreds
+            FROM (SELECT DISTINCT grp, innings_id, batter_id FROM base WHERE grp != 'season') q
+            JOIN batting_innings bi
+                ON bi.innings_id = q.innings_id AND bi.batter_id = q.batter_id
+            GROUP BY q.grp
+        )
         SELECT
-            SUBSTR(m.date, 1, 4)                                    AS year,
-            COUNT(DISTINCT d.match_id)                              AS matches,
-            SUM(d.runs_batter)                                      AS runs,
-            COUNT(CASE WHEN d.extras_type IS NULL
-                OR d.extras_type != 'wides' THEN 1 END)            AS balls_faced,
-            ROUND(SUM(d.runs_batter) * 100.0 /
-                NULLIF(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type != 'wides' THEN 1 END), 0), 2) AS sr,
-            COUNT(CASE WHEN d.is_wicket = 1
-                AND d.player_out = d.batter
-                AND d.wicket_kind NOT IN ('retired hurt', 'retired not out')
-                THEN 1 END)                                         AS dismissals
-        FROM deliveries d
-        JOIN matches m ON d.match_id = m.match_id
-        WHERE d.batter = ?
-        AND d.inning IN (1, 2)
-        {ew}
-        GROUP BY SUBSTR(m.date, 1, 4)
-        ORDER BY SUBSTR(m.date, 1, 4)
-    """, (player,))
-    result = []
+            b.grp,
+            b.year,{BATTING_AGGREGATES},
+            COALESCE(ms.fifties, 0)  AS fifties,
+            COALESCE(ms.hundreds, 0) AS hundreds,
+            COUNT(CASE WHEN b.extras_type IS NULL
+                OR b.extras_type != 'wides' THEN 1 END)            AS season_balls,
+            ROUND(SUM(b.runs_batter) * 100.0 /
+                NULLIF(COUNT(CASE WHEN b.extras_type IS NULL
+                    OR b.extras_type != 'wides' THEN 1 END), 0), 2) AS season_sr
+        FROM base b
+        LEFT JOIN milestones ms ON ms.grp = b.grp
+        GROUP BY b.grp, b.year
+    """, (player_id, *ew_params))
+
+    buckets, seasons = {}, []
     for row in cursor.fetchall():
         d = dict(row)
-        runs = d.get("runs") or 0
-        dism = d.get("dismissals") or 0
-        d["avg"] = round(runs / dism, 2) if dism > 0 else None
-        result.append(d)
-    return result
-
-
-def _bowling_by_season(cursor, player, events):
-    ew = _build_event_where(events)
+        if d["grp"] == "season":
+            runs = d["runs"] or 0
+            dism = d["dismissals"] or 0
+            seasons.append({
+                "year":        d["year"],
+                "matches":     d["matches"],
+                "runs":        d["runs"],
+                "balls_faced": d["season_balls"],
+                "sr":          d["season_sr"],
+                "dismissals":  d["dismissals"],
+                "avg":         round(runs / dism, 2) if dism > 0 else None,
+            })
+        else:
+            for k in ("grp", "year", "season_balls", "season_sr"):
+                del d[k]
+            buckets[row["grp"]] = d
+    return buckets, _season_order(seasons)
+
+
+def _bowling_profile(cursor, player_id, events):
+    """All bowling buckets of the profile from one pass over the player's deliveries.
+
+    Returns ({bucket: stats}, [season rows]).
+    """
+    ew, ew_params = _build_event_where(events)
+    fan_out, in_bucket = _group_fan_out(BOWLING_BUCKETS)
     cursor.execute(f"""
         SELECT
-            SUBSTR(m.date, 1, 4)                                    AS year,
-            COUNT(DISTINCT d.match_id)                              AS matches,
-            SUM(CASE WHEN d.is_wicket = 1
-                AND d.wicket_kind NOT IN {BOWLING_NOT_COUNTED}
-                THEN 1 ELSE 0 END)                                  AS wickets,
-            COUNT(CASE WHEN d.extras_type IS NULL
-                OR d.extras_type NOT IN ('wides', 'noballs')
-                THEN 1 END)                                         AS legal_balls,
-            ROUND(
-                SUM(CASE WHEN d.extras_type NOT IN ('byes', 'legbyes')
-                    OR d.extras_type IS NULL THEN d.runs_total ELSE 0 END) * 6.0 /
-                NULLIF(COUNT(CASE WHEN d.extras_type IS NULL
-                    OR d.extras_type NOT IN ('wides', 'noballs') THEN 1 END), 0)
-            , 2) AS economy
+            g.grp,
+            CASE WHEN g.grp = 'season' THEN CAST(d.year AS TEXT) END AS year,{BOWLING_AGGREGATES}
         FROM deliveries d
-        JOIN matches m ON d.match_id = m.match_id
-        WHERE d.bowler = ?
+        {fan_out}
+        WHERE d.bowler_id = ?
         AND d.inning IN (1, 2)
         {ew}
-        GROUP BY SUBSTR(m.date, 1, 4)
-        ORDER BY SUBSTR(m.date, 1, 4)
-    """, (player,))
-    return [dict(row) for row in cursor.fetchall()]
+        AND {in_bucket}
+        GROUP BY 1, 2
+    """, (player_id, *ew_params))
+
+    buckets, seasons = {}, []
+    for row in cursor.fetchall():
+        d = dict(row)
+        if d["grp"] == "season":
+            seasons.append({
+                "year":        d["year"],
+                "matches":     d["matches"],
+                "wickets":     d["wickets"],
+                "legal_balls": d["legal_balls"],
+                "economy":     d["economy"],
+            })
+        else:
+            del d["grp"], d["year"]
+            buckets[row["grp"]] = d
+    return buckets, _season_order(seasons)
 
 
 @router.get("/profile")
+@cached("profile")
 def get_profile(
     player: str,
     events: List[str] = Query(default=[]),
 ):
-    conn = get_db()
-    cursor = conn.cursor()
-
-    # ── Player metadata ────────────────────────────────────────────────────────
-    cursor.execute("""
-        SELECT unique_name, full_name, known_as, country, batting_style, bowling_style
-        FROM players
-        WHERE unique_name = ?
-    """, (player,))
-    row = cursor.fetchone()
-    if row:
-        player_meta = {
-            "unique_name":   row["unique_name"],
-            "display_name":  _display_name(row),
-            "country":       row["country"],
-            "batting_style": row["batting_style"],
-            "bowling_style": row["bowling_style"],
-        }
-    else:
-        player_meta = {
-            "unique_name":   player,
-            "display_name":  player.replace("-", " ").title(),
-            "country":       None,
-            "batting_style": None,
-            "bowling_style": None,
-        }
-
-    # ── Batting ────────────────────────────────────────────────────────────────
-    batting_overall  = _run_batting(cursor, player, "all",  events, None,   None, None, None, None)
-    batting_phases   = {
-        ph: _run_batting(cursor, player, ph, events, None, None, None, None, None)
-        for ph in PHASE_FILTERS
-    }
-    batting_vs_pace  = _run_batting(cursor, player, "all",  events, "pace", None, None, None, None)
-    batting_vs_spin  = _run_batting(cursor, player, "all",  events, "spin", None, None, None, None)
-    batting_seasons  = _batting_by_season(cursor, player, events)
-
-    # ── Bowling ────────────────────────────────────────────────────────────────
-    bowling_overall  = _run_bowling(cursor, player, "all",  events, None,    None, None, None)
-    bowling_phases   = {
-        ph: _run_bowling(cursor, player, ph, events, None, None, None, None)
-        for ph in PHASE_FILTERS
-    }
-    bowling_vs_left  = _run_bowling(cursor, player, "all",  events, "left",  None, None, None)
-    bowling_vs_right = _run_bowling(cursor, player, "all",  events, "right", None, None, None)
-    bowling_seasons  = _bowling_by_season(cursor, player, events)
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        # ── Player metadata ────────────────────────────────────────────────────
+        cursor.execute("""
+            SELECT unique_name, full_name, known_as, country, batting_style, bowling_style
+            FROM players
+            WHERE unique_name = ?
+        """, (player,))
+        row = cursor.fetchone()
+        if row:
+            player_meta = {
+                "unique_name":   row["unique_name"],
+                "display_name":  _display_name(row),
+                "country":       row["country"],
+                "batting_style": row["batting_style"],
+                "bowling_style": row["bowling_style"],
+            }
+        else:
+            player_meta = {
+                "unique_name":   player,
+                "display_name":  player.replace("-", " ").title(),
+                "country":       None,
+                "batting_style": None,
+                "bowling_style": None,
+            }
+
+        # ── One scan each for batting and bowling ──────────────────────────────
+        player_id = dimensions.player_id(cursor, player)
+        batting, batting_seasons = _batting_profile(cursor, player_id, events)
+        bowling, bowling_seasons = _bowling_profile(cursor, player_id, events)
+
+    def bat(key):
+        return batting.get(key) or _empty_batting()
+
+    def bowl(key):
+        return bowling.get(key) or _empty_bowling()
 
-    conn.close()
     return {
         "player": player_meta,
         "batting": {
-            "overall":   batting_overall,
-            "phases":    batting_phases,
-            "vs_pace":   batting_vs_pace,
-            "vs_spin":   batting_vs_spin,
+            "overall":   bat("overall"),
+            "phases":    {ph: bat(ph) for ph in PHASE_FILTERS},
+            "vs_pace":   bat("vs_pace"),
+            "vs_spin":   bat("vs_spin"),
             "by_season": batting_seasons,
         },
         "bowling": {
-            "overall":   bowling_overall,
-            "phases":    bowling_phases,
-            "vs_left":   bowling_vs_left,
-            "vs_right":  bowling_vs_right,
+            "overall":   bowl("overall"),
+            "phases":    {ph: bowl(ph) for ph in PHASE_FILTERS},
+            "vs_left":   bowl("vs_left"),
+            "vs_right":  bowl("vs_right"),
             "by_season": bowling_seasons,
         },
     }
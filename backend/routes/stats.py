@@ -1,17 +1,15 @@
 from fastapi import APIRouter, Query
+from datetime import date
 from typing import List, Optional
 from database import get_db
+from cache import cached
+import columnar
+import dimensions
 
 router = APIRouter()
 
 # ─── Constants ────────────────────────────────────────────────────────────────
 
-COMP_FILTERS = {
-    "IPL":  "m.event_name = 'Indian Premier League'",
-    "SA20": "m.event_name = 'SA20'",
-    "T20I": "m.event_name NOT IN ('Indian Premier League', 'SA20')",
-}
-
 PHASE_FILTERS = {
     "pp":     "d.over >= 0 AND d.over < 6",
     "middle": "d.over >= 6 AND d.over < 16",
@@ -24,18 +22,11 @@ PHASE_LABELS = {
     "death":  "Death Overs",
 }
 
-# bowling_style values from players table mapped to query-friendly keys
+# Bowler types and batter hands are classified once per player by build_db
+# (see dimensions.BOWLER_TYPES) and carried on every delivery
 BOWLER_TYPE_FILTERS = {
-    "right-pace":     "bp.bowling_style LIKE '%Right-arm pace%'",
-    "left-pace":      "bp.bowling_style LIKE '%Left-arm pace%'",
-    "off-spin":       "(bp.bowling_style LIKE '%off-spin%' OR bp.bowling_style LIKE '%off-break%')",
-    "leg-spin":       "(bp.bowling_style LIKE '%wrist-spin%')",
-    "right-orthodox": "bp.bowling_style LIKE '%Right-arm off-spin%'",
-    "left-orthodox":  "bp.bowling_style LIKE '%Left-arm off-spin%'",
-    "right-wrist":    "bp.bowling_style LIKE '%Right-arm wrist-spin%'",
-    "left-wrist":     "bp.bowling_style LIKE '%Left-arm wrist-spin%'",
-    "pace":           "(bp.bowling_style LIKE '%pace%')",
-    "spin":           "(bp.bowling_style LIKE '%spin%')",
+    key: f"(d.bowler_type_mask & {bit}) != 0"
+    for key, bit in dimensions.BOWLER_TYPE_BITS.items()
 }
 
 BOWLER_TYPE_LABELS = {
@@ -52,8 +43,7 @@ BOWLER_TYPE_LABELS = {
 }
 
 BATTER_HAND_FILTERS = {
-    "left":  "bp.batting_style = 'Left-hand bat'",
-    "right": "bp.batting_style = 'Right-hand bat'",
+    key: f"d.batter_hand = {code}" for key, code in dimensions.BATTER_HAND_CODES.items()
 }
 
 BATTER_HAND_LABELS = {
@@ -66,161 +56,188 @@ WICKETS_NOT_COUNTED = "('retired hurt', 'retired not out')"
 
 # ─── Filter builders ──────────────────────────────────────────────────────────
 
-def _build_batting_filter(player, phase, events, bowler_type, opposition, venue, year_from):
-    """Returns (extra_join: str, where_clause: str, params: list)"""
-    joins = []
+def _event_filter(column, events):
+    """(condition, params) restricting `column` to the selected competitions' codes."""
+    codes = dimensions.competition_codes(events)
+    if codes is None:
+        return None, []
+    return f"{column} IN ({', '.join('?' * len(codes))})", codes
+
+
+def _venue_filter(cursor, column, venue):
+    """(condition, params) restricting `column` to the venues whose name or alias contains `venue`."""
+    ids = dimensions.venue_ids(cursor, venue)
+    return f"{column} IN ({', '.join('?' * len(ids))})", ids
+
+
+def _period_filter(alias, year_from, date_from, date_to):
+    """(conditions, params) for the season and date range filters on `alias`.
+
+    Dates compare as ordinals (date.toordinal()), the integer build_db stores
+    next to every delivery and innings.
+    """
+    where, params = [], []
+    if year_from:
+        where.append(f"{alias}.year >= ?")
+        params.append(int(year_from))
+    if date_from:
+        where.append(f"{alias}.date_ordinal >= ?")
+        params.append(date_from.toordinal())
+    if date_to:
+        where.append(f"{alias}.date_ordinal <= ?")
+        params.append(date_to.toordinal())
+    return where, params
+
+
+def _build_batting_filter(cursor, player, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to):
+    """Returns (where_clause: str, params: list)"""
     where = [
-        "d.batter = ?",
+        "d.batter_id = ?",
         "d.inning IN (1, 2)",
         "(d.extras_type IS NULL OR d.extras_type != 'wides')",
     ]
-    params = [player]
+    params = [dimensions.player_id(cursor, player)]
 
     if phase and phase != "all" and phase in PHASE_FILTERS:
         where.append(PHASE_FILTERS[phase])
 
-    if events:
-        parts = [COMP_FILTERS[e] for e in events if e in COMP_FILTERS]
-        if parts:
-            where.append(f"({' OR '.join(parts)})")
+    event_clause, event_params = _event_filter("d.competition", events)
+    if event_clause:
+        where.append(event_clause)
+        params += event_params
 
     if bowler_type and bowler_type in BOWLER_TYPE_FILTERS:
-        joins.append("LEFT JOIN players bp ON d.bowler = bp.unique_name")
         where.append(BOWLER_TYPE_FILTERS[bowler_type])
 
     if opposition:
-        # opposition is the fielding team — team1 or team2 must be the opposition
-        # and the batter's batting_team is NOT the opposition (they're batting against them)
-        where.append("(m.team1 = ? OR m.team2 = ?)")
-        where.append("d.batting_team != ?")
-        params += [opposition, opposition, opposition]
+        # opposition is the fielding team (they're bowling to the batter)
+        where.append("d.bowling_team_id = ?")
+        params.append(dimensions.team_id(cursor, opposition))
 
     if venue:
-        where.append("d.venue LIKE ?")
-        params.append(f"%{venue}%")
+        cond, venue_params = _venue_filter(cursor, "d.venue_id", venue)
+        where.append(cond)
+        params += venue_params
 
-    if year_from:
-        where.append("CAST(SUBSTR(d.date, 1, 4) AS INTEGER) >= ?")
-        params.append(int(year_from))
+    period, period_params = _period_filter("d", year_from, date_from, date_to)
+    where += period
+    params += period_params
 
-    return " ".join(joins), " AND ".join(where), params
+    return " AND ".join(where), params
 
 
-def _build_bowling_filter(player, phase, events, batter_hand, opposition, venue, year_from):
-    """Returns (extra_join: str, where_clause: str, params: list)"""
-    joins = []
+def _build_bowling_filter(cursor, player, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to):
+    """Returns (where_clause: str, params: list)"""
     where = [
-        "d.bowler = ?",
+        "d.bowler_id = ?",
         "d.inning IN (1, 2)",
     ]
-    params = [player]
+    params = [dimensions.player_id(cursor, player)]
 
     if phase and phase != "all" and phase in PHASE_FILTERS:
         where.append(PHASE_FILTERS[phase])
 
-    if events:
-        parts = [COMP_FILTERS[e] for e in events if e in COMP_FILTERS]
-        if parts:
-            where.append(f"({' OR '.join(parts)})")
+    event_clause, event_params = _event_filter("d.competition", events)
+    if event_clause:
+        where.append(event_clause)
+        params += event_params
 
     if batter_hand and batter_hand in BATTER_HAND_FILTERS:
-        joins.append("LEFT JOIN players bp ON d.batter = bp.unique_name")
         where.append(BATTER_HAND_FILTERS[batter_hand])
 
     if opposition:
         # opposition = batting team (they're batting against our bowler)
-        where.append("d.batting_team = ?")
-        params.append(opposition)
+        where.append("d.batting_team_id = ?")
+        params.append(dimensions.team_id(cursor, opposition))
 
     if venue:
-        where.append("d.venue LIKE ?")
-        params.append(f"%{venue}%")
+        cond, venue_params = _venue_filter(cursor, "d.venue_id", venue)
+        where.append(cond)
+        params += venue_params
 
-    if year_from:
-        where.append("CAST(SUBSTR(d.date, 1, 4) AS INTEGER) >= ?")
-        params.append(int(year_from))
+    period, period_params = _period_filter("d", year_from, date_from, date_to)
+    where += period
+    params += period_params
 
-    return " ".join(joins), " AND ".join(where), params
+    return " AND ".join(where), params
 
 
-# ─── Core stat runners ────────────────────────────────────────────────────────
+def _build_batting_innings_filter(cursor, player, events, opposition, venue, year_from, date_from, date_to):
+    """Same filters as _build_batting_filter, against batting_innings (bi).
 
-def _run_batting(cursor, player, phase, events, bowler_type, opposition, venue, year_from, balls):
-    extra_join, where_clause, params = _build_batting_filter(
-        player, phase, events, bowler_type, opposition, venue, year_from
-    )
+    Only innings-level filters exist here; phase and bowler type vary ball by
+    ball and need the deliveries query.
+    Returns (where_clause: str, params: list)
+    """
+    where = ["bi.batter_id = ?"]
+    params = [dimensions.player_id(cursor, player)]
 
-    if balls and balls > 0:
-        # Window function: rank each ball within a batter's innings, take first `balls` only
-        sql = f"""
-        WITH faced AS (
-            SELECT d.*
-            FROM deliveries d
-            JOIN matches m ON d.match_id = m.match_id
-            {extra_join}
-            WHERE {where_clause}
-        ),
-        numbered AS (
-            SELECT *,
-                ROW_NUMBER() OVER (
-                    PARTITION BY match_id, inning
-                    ORDER BY over, ball
-                ) AS ball_num
-            FROM faced
-        )
-        SELECT
-            COUNT(DISTINCT match_id)                    AS matches,
-            COUNT(DISTINCT match_id || '-' || inning)   AS innings,
-            SUM(runs_batter)                            AS runs,
-            COUNT(*)                                    AS balls_faced,
-            ROUND(SUM(runs_batter) * 1.0 /
-                NULLIF(COUNT(CASE WHEN is_wicket = 1
-                    AND player_out = batter
-                    AND wicket_kind NOT IN {WICKETS_NOT_COUNTED} THEN 1 END), 0), 2) AS avg,
-            ROUND(SUM(runs_batter) * 100.0 /
-                NULLIF(COUNT(*), 0), 2)                 AS sr,
-            ROUND(COUNT(CASE WHEN runs_batter IN (4,6) THEN 1 END) * 100.0 /
-                NULLIF(COUNT(*), 0), 2)                 AS boundary_pct,
-            ROUND(COUNT(CASE WHEN runs_batter = 0 THEN 1 END) * 100.0 /
-                NULLIF(COUNT(*), 0), 2)                 AS dot_ball_pct,
-            ROUND(COUNT(*) * 1.0 /
-                NULLIF(COUNT(CASE WHEN runs_batter IN (4,6) THEN 1 END), 0), 2) AS balls_per_bdy,
-            COUNT(CASE WHEN is_wicket = 1
-                AND player_out = batter
-                AND wicket_kind NOT IN {WICKETS_NOT_COUNTED} THEN 1 END) AS dismissals,
-            NULL AS fifties,
-            NULL AS hundreds
-        FROM numbered
-        WHERE ball_num <= ?
-        """
-        params.append(balls)
-    else:
-        # Full query with fifties/hundreds via per-innings score CTE
-        sql = f"""
-        WITH base AS (
-            SELECT d.*
-            FROM deliveries d
-            JOIN matches m ON d.match_id = m.match_id
-            {extra_join}
-            WHERE {where_clause}
-        ),
-        inning_totals AS (
-            SELECT d2.match_id, d2.inning, SUM(d2.runs_batter) AS inns_runs
-            FROM deliveries d2
-            JOIN (SELECT DISTINCT match_id, inning FROM base) q
-                ON q.match_id = d2.match_id AND q.inning = d2.inning
-            WHERE d2.batter = ?
-              AND (d2.extras_type IS NULL OR d2.extras_type != 'wides')
-            GROUP BY d2.match_id, d2.inning
-        )
-        SELECT
+    event_clause, event_params = _event_filter("bi.competition", events)
+    if event_clause:
+        where.append(event_clause)
+        params += event_params
+
+    if opposition:
+        where.append("bi.bowling_team_id = ?")
+        params.append(dimensions.team_id(cursor, opposition))
+
+    if venue:
+        cond, venue_params = _venue_filter(cursor, "bi.venue_id", venue)
+        where.append(cond)
+        params += venue_params
+
+    period, period_params = _period_filter("bi", year_from, date_from, date_to)
+    where += period
+    params += period_params
+
+    return " AND ".join(where), params
+
+
+def _build_bowling_innings_filter(cursor, player, phase, events, opposition, venue, year_from, date_from, date_to):
+    """Same filters as _build_bowling_filter, against bowling_innings (bw).
+
+    Batter hand varies ball by ball and needs the deliveries query.
+    Returns (where_clause: str, params: list)
+    """
+    where = ["bw.bowler_id = ?"]
+    params = [dimensions.player_id(cursor, player)]
+
+    if phase and phase != "all" and phase in PHASE_FILTERS:
+        where.append("bw.phase = ?")
+        params.append(phase)
+
+    event_clause, event_params = _event_filter("bw.competition", events)
+    if event_clause:
+        where.append(event_clause)
+        params += event_params
+
+    if opposition:
+        where.append("bw.batting_team_id = ?")
+        params.append(dimensions.team_id(cursor, opposition))
+
+    if venue:
+        cond, venue_params = _venue_filter(cursor, "bw.venue_id", venue)
+        where.append(cond)
+        params += venue_params
+
+    period, period_params = _period_filter("bw", year_from, date_from, date_to)
+    where += period
+    params += period_params
+
+    return " AND ".join(where), params
+
+
+# ─── Core stat runners ────────────────────────────────────────────────────────
+
+# Batting aggregates over `b`, one row per ball faced (wides already excluded)
+BATTING_AGGREGATES = f"""
             COUNT(DISTINCT b.match_id)                      AS matches,
-            COUNT(DISTINCT b.match_id || '-' || b.inning)   AS innings,
+            COUNT(DISTINCT b.innings_id)                    AS innings,
             SUM(b.runs_batter)                              AS runs,
             COUNT(*)                                        AS balls_faced,
             ROUND(SUM(b.runs_batter) * 1.0 /
                 NULLIF(COUNT(CASE WHEN b.is_wicket = 1
-                    AND b.player_out = b.batter
+                    AND b.player_out_id = b.batter_id
                     AND b.wicket_kind NOT IN {WICKETS_NOT_COUNTED} THEN 1 END), 0), 2) AS avg,
             ROUND(SUM(b.runs_batter) * 100.0 /
                 NULLIF(COUNT(*), 0), 2)                     AS sr,
@@ -231,30 +248,13 @@ def _run_batting(cursor, player, phase, events, bowler_type, opposition, venue,
             ROUND(COUNT(*) * 1.0 /
                 NULLIF(COUNT(CASE WHEN b.runs_batter IN (4,6) THEN 1 END), 0), 2) AS balls_per_bdy,
             COUNT(CASE WHEN b.is_wicket = 1
-                AND b.player_out = b.batter
-                AND b.wicket_kind NOT IN {WICKETS_NOT_COUNTED} THEN 1 END) AS dismissals,
-            (SELECT COUNT(CASE WHEN inns_runs >= 50 AND inns_runs < 100 THEN 1 END)
-             FROM inning_totals)     AS fifties,
-            (SELECT COUNT(CASE WHEN inns_runs >= 100 THEN 1 END)
-             FROM inning_totals)     AS hundreds
-        FROM base b
-        """
-        params.append(player)  # for inning_totals WHERE d2.batter = ?
+                AND b.player_out_id = b.batter_id
+                AND b.wicket_kind NOT IN {WICKETS_NOT_COUNTED} THEN 1 END) AS dismissals"""
 
-    cursor.execute(sql, params)
-    row = cursor.fetchone()
-    return dict(row) if row else {}
-
-
-def _run_bowling(cursor, player, phase, events, batter_hand, opposition, venue, year_from):
-    extra_join, where_clause, params = _build_bowling_filter(
-        player, phase, events, batter_hand, opposition, venue, year_from
-    )
-
-    sql = f"""
-    SELECT
+# Bowling aggregates over `d`, one row per delivery bowled
+BOWLING_AGGREGATES = """
         COUNT(DISTINCT d.match_id)                      AS matches,
-        COUNT(DISTINCT d.match_id || '-' || d.inning)   AS innings,
+        COUNT(DISTINCT d.innings_id)                    AS innings,
         SUM(CASE WHEN d.is_wicket = 1
             AND d.wicket_kind NOT IN ('run out','retired hurt','retired out','obstructing the field')
             THEN 1 ELSE 0 END)                          AS wickets,
@@ -296,11 +296,110 @@ def _run_bowling(cursor, player, phase, events, batter_hand, opposition, venue,
             SUM(CASE WHEN d.is_wicket = 1
                 AND d.wicket_kind NOT IN ('run out','retired hurt','retired out','obstructing the field')
                 THEN 1 ELSE 0 END) * 1.0 /
-            NULLIF(COUNT(DISTINCT d.match_id || '-' || d.inning), 0)
-        , 2) AS wkts_per_innings
-    FROM deliveries d
-    JOIN matches m ON d.match_id = m.match_id
-    {extra_join}
+            NULLIF(COUNT(DISTINCT d.innings_id), 0)
+        , 2) AS wkts_per_innings"""
+
+
+# The same bowling aggregates over `bw`, pre-summed bowling_innings rows
+BOWLING_INNINGS_AGGREGATES = """
+        COUNT(DISTINCT bw.match_id)                     AS matches,
+        COUNT(DISTINCT bw.innings_id)                   AS innings,
+        SUM(bw.wickets)                                 AS wickets,
+        COALESCE(SUM(bw.legal_balls), 0)                AS legal_balls,
+        ROUND(SUM(bw.runs_conceded) * 6.0 /
+            NULLIF(SUM(bw.legal_balls), 0), 2)          AS economy,
+        ROUND(SUM(bw.runs_conceded) * 1.0 /
+            NULLIF(SUM(bw.wickets), 0), 2)              AS avg,
+        ROUND(SUM(bw.legal_balls) * 1.0 /
+            NULLIF(SUM(bw.wickets), 0), 2)              AS bowling_sr,
+        ROUND(SUM(bw.dots) * 100.0 /
+            NULLIF(SUM(bw.legal_balls), 0), 2)          AS dot_ball_pct,
+        ROUND(SUM(bw.boundaries) * 100.0 /
+            NULLIF(SUM(bw.legal_balls), 0), 2)          AS boundary_given_pct,
+        ROUND(SUM(bw.wickets) * 1.0 /
+            NULLIF(COUNT(DISTINCT bw.innings_id), 0), 2)  AS wkts_per_innings"""
+
+
+def _empty_batting(balls=None):
+    """What the batting aggregates return over zero balls."""
+    milestone = None if balls and balls > 0 else 0
+    return {
+        "matches": 0, "innings": 0, "runs": None, "balls_faced": 0,
+        "avg": None, "sr": None, "boundary_pct": None, "dot_ball_pct": None,
+        "balls_per_bdy": None, "dismissals": 0,
+        "fifties": milestone, "hundreds": milestone,
+    }
+
+
+def _empty_bowling():
+    """What the bowling aggregates return over zero deliveries."""
+    return {
+        "matches": 0, "innings": 0, "wickets": None, "legal_balls": 0,
+        "economy": None, "avg": None, "bowling_sr": None, "dot_ball_pct": None,
+        "boundary_given_pct": None, "wkts_per_innings": None,
+    }
+
+
+# group_by dimension → group key → SQL predicate
+BATTING_GROUPS = {
+    None:          {"all": "1 = 1"},
+    "phase":       PHASE_FILTERS,
+    "bowler_type": BOWLER_TYPE_FILTERS,
+}
+
+BOWLING_GROUPS = {
+    None:          {"all": "1 = 1"},
+    "phase":       PHASE_FILTERS,
+    "batter_hand": BATTER_HAND_FILTERS,
+}
+
+
+def _group_fan_out(groups):
+    """CROSS JOIN that repeats each delivery once for every group it falls in.
+
+    Overlapping groups ("pace" and "right-pace") each get their own copy of a
+    row, so a single scan of deliveries feeds every bucket; CROSS JOIN keeps
+    SQLite from moving the group list to the outer loop.
+    Returns (join: str, predicate: str)
+    """
+    keys = " UNION ALL ".join(f"SELECT '{key}' AS grp" for key in groups)
+    whens = " ".join(f"WHEN '{key}' THEN {pred}" for key, pred in groups.items())
+    return f"CROSS JOIN ({keys}) g", f"(CASE g.grp {whens} END)"
+
+
+def _rows_by_group(cursor):
+    return {
+        row["grp"]: {k: row[k] for k in row.keys() if k != "grp"}
+        for row in cursor.fetchall()
+    }
+
+
+def _run_batting_innings(cursor, player, events, opposition, venue, year_from, date_from, date_to):
+    """_run_batting without phase / bowler-type / balls, served from batting_innings."""
+    where_clause, params = _build_batting_innings_filter(
+        cursor, player, events, opposition, venue, year_from, date_from, date_to
+    )
+
+    sql = f"""
+    SELECT
+        COUNT(DISTINCT bi.match_id)                     AS matches,
+        COUNT(*)                                        AS innings,
+        SUM(bi.runs)                                    AS runs,
+        COALESCE(SUM(bi.balls), 0)                      AS balls_faced,
+        ROUND(SUM(bi.runs) * 1.0 /
+            NULLIF(SUM(bi.dismissals), 0), 2)           AS avg,
+        ROUND(SUM(bi.runs) * 100.0 /
+            NULLIF(SUM(bi.balls), 0), 2)                AS sr,
+        ROUND(SUM(bi.fours + bi.sixes) * 100.0 /
+            NULLIF(SUM(bi.balls), 0), 2)                AS boundary_pct,
+        ROUND(SUM(bi.dots) * 100.0 /
+            NULLIF(SUM(bi.balls), 0), 2)                AS dot_ball_pct,
+        ROUND(SUM(bi.balls) * 1.0 /
+            NULLIF(SUM(bi.fours + bi.sixes), 0), 2)     AS balls_per_bdy,
+        COALESCE(SUM(bi.dismissals), 0)                 AS dismissals,
+        COUNT(CASE WHEN bi.runs >= 50 AND bi.runs < 100 THEN 1 END) AS fifties,
+        COUNT(CASE WHEN bi.runs >= 100 THEN 1 END)      AS hundreds
+    FROM batting_innings bi
     WHERE {where_clause}
     """
 
@@ -309,9 +408,176 @@ def _run_bowling(cursor, player, phase, events, batter_hand, opposition, venue,
     return dict(row) if row else {}
 
 
+def _run_batting_groups(cursor, player, group_by, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls):
+    """Per-ball batting stats for every group of `group_by` in a single query.
+
+    group_by is "phase", "bowler_type" or None (one "all" group). Pass None
+    for the filter argument of the grouped dimension.
+    Returns {group_key: stats} for groups with at least one ball faced.
+    """
+    store = columnar.engine()
+    if store is not None:
+        return store.batting_groups(
+            player, group_by, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls
+        )
+
+    where_clause, params = _build_batting_filter(
+        cursor, player, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to
+    )
+    fan_out, in_group = _group_fan_out(BATTING_GROUPS[group_by])
+
+    source = f"""
+            SELECT g.grp, d.match_id, d.innings_id, d.over, d.ball, d.batter_id,
+                   d.runs_batter, d.is_wicket, d.player_out_id, d.wicket_kind
+            FROM deliveries d
+            {fan_out}
+            WHERE {where_clause}
+              AND {in_group}"""
+
+    if balls and balls > 0:
+        # Window function: rank each ball within a batter's innings (per group),
+        # take first `balls` only
+        sql = f"""
+        WITH faced AS ({source}
+        ),
+        numbered AS (
+            SELECT *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY grp, innings_id
+                    ORDER BY over, ball
+                ) AS ball_num
+            FROM faced
+        )
+        SELECT
+            b.grp,{BATTING_AGGREGATES},
+            NULL AS fifties,
+            NULL AS hundreds
+        FROM numbered b
+        WHERE b.ball_num <= ?
+        GROUP BY b.grp
+        """
+        params.append(balls)
+    else:
+        # Fifties/hundreds from the full-innings score in batting_innings
+        sql = f"""
+        WITH base AS ({source}
+        ),
+        milestones AS (
+            SELECT q.grp,
+                COUNT(CASE WHEN bi.runs >= 50 AND bi.runs < 100 THEN 1 END) AS fifties,
+                COUNT(CASE WHEN bi.runs >= 100 THEN 1 END)                  AS hundreds
+            FROM (SELECT DISTINCT grp, innings_id, batter_id FROM base) q
+            JOIN batting_innings bi
+                ON bi.innings_id = q.innings_id AND bi.batter_id = q.batter_id
+            GROUP BY q.grp
+        )
+        SELECT
+            b.grp,{BATTING_AGGREGATES},
+            COALESCE(ms.fifties, 0)  AS fifties,
+            COALESCE(ms.hundreds, 0) AS hundreds
+        FROM base b
+        LEFT JOIN milestones ms ON ms.grp = b.grp
+        GROUP BY b.grp
+        """
+
+    cursor.execute(sql, params)
+    return _rows_by_group(cursor)
+
+
+def _run_batting(cursor, player, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls):
+    per_ball = (
+        (balls and balls > 0)
+        or (phase and phase != "all" and phase in PHASE_FILTERS)
+        or (bowler_type and bowler_type in BOWLER_TYPE_FILTERS)
+    )
+    if not per_ball and columnar.engine() is None:
+        return _run_batting_innings(cursor, player, events, opposition, venue, year_from, date_from, date_to)
+
+    stats = _run_batting_groups(
+        cursor, player, None, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls
+    )
+    return stats.get("all") or _empty_batting(balls)
+
+
+def _run_bowling_innings(cursor, player, group_by, phase, events, opposition, venue, year_from, date_from, date_to):
+    """Bowling stats without a batter-hand filter, served from bowling_innings.
+
+    group_by is "phase" or None (one "all" group).
+    Returns {group_key: stats} for groups with at least one delivery.
+    """
+    where_clause, params = _build_bowling_innings_filter(
+        cursor, player, phase, events, opposition, venue, year_from, date_from, date_to
+    )
+    grp = "bw.phase" if group_by == "phase" else "'all'"
+
+    sql = f"""
+    SELECT
+        {grp}                                           AS grp,{BOWLING_INNINGS_AGGREGATES}
+    FROM bowling_innings bw
+    WHERE {where_clause}
+    GROUP BY 1
+    """
+
+    cursor.execute(sql, params)
+    return _rows_by_group(cursor)
+
+
+def _run_bowling_groups(cursor, player, group_by, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to):
+    """Bowling stats for every group of `group_by` in a single query.
+
+    group_by is "phase", "batter_hand" or None (one "all" group). Pass None
+    for the filter argument of the grouped dimension.
+    Returns {group_key: stats} for groups with at least one delivery.
+    """
+    store = columnar.engine()
+    if store is not None:
+        return store.bowling_groups(
+            player, group_by, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to
+        )
+
+    by_hand = group_by == "batter_hand" or (batter_hand and batter_hand in BATTER_HAND_FILTERS)
+    if not by_hand:
+        return _run_bowling_innings(cursor, player, group_by, phase, events, opposition, venue, year_from, date_from, date_to)
+
+    where_clause, params = _build_bowling_filter(
+        cursor, player, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to
+    )
+    fan_out, in_group = _group_fan_out(BOWLING_GROUPS[group_by])
+
+    sql = f"""
+    SELECT
+        g.grp,{BOWLING_AGGREGATES}
+    FROM deliveries d
+    {fan_out}
+    WHERE {where_clause}
+      AND {in_group}
+    GROUP BY g.grp
+    """
+
+    cursor.execute(sql, params)
+    return _rows_by_group(cursor)
+
+
+def _run_bowling(cursor, player, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to):
+    stats = _run_bowling_groups(
+        cursor, player, None, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to
+    )
+    return stats.get("all") or _empty_bowling()
+
+
 # ─── Endpoints ────────────────────────────────────────────────────────────────
 
+def _player_stats_defaults(arguments):
+    # phase=None / group_by="none" mean the same as their defaults
+    return {
+        **arguments,
+        "phase":    arguments["phase"] or "all",
+        "group_by": None if arguments["group_by"] in ("", "none") else arguments["group_by"],
+    }
+
+
 @router.get("/stats/player")
+@cached("stats_player", normalize=_player_stats_defaults)
 def get_player_stats(
     player: str,
     mode: str = "batting",
@@ -322,55 +588,69 @@ def get_player_stats(
     opposition: Optional[str] = None,
     venue: Optional[str] = None,
     year_from: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
     balls: Optional[int] = None,
     group_by: Optional[str] = None,
 ):
-    conn = get_db()
-    cursor = conn.cursor()
-
-    result = {
-        "player": player,
-        "mode": mode,
-    }
-
-    if group_by and group_by != "none":
-        groups = []
-
-        if group_by == "bowler_type" and mode == "batting":
-            for bt, label in BOWLER_TYPE_LABELS.items():
-                stats = _run_batting(cursor, player, phase, events, bt, opposition, venue, year_from, balls)
-                # Only include groups with meaningful data
-                if stats.get("innings") and stats["innings"] > 0:
-                    groups.append({"label": label, "key": bt, "stats": stats})
-
-        elif group_by == "phase":
-            for ph, label in PHASE_LABELS.items():
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        result = {
+            "player": player,
+            "mode": mode,
+        }
+
+        if group_by and group_by != "none":
+            groups = []
+
+            # Every group comes out of one query; overlapping groups (e.g. "pace"
+            # and "right-pace") are bucketed in the same pass
+            if group_by == "bowler_type" and mode == "batting":
+                by_group = _run_batting_groups(
+                    cursor, player, "bowler_type", phase, events, None, opposition, venue, year_from, date_from, date_to, balls
+                )
+                for bt, label in BOWLER_TYPE_LABELS.items():
+                    stats = by_group.get(bt)
+                    # Only include groups with meaningful data
+                    if stats and stats["innings"] > 0:
+                        groups.append({"label": label, "key": bt, "stats": stats})
+
+            elif group_by == "phase":
                 if mode == "batting":
-                    stats = _run_batting(cursor, player, ph, events, bowler_type, opposition, venue, year_from, balls)
+                    by_group = _run_batting_groups(
+                        cursor, player, "phase", None, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls
+                    )
                 else:
-                    stats = _run_bowling(cursor, player, ph, events, batter_hand, opposition, venue, year_from)
-                has_data = (stats.get("innings") or 0) > 0 or (stats.get("legal_balls") or 0) > 0
-                if has_data:
-                    groups.append({"label": label, "key": ph, "stats": stats})
-
-        elif group_by == "batter_hand" and mode == "bowling":
-            for bh, label in BATTER_HAND_LABELS.items():
-                stats = _run_bowling(cursor, player, phase, events, bh, opposition, venue, year_from)
-                if (stats.get("innings") or 0) > 0:
-                    groups.append({"label": label, "key": bh, "stats": stats})
-
-        result["groups"] = groups
-    else:
-        if mode == "batting":
-            result["stats"] = _run_batting(
-                cursor, player, phase, events, bowler_type, opposition, venue, year_from, balls
-            )
+                    by_group = _run_bowling_groups(
+                        cursor, player, "phase", None, events, batter_hand, opposition, venue, year_from, date_from, date_to
+                    )
+                for ph, label in PHASE_LABELS.items():
+                    stats = by_group.get(ph)
+                    has_data = stats and ((stats.get("innings") or 0) > 0 or (stats.get("legal_balls") or 0) > 0)
+                    if has_data:
+                        groups.append({"label": label, "key": ph, "stats": stats})
+
+            elif group_by == "batter_hand" and mode == "bowling":
+                by_group = _run_bowling_groups(
+                    cursor, player, "batter_hand", phase, events, None, opposition, venue, year_from, date_from, date_to
+                )
+                for bh, label in BATTER_HAND_LABELS.items():
+                    stats = by_group.get(bh)
+                    if stats and (stats.get("innings") or 0) > 0:
+                        groups.append({"label": label, "key": bh, "stats": stats})
+
+            result["groups"] = groups
         else:
-            result["stats"] = _run_bowling(
-                cursor, player, phase, events, batter_hand, opposition, venue, year_from
-            )
+            if mode == "batting":
+                result["stats"] = _run_batting(
+                    cursor, player, phase, events, bowler_type, opposition, venue, year_from, date_from, date_to, balls
+                )
+            else:
+                result["stats"] = _run_bowling(
+                    cursor, player, phase, events, batter_hand, opposition, venue, year_from, date_from, date_to
+                )
 
-    conn.close()
     return result
 
 
@@ -384,93 +664,103 @@ def get_team_stats(
     year_from: Optional[int] = None,
     innings: Optional[str] = None,  # "any" | "chasing" | "defending"
 ):
-    conn = get_db()
-    cursor = conn.cursor()
-
-    where = ["(m.team1 = ? OR m.team2 = ?)"]
-    params = [team, team]
-
-    if opposition:
-        where.append("(m.team1 = ? OR m.team2 = ?)")
-        params += [opposition, opposition]
-
-    if venue:
-        where.append("m.venue LIKE ?")
-        params.append(f"%{venue}%")
-
-    if city:
-        where.append("m.city LIKE ?")
-        params.append(f"%{city}%")
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        where = ["(m.team1 = ? OR m.team2 = ?)"]
+        params = [team, team]
+
+        if opposition:
+            where.append("(m.team1 = ? OR m.team2 = ?)")
+            params += [opposition, opposition]
+
+        if venue:
+            cond, venue_params = _venue_filter(cursor, "m.venue_id", venue)
+            where.append(cond)
+            params += venue_params
+
+        if city:
+            where.append("m.city LIKE ?")
+            params.append(f"%{city}%")
+
+        event_clause, event_params = _event_filter("competition", events)
+        if event_clause:
+            where.append(f"m.event_id IN (SELECT event_id FROM events WHERE {event_clause})")
+            params += event_params
+
+        if year_from:
+            where.append("CAST(SUBSTR(m.date, 1, 4) AS INTEGER) >= ?")
+            params.append(int(year_from))
+
+        chasing_join = ""
+        if innings in ("chasing", "defending"):
+            chasing_join = """
+            JOIN (
+                SELECT DISTINCT match_id, batting_team AS chasing_team
+                FROM deliveries WHERE inning = 2
+            ) chase ON chase.match_id = m.match_id
+            """
+            if innings == "chasing":
+                where.append("chase.chasing_team = ?")
+                params.append(team)
+            else:
+                where.append("(chase.chasing_team != ? OR chase.chasing_team IS NULL)")
+                params.append(team)
+
+        where_clause = " AND ".join(where)
 
-    if events:
-        parts = [COMP_FILTERS[e] for e in events if e in COMP_FILTERS]
-        if parts:
-            where.append(f"({' OR '.join(parts)})")
-
-    if year_from:
-        where.append("CAST(SUBSTR(m.date, 1, 4) AS INTEGER) >= ?")
-        params.append(int(year_from))
-
-    chasing_join = ""
-    if innings in ("chasing", "defending"):
-        chasing_join = """
-        JOIN (
-            SELECT DISTINCT match_id, batting_team AS chasing_team
-            FROM deliveries WHERE inning = 2
-        ) chase ON chase.match_id = m.match_id
+        sql = f"""
+        SELECT
+            COUNT(*)                                                    AS matches,
+            COUNT(CASE WHEN m.winner = ? THEN 1 END)                    AS wins,
+            COUNT(CASE WHEN m.winner IS NOT NULL
+                AND m.winner != ?
+                AND m.winner != 'No result' THEN 1 END)                 AS losses,
+            COUNT(CASE WHEN m.winner IS NULL
+                OR m.winner = 'No result' THEN 1 END)                   AS no_results,
+            ROUND(COUNT(CASE WHEN m.winner = ? THEN 1.0 END) /
+                NULLIF(COUNT(CASE WHEN m.winner IS NOT NULL
+                    AND m.winner != 'No result' THEN 1 END), 0) * 100, 1) AS win_pct
+        FROM matches m
+        {chasing_join}
+        WHERE {where_clause}
         """
-        if innings == "chasing":
-            where.append("chase.chasing_team = ?")
-            params.append(team)
-        else:
-            where.append("(chase.chasing_team != ? OR chase.chasing_team IS NULL)")
-            params.append(team)
-
-    where_clause = " AND ".join(where)
-
-    sql = f"""
-    SELECT
-        COUNT(*)                                                    AS matches,
-        COUNT(CASE WHEN m.winner = ? THEN 1 END)                    AS wins,
-        COUNT(CASE WHEN m.winner IS NOT NULL
-            AND m.winner != ?
-            AND m.winner != 'No result' THEN 1 END)                 AS losses,
-        COUNT(CASE WHEN m.winner IS NULL
-            OR m.winner = 'No result' THEN 1 END)                   AS no_results,
-        ROUND(COUNT(CASE WHEN m.winner = ? THEN 1.0 END) /
-            NULLIF(COUNT(CASE WHEN m.winner IS NOT NULL
-                AND m.winner != 'No result' THEN 1 END), 0) * 100, 1) AS win_pct
-    FROM matches m
-    {chasing_join}
-    WHERE {where_clause}
-    """
-    params += [team, team, team]
-
-    cursor.execute(sql, params)
-    row = cursor.fetchone()
-    conn.close()
+        # The SELECT list's placeholders come before the WHERE clause's
+        cursor.execute(sql, [team, team, team, *params])
+        row = cursor.fetchone()
     return dict(row) if row else {}
 
 
 @router.get("/teams")
 def get_teams():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT DISTINCT team1 AS t FROM matches "
-        "UNION SELECT DISTINCT team2 FROM matches "
-        "ORDER BY t"
-    )
-    teams = [row[0] for row in cursor.fetchall() if row[0]]
-    conn.close()
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT team1 AS t FROM matches "
+            "UNION SELECT DISTINCT team2 FROM matches "
+            "ORDER BY t"
+        )
+        teams = [row[0] for row in cursor.fetchall() if row[0]]
     return teams
 
 
 @router.get("/venues")
 def get_venues():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT venue FROM matches WHERE venue IS NOT NULL ORDER BY venue")
-    venues = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    """Canonical venues with their match counts and the spellings folded into them."""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT v.venue_id, v.venue, v.city, COUNT(*) AS matches
+            FROM venues v
+            JOIN matches m ON m.venue_id = v.venue_id
+            GROUP BY v.venue_id
+            ORDER BY v.venue
+        """)
+        venues = [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT venue_id, alias FROM venue_aliases ORDER BY alias")
+        aliases = {}
+        for venue_id, alias in cursor.fetchall():
+            aliases.setdefault(venue_id, []).append(alias)
+    for venue in venues:
+        venue["aliases"] = aliases.get(venue["venue_id"], [])
     return venues
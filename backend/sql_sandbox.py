@@ -0,0 +1,165 @@
+"""Bounded execution of assistant-generated SQL.
+
+The assistant runs whatever SQL the model writes, so it gets its own
+connection, never one from the stats pool, and that connection can only
+read:
+
+  * opened ``mode=ro`` with ``PRAGMA query_only`` and an authorizer that
+    allows nothing but reads (no ATTACH, PRAGMA or writes);
+  * ``EXPLAIN QUERY PLAN`` is checked first, and plans that SCAN
+    ``deliveries`` in full inside a loop over ``deliveries`` (the classic
+    accidental cartesian product) are rejected before they run; joins
+    SQLite serves with an automatic index are left to the budgets below;
+  * a progress handler aborts the statement once it exceeds its wall-clock
+    or VM-step budget, fetching included, or when the caller cancels it;
+  * rows are read with fetchmany up to a cap, and the result says whether
+    it was truncated.
+
+    columns, rows, truncated = sql_sandbox.run(sql)
+"""
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import quote
+
+from database import DB_PATH
+
+TIMEOUT           = float(os.environ.get("ASSISTANT_SQL_TIMEOUT", "10"))        # seconds
+MAX_STEPS         = int(os.environ.get("ASSISTANT_SQL_MAX_STEPS", "1000000000"))  # VM instructions
+MAX_ROWS          = int(os.environ.get("ASSISTANT_MAX_ROWS", "1000"))
+PROGRESS_INTERVAL = 10_000     # VM instructions between budget checks
+FETCH_SIZE        = 256
+CACHE_SIZE_KIB    = 16 * 1024  # page cache for the sandbox connection
+
+# Authorizer actions a read-only query needs
+ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+# Words that can follow a table name without being its alias
+_KEYWORDS = {
+    "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "NATURAL", "FULL",
+    "ON", "USING", "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT",
+    "INTERSECT", "WINDOW", "INDEXED", "NOT", "AS",
+}
+_TABLE_RE = re.compile(r"\bdeliveries\b(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.IGNORECASE)
+# "SCAN d", "SEARCH d USING INDEX ...", older "SCAN TABLE deliveries AS d"
+_LOOP_RE = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?")
+
+
+class SandboxError(Exception):
+    """The query was rejected or stopped; the message is meant for the user."""
+
+
+def _authorize(action, *args):
+    return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.set_authorizer(_authorize)
+    return conn
+
+
+# ── Plan check ───────────────────────────────────────────────────────────────
+
+def _deliveries_names(sql):
+    # "deliveries" plus every alias the query gives it
+    names = {"deliveries"}
+    for m in _TABLE_RE.finditer(sql):
+        if m.group(1) and m.group(1).upper() not in _KEYWORDS:
+            names.add(m.group(1))
+    return names
+
+
+def nested_deliveries_scan(plan, names):
+    """The plan line of a full deliveries scan nested in a deliveries loop, or None.
+
+    plan is EXPLAIN QUERY PLAN rows (id, parent, notused, detail). Sibling
+    loops nest in the order listed; a correlated subquery runs inside every
+    loop listed before it, other subqueries run once. An automatic index
+    counts as a full scan: building it reads the whole table.
+    """
+    children = {}
+    for node, parent, _, detail in plan:
+        children.setdefault(parent, []).append((node, detail))
+
+    def walk(parent, outer):
+        for node, detail in children.get(parent, []):
+            loop = _LOOP_RE.match(detail)
+            if loop and (loop.group(3) or loop.group(2)) in names:
+                if outer and loop.group(1) == "SCAN":
+                    return detail
+                outer = True
+            found = walk(node, outer if detail.startswith("CORRELATED") else False)
+            if found:
+                return found
+        return None
+
+    return walk(0, False)
+
+
+def check_plan(conn, sql):
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    scan = nested_deliveries_scan(plan, _deliveries_names(sql))
+    if scan:
+        raise SandboxError(
+            f"Query rejected: it scans every delivery once per delivery ({scan}). "
+            "Join deliveries to itself on an indexed column such as match_id."
+        )
+
+
+# ── Execution ────────────────────────────────────────────────────────────────
+
+def run(sql, db_path=DB_PATH, timeout=TIMEOUT, max_steps=MAX_STEPS, max_rows=MAX_ROWS,
+        cancel=None):
+    """Run one read-only statement within budget.
+
+    Returns (columns, rows as dicts, truncated). Raises SandboxError when the
+    plan is rejected, a budget runs out or the cancel Event is set, and
+    sqlite3.Error for bad SQL.
+    """
+    conn = _connect(db_path)
+    try:
+        check_plan(conn, sql)
+
+        budget = {"deadline": time.monotonic() + timeout, "steps": 0, "stopped": None}
+
+        def progress():
+            budget["steps"] += PROGRESS_INTERVAL
+            if cancel is not None and cancel.is_set():
+                budget["stopped"] = "cancelled"
+            elif budget["steps"] > max_steps:
+                budget["stopped"] = f"more than {max_steps:,} steps"
+            elif time.monotonic() > budget["deadline"]:
+                budget["stopped"] = f"more than {timeout:g}s"
+            return 1 if budget["stopped"] else 0
+
+        conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+        try:
+            cursor = conn.execute(sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            raw_rows = []
+            while len(raw_rows) <= max_rows:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    break
+                raw_rows.extend(batch)
+        except sqlite3.OperationalError:
+            if budget["stopped"] == "cancelled":
+                raise SandboxError("Query cancelled.") from None
+            if budget["stopped"]:
+                raise SandboxError(f"Query stopped: it ran for {budget['stopped']}.") from None
+            raise
+    finally:
+        conn.close()
+
+    truncated = len(raw_rows) > max_rows
+    rows = [dict(zip(columns, row)) for row in raw_rows[:max_rows]]
+    return columns, rows, truncated
@@ -1,6 +1,7 @@
 from mlx_lm import load, generate
-import sqlite3
 import re
+from aliases import get_matcher
+import sql_sandbox
 
 # ============================================================
 # LOAD THE FUSED MODEL
@@ -11,35 +12,9 @@ model, tokenizer = load(model_id)
 
 # ============================================================
 # PLAYER NAME RESOLVER
-# Build a lookup of {lowercase alias -> unique_name} at startup
-# so user-typed names ("Virat Kohli") map to DB keys ("V Kohli")
+# User-typed names ("Virat Kohli") map to DB keys ("V Kohli") through
+# the alias index build_db.py writes; it is opened on the first question
 # ============================================================
-def _build_alias_map():
-    try:
-        conn = sqlite3.connect("./cricket_assistant.db")
-        cur = conn.cursor()
-        cur.execute("SELECT unique_name, full_name, known_as FROM players")
-        rows = cur.fetchall()
-        conn.close()
-    except Exception as e:
-        print(f"⚠️  Could not build player alias map: {e}")
-        return {}, []
-
-    alias_map = {}
-    for unique_name, full_name, known_as in rows:
-        for alias in [known_as, full_name, unique_name]:
-            if alias and len(alias.strip()) >= 4:
-                key = alias.strip().lower()
-                # Don't overwrite an existing mapping with a shorter alias
-                if key not in alias_map:
-                    alias_map[key] = unique_name
-
-    # Sort longest first so greedy matching prefers longer names
-    sorted_aliases = sorted(alias_map.keys(), key=len, reverse=True)
-    return alias_map, sorted_aliases
-
-_ALIAS_MAP, _SORTED_ALIASES = _build_alias_map()
-print(f"✅ Player alias map built: {len(_ALIAS_MAP)} aliases for name resolution.")
 
 
 def resolve_player_names(question):
@@ -48,44 +23,7 @@ def resolve_player_names(question):
     E.g. "Rohit Sharma strike rate" → "RG Sharma strike rate"
     Uses longest-match-first to avoid partial overlaps.
     """
-    lower_q = question.lower()
-    used = [False] * len(question)
-    replacements = []  # (start, end, unique_name)
-
-    for alias in _SORTED_ALIASES:
-        alen = len(alias)
-        idx = 0
-        while idx <= len(lower_q) - alen:
-            pos = lower_q.find(alias, idx)
-            if pos == -1:
-                break
-            end = pos + alen
-
-            # Word-boundary check: character before/after must not be alphanumeric
-            before_ok = pos == 0 or not lower_q[pos - 1].isalnum()
-            after_ok  = end >= len(lower_q) or not lower_q[end].isalnum()
-            no_overlap = not any(used[pos:end])
-
-            if before_ok and after_ok and no_overlap:
-                unique_name = _ALIAS_MAP[alias]
-                original    = question[pos:end]
-                if original != unique_name:
-                    replacements.append((pos, end, unique_name, original))
-                    for i in range(pos, end):
-                        used[i] = True
-            idx = pos + 1
-
-    if not replacements:
-        return question
-
-    # Apply right-to-left so earlier indices stay valid
-    replacements.sort(key=lambda x: x[0], reverse=True)
-    result = question
-    for start, end, unique_name, original in replacements:
-        print(f"🔁 Resolved: '{original}' → '{unique_name}'")
-        result = result[:start] + unique_name + result[end:]
-
-    return result
+    return get_matcher().resolve(question)
 
 # ============================================================
 # LOGIC BLOCK - ALL CORRECT FORMULAS (BATTLE-TESTED)
@@ -599,11 +537,12 @@ def run_query(question):
     """Generate SQL from a natural-language question and execute it.
 
     Returns:
-        (sql, columns, rows, error)
+        (sql, columns, rows, error, truncated)
         - sql:     the generated SQL string
         - columns: list of column name strings
         - rows:    list of dicts {column: value}
         - error:   error string if execution failed, else None
+        - truncated: rows stopped at sql_sandbox.MAX_ROWS
     """
     SYSTEM_PROMPT = f"""You are an expert Cricket SQL Query Generator for a SQLite database.
 
@@ -650,15 +589,9 @@ Question: {question}<|eot_id|>
 
     print(f"\n🖥️  Generated SQL:\n{sql}\n")
 
-    # Execute
+    # Execute in the sandbox: read-only, time- and row-bounded
     try:
-        conn = sqlite3.connect("./cricket_assistant.db")
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        raw_rows = cursor.fetchall()
-        col_names = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = [dict(zip(col_names, row)) for row in raw_rows]
-        conn.close()
+        col_names, rows, truncated = sql_sandbox.run(sql)
 
         if rows:
             print("📊 Results:")
@@ -666,13 +599,15 @@ Question: {question}<|eot_id|>
             print("   " + "-" * (21 * len(col_names)))
             for row in rows:
                 print("   " + " | ".join(f"{str(row[c]):<18}" for c in col_names))
+            if truncated:
+                print(f"   … truncated at {len(rows)} rows")
         else:
             print("📊 No data found.")
 
-        return sql, col_names, rows, None
+        return sql, col_names, rows, None, truncated
     except Exception as e:
         print(f"⚠️  SQL Error: {e}")
-        return sql, [], [], str(e)
+        return sql, [], [], str(e), False
 
 
 # ============================================================